@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_cors import CORS
 from flask_login import LoginManager
@@ -25,13 +26,41 @@ def create_app(config_class=Config):
     def load_user(user_id):
         return config_services.users_service.get_user_by_id(user_id)
 
-    # 4. Register Blueprints (The Routes)
+    # 4. Service Lookup for the JSON API (current_app.services['db'], etc.)
+    from app.services.upload_sessions import UploadSessionStore
+    app.services = {
+        'users': config_services.users_service,
+        'storage': config_services.storage_service,
+        'db': config_services.db_service,
+        'notifier': config_services.notifier_service,
+        'analyzer': config_services.analyzer_service,
+        'search': config_services.search_index,
+        'feed': config_services.explore_feed,
+        'trending': config_services.trending,
+        'counters': config_services.view_counter,
+        'jobs': config_services.job_queue,
+        'uploads': UploadSessionStore(app.config['UPLOAD_SESSION_FOLDER'])
+    }
+
+    # 5. Register Blueprints (The Routes)
     from app.routes.auth import auth_bp
     from app.routes.web import web_bp
     from app.routes.stream import stream_bp
+    from app.routes.api import api_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(web_bp)
     app.register_blueprint(stream_bp)
+    app.register_blueprint(api_bp)
+
+    # 6. CLI Commands (flask db ...)
+    from app.cli import register_commands
+    register_commands(app)
+
+    # 7. Background Jobs: workers start with the app, so jobs left pending, backing off or with
+    # an expired lease by a previous process run after a restart (not only after the next upload).
+    # Not for the test client or 'flask ...' commands ('flask jobs work' starts its own pool).
+    if not app.testing and os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        config_services.job_workers.start()
 
     return app
\ No newline at end of file
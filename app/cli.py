@@ -0,0 +1,199 @@
+import json
+import os
+import time
+
+import click
+from flask.cli import AppGroup
+
+from app import config_services
+from app.services import catalog
+from config import Config
+
+# --- flask db ... ---
+db_cli = AppGroup('db', help='Database maintenance commands.')
+
+
+@db_cli.command('create-indexes')
+@click.option('--wait/--no-wait', default=True, help='Block until every new index is ACTIVE.')
+def create_indexes(wait):
+    """Creates the DynamoDB secondary indexes used by login, signup, the studio page and trending."""
+    for service in (config_services.users_service, config_services.db_service, config_services.trending):
+        if not hasattr(service, 'ensure_indexes'):
+            click.echo(f"{type(service).__name__}: no indexes to create.")
+            continue
+        created = service.ensure_indexes(wait=wait)
+        click.echo(f"{type(service).__name__}: created {created or 'nothing (already up to date)'}")
+
+
+@db_cli.command('backfill')
+def backfill():
+    """Adds missing index key attributes to existing items so they show up in the indexes."""
+    service = config_services.db_service
+    if not hasattr(service, 'backfill'):
+        click.echo(f"{type(service).__name__}: nothing to backfill.")
+        return
+    click.echo(f"{type(service).__name__}: updated {service.backfill()} item(s).")
+
+
+@db_cli.command('import-json')
+@click.option('--source', default=Config.MOCK_DB_FOLDER, show_default=True,
+              help='Folder holding the videos.json / users.json written by the mock backend.')
+def import_json(source):
+    """Copies the mock backend's JSON files into the configured database (DB_BACKEND=sqlite)."""
+    targets = (
+        ('users.json', config_services.users_service, 'import_users'),
+        ('videos.json', config_services.db_service, 'put_videos'),
+    )
+    for filename, service, method in targets:
+        path = os.path.join(source, filename)
+        if not hasattr(service, method):
+            raise click.ClickException(f"{type(service).__name__} cannot import records (set DB_BACKEND=sqlite).")
+        if not os.path.exists(path):
+            click.echo(f"{filename}: not found, skipped.")
+            continue
+        with open(path) as f:
+            records = json.load(f)
+        click.echo(f"{filename}: imported {getattr(service, method)(records)} record(s).")
+
+
+@db_cli.command('retag')
+@click.option('--min-confidence', type=float, default=None,
+              help='Override REKOGNITION_MIN_CONFIDENCE for this run.')
+@click.option('--batch-size', default=100, show_default=True, help='Thumbnails analyzed per batch.')
+def retag(min_confidence, batch_size):
+    """Re-runs label detection over every thumbnail and replaces the previous labels (user tags are kept)."""
+    db = config_services.db_service
+    analyzer = config_services.analyzer_service
+    bucket = os.environ.get('AWS_BUCKET_NAME', 'mock-bucket')
+    videos = [v for v in db.get_all_videos() if v.get('thumbnail')]
+    tagged = failed = 0
+
+    for start in range(0, len(videos), batch_size):
+        batch = videos[start:start + batch_size]
+        labels = analyzer.detect_labels_batch([(bucket, v['thumbnail']) for v in batch],
+                                              min_confidence=min_confidence)
+        for video in batch:
+            found = labels.get((bucket, video['thumbnail']))
+            if found is None:
+                failed += 1
+            elif db.set_labels(video['video_id'], found) is not None:
+                tagged += 1
+        click.echo(f"{min(start + batch_size, len(videos))}/{len(videos)} analyzed")
+
+    click.echo(f"Tagged {tagged} video(s), {failed} analysis failure(s).")
+
+
+# --- flask jobs ... ---
+jobs_cli = AppGroup('jobs', help='Background job queue commands.')
+
+
+@jobs_cli.command('work')
+@click.option('--threads', default=Config.JOB_WORKERS or 2, show_default=True)
+def work(threads):
+    """Runs job workers in the foreground (use with JOB_WORKERS=0 on the web processes)."""
+    pool = config_services.job_workers
+    pool.threads = threads
+    pool.start()
+    click.echo(f"Running {threads} job worker(s), Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(60)
+            click.echo(f"Jobs: {config_services.job_queue.counts()}")
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+@jobs_cli.command('status')
+def status():
+    """Shows job counts per status and the most recent dead letters."""
+    queue = config_services.job_queue
+    click.echo(f"Jobs: {queue.counts()}")
+    for job in queue.dead_letters(limit=20):
+        click.echo(f"  dead {job['job_id']} {job['kind']} after {job['attempts']} attempt(s): {job['last_error']}")
+
+
+@jobs_cli.command('retry-dead')
+@click.argument('job_id', required=False)
+def retry_dead(job_id):
+    """Re-queues one dead-lettered job (or all of them)."""
+    click.echo(f"Re-queued {config_services.job_queue.retry_dead(job_id)} job(s).")
+
+
+@jobs_cli.command('purge')
+@click.option('--days', default=7, show_default=True)
+def purge(days):
+    """Deletes finished jobs older than --days."""
+    click.echo(f"Deleted {config_services.job_queue.purge(days * 24 * 3600)} finished job(s).")
+
+
+# --- flask catalog ... ---
+catalog_cli = AppGroup('catalog', help='Catalog backup / migration commands.')
+CATALOG_KINDS = ('videos', 'users')
+
+
+def _catalog_services():
+    return {'videos': config_services.db_service, 'users': config_services.users_service}
+
+
+@catalog_cli.command('export')
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(catalog.FORMATS), default='jsonl', show_default=True,
+              help='jsonl: gzipped newline-delimited JSON; parquet: columnar (needs pyarrow).')
+@click.option('--segments', default=8, show_default=True, help='Parallel scan segments (DynamoDB).')
+@click.option('--only', type=click.Choice(CATALOG_KINDS), default=None, help='Export just one table.')
+def export_catalog(directory, fmt, segments, only):
+    """Streams the videos and users tables into DIRECTORY (videos.jsonl.gz, users.jsonl.gz...)."""
+    os.makedirs(directory, exist_ok=True)
+    services = _catalog_services()
+    for kind in [only] if only else CATALOG_KINDS:
+        service = services[kind]
+        records = service.scan_videos(segments) if kind == 'videos' else service.scan_users(segments)
+        path = os.path.join(directory, catalog.filename(kind, fmt))
+        started = time.monotonic()
+        count = catalog.export_records(records, path, kind, fmt)
+        click.echo(f"{kind}: exported {count} record(s) to {path} in {time.monotonic() - started:.1f}s.")
+
+
+@catalog_cli.command('import')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='Records per batch write.')
+@click.option('--workers', default=4, show_default=True, help='Batches written in parallel.')
+@click.option('--only', type=click.Choice(CATALOG_KINDS), default=None, help='Import just one table.')
+def import_catalog(directory, batch_size, workers, only):
+    """Loads an export made by 'flask catalog export' into the configured backend (existing ids are replaced)."""
+    services = _catalog_services()
+    for kind in [only] if only else CATALOG_KINDS:
+        path = next((os.path.join(directory, catalog.filename(kind, fmt, compress))
+                     for fmt in catalog.FORMATS for compress in (True, False)
+                     if os.path.exists(os.path.join(directory, catalog.filename(kind, fmt, compress)))), None)
+        if path is None:
+            click.echo(f"{kind}: no export found in {directory}, skipped.")
+            continue
+        service = services[kind]
+        write = service.put_videos if kind == 'videos' else service.import_users
+        started = time.monotonic()
+        count = catalog.import_records(catalog.read_records(path), write, batch_size, workers)
+        click.echo(f"{kind}: imported {count} record(s) from {path} in {time.monotonic() - started:.1f}s.")
+
+
+# --- flask storage ... ---
+storage_cli = AppGroup('storage', help='Media storage commands.')
+
+
+@storage_cli.command('gc')
+@click.option('--min-age', default=Config.CAS_GC_MIN_AGE, show_default=True,
+              help='Seconds an unreferenced object is kept (uploads whose video is not saved yet).')
+def gc(min_age):
+    """Deletes content-addressed objects that no video references."""
+    storage = config_services.storage_service
+    if not hasattr(storage, 'gc'):
+        click.echo("Content-addressed storage is disabled (STORAGE_CONTENT_ADDRESSED).")
+        return
+    click.echo(f"Deleted {storage.gc(min_age)} unreferenced object(s).")
+
+
+def register_commands(app):
+    app.cli.add_command(db_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(storage_cli)
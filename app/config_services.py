@@ -1,23 +1,46 @@
 import os
-# Import Mock Implementations
-from app.services.mock_impl import (
-    MockUsers, MockStorage, MockDatabase, MockNotifier, MockAnalyzer
-)
-# Import AWS Implementations
-from app.services.aws_impl import (
-    S3Storage, DynamoDBService, DynamoUsers, SNSNotifier, RekognitionAnalyzer
-)
+from config import Config
+from app.services.search import SearchIndex
+from app.services.feed import ExploreFeed
+from app.services.trending import SQLiteTrending
+from app.services.cache import SharedCache
+from app.services.cached_impl import CachedVideoDB, CachedUsers
+from app.services.counters import ViewCounter
+from app.services.notify_buffer import BatchNotifier
+from app.services.jobs import JobQueue, JobWorkerPool, post_upload_handlers
+from app.services.thumbnails import ThumbnailGenerator
+from app.services.hls import HLSPackager
+from app.services.cas import ContentAddressedStorage, ObjectRefs
+# Backend implementations are imported inside get_services(): a worker only loads the
+# backend it runs (boto3 alone costs a mock worker ~0.2s of boot), and the AWS services
+# build their clients lazily, on first use, from one shared session (aws_clients).
 
 # Define Paths for Mock Data
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MOCK_DIR = os.path.join(BASE_DIR, 'mock_aws')
 
+def get_shared_cache():
+    """memcached shared by the workers on this box, if VIDEO_CACHE_SERVER is set"""
+    server = getattr(Config, 'VIDEO_CACHE_SERVER', None)
+    if not server:
+        return None
+    try:
+        return SharedCache(server)
+    except RuntimeError as e:
+        print(f" [WARN] Shared cache disabled: {e}")
+        return None
+
+shared_cache = get_shared_cache()
+
 def get_services():
     """Returns the correct service instances based on FLASK_ENV"""
     
     # --- PRODUCTION (AWS) ---
     if os.environ.get('FLASK_ENV') == 'production':
         print(" [SYSTEM] LOADING AWS SERVICES ☁️")
+        from app.services.aws_impl import (
+            S3Storage, DynamoDBService, DynamoUsers, SNSNotifier, RekognitionAnalyzer
+        )
         
         # Get Config from Env Vars (set by deploy.sh or Elastic Beanstalk)
         s3_bucket = os.environ.get('AWS_BUCKET_NAME')
@@ -31,17 +54,42 @@ def get_services():
             S3Storage(),            # Storage
             DynamoDBService(),      # Database
             SNSNotifier(),          # Notifier (New)
-            RekognitionAnalyzer()   # Analyzer (New)
+            RekognitionAnalyzer(shared=shared_cache)   # Analyzer (New)
         )
     
     # --- LOCAL (MOCK) ---
     else:
         print(" [SYSTEM] LOADING MOCK SERVICES 💻")
+        from app.services.mock_impl import (
+            MockUsers, MockStorage, MockDatabase, MockNotifier, MockAnalyzer
+        )
         
         # Paths for local data
         db_path = os.path.join(MOCK_DIR, 'local_db')
         media_path = os.path.join(MOCK_DIR, 'local_s3')
 
+        if getattr(Config, 'DB_BACKEND', 'json') == 'sqlite':
+            # SQLite implementations (single-box deployments)
+            from app.services.sqlite_impl import SQLiteDatabase, SQLiteVideoDB, SQLiteUsers
+            database = SQLiteDatabase(Config.SQLITE_PATH)
+            return (
+                SQLiteUsers(database),      # Users
+                MockStorage(media_path),    # Storage
+                SQLiteVideoDB(database),    # Database
+                MockNotifier(),             # Notifier
+                MockAnalyzer()              # Analyzer
+            )
+
+        if getattr(Config, 'DB_BACKEND', 'json') == 'log':
+            from app.services.log_impl import LogVideoDB
+            return (
+                MockUsers(),            # Users
+                MockStorage(media_path), # Storage
+                LogVideoDB(db_path, compact_bytes=getattr(Config, 'LOG_COMPACT_BYTES', 4 * 1024 * 1024)),
+                MockNotifier(),         # Notifier
+                MockAnalyzer()          # Analyzer
+            )
+
         return (
             MockUsers(),            # Users
             MockStorage(media_path), # Storage
@@ -52,4 +100,107 @@ def get_services():
 
 # Initialize global instances so other files can import them
 # UNPACK ALL 5 SERVICES HERE
-users_service, storage_service, db_service, notifier_service, analyzer_service = get_services()
\ No newline at end of file
+users_service, storage_service, db_service, notifier_service, analyzer_service = get_services()
+
+# Uploads are stored once per distinct content, under their SHA-256.
+# Derived files (thumbnail variants, HLS) keep using the plain storage: their names are chosen by us.
+media_storage = storage_service
+if getattr(Config, 'STORAGE_CONTENT_ADDRESSED', False):
+    if os.environ.get('FLASK_ENV') == 'production' and os.environ.get('DYNAMO_TABLE_OBJECTS'):
+        from app.services.aws_impl import DynamoObjectRefs
+        object_refs = DynamoObjectRefs()
+    else:
+        object_refs = ObjectRefs(Config.CAS_REFS_PATH)
+    storage_service = ContentAddressedStorage(storage_service, object_refs)
+    storage_service.attach(db_service)
+
+# Read-through cache in front of the video DB (per worker + optional shared memcached)
+db_service = CachedVideoDB(
+    db_service,
+    ttl=getattr(Config, 'VIDEO_CACHE_TTL', 60),
+    local_ttl=getattr(Config, 'VIDEO_CACHE_LOCAL_TTL', 10),
+    maxsize=getattr(Config, 'VIDEO_CACHE_SIZE', 10000),
+    shared=shared_cache
+)
+
+# Write-behind view counting: views are coalesced in memory and flushed in batches
+view_counter = ViewCounter(
+    db_service,
+    flush_interval=getattr(Config, 'VIEW_FLUSH_INTERVAL', 5),
+    max_pending=getattr(Config, 'VIEW_FLUSH_THRESHOLD', 1000)
+)
+
+# Keeps Flask-Login's user_loader from hitting storage on every authenticated request
+users_service = CachedUsers(
+    users_service,
+    ttl=getattr(Config, 'USER_CACHE_TTL', 30),
+    negative_ttl=getattr(Config, 'USER_CACHE_NEGATIVE_TTL', 10),
+    maxsize=getattr(Config, 'USER_CACHE_SIZE', 10000),
+    shared=shared_cache
+)
+
+# Full-text search over the catalog, kept current by db_service's put_video
+search_index = SearchIndex(db_service, max_age=getattr(Config, 'SEARCH_INDEX_MAX_AGE', 300))
+
+# Newest videos for /explore and /api/videos, maintained from db_service's change events
+explore_feed = ExploreFeed(
+    db_service,
+    size=getattr(Config, 'EXPLORE_FEED_SIZE', 240),
+    max_age=getattr(Config, 'EXPLORE_FEED_MAX_AGE', 30)
+)
+
+# Time-decayed view / like scores behind /api/trending and the Trending tab
+def get_trending():
+    options = dict(
+        half_life=getattr(Config, 'TRENDING_HALF_LIFE', 6 * 3600),
+        view_weight=getattr(Config, 'TRENDING_VIEW_WEIGHT', 1.0),
+        like_weight=getattr(Config, 'TRENDING_LIKE_WEIGHT', 5.0),
+        flush_interval=getattr(Config, 'TRENDING_FLUSH_INTERVAL', 5)
+    )
+    if os.environ.get('FLASK_ENV') == 'production':
+        if os.environ.get('DYNAMO_TABLE_TRENDING'):
+            from app.services.aws_impl import DynamoTrending
+            return DynamoTrending(**options)
+        # A file on each box would rank each box's traffic separately
+        if not os.environ.get('TRENDING_PATH'):
+            raise RuntimeError("Set DYNAMO_TABLE_TRENDING (or TRENDING_PATH on a single-box deployment)")
+    return SQLiteTrending(Config.TRENDING_PATH, **options)
+
+trending = get_trending()
+
+# Notifications: the durable 'notify' jobs are sent in batches / digests by the job workers
+if getattr(Config, 'NOTIFY_MODE', 'batch') != 'direct':
+    notifier_service = BatchNotifier(
+        notifier_service,
+        mode=Config.NOTIFY_MODE,
+        max_batch=getattr(Config, 'NOTIFY_MAX_BATCH', 50)
+    )
+
+# Post-upload work (label detection, notifications) runs off the request thread
+job_queue = JobQueue(
+    Config.JOB_QUEUE_PATH,
+    max_attempts=getattr(Config, 'JOB_MAX_ATTEMPTS', 5),
+    retry_delay=getattr(Config, 'JOB_RETRY_DELAY', 10),
+    lease=getattr(Config, 'JOB_LEASE', 300)
+)
+job_workers = JobWorkerPool(
+    job_queue,
+    post_upload_handlers(
+        db_service, analyzer_service, notifier_service,
+        bucket=os.environ.get('AWS_BUCKET_NAME', 'mock-bucket'),
+        # 'direct': one publish per message
+        notify_batch=getattr(Config, 'NOTIFY_MAX_BATCH', 50) if getattr(Config, 'NOTIFY_MODE', 'batch') != 'direct' else 1,
+        thumbnails=ThumbnailGenerator(
+            media_storage, db_service,
+            widths=getattr(Config, 'THUMBNAIL_WIDTHS', (160, 320, 640)),
+            formats=getattr(Config, 'THUMBNAIL_FORMATS', ('webp', 'jpeg')),
+            quality=getattr(Config, 'THUMBNAIL_QUALITY', 80)
+        ),
+        hls=HLSPackager(
+            media_storage, db_service,
+            renditions=getattr(Config, 'HLS_RENDITIONS', ((360, 800), (720, 2800), (1080, 5000))),
+            segment_seconds=getattr(Config, 'HLS_SEGMENT_SECONDS', 6)
+        )
+    ),
+    threads=getattr(Config, 'JOB_WORKERS', 2)
+)
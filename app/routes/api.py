@@ -1,67 +1,257 @@
+import math
+import uuid
 from flask import Blueprint, jsonify, request, current_app, url_for
 from flask_login import current_user, login_required
+from werkzeug.utils import secure_filename
+from app.services.thumbnails import variants
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Stored with the video but never sent to clients (who liked it; a DynamoDB set is not JSON either)
+PRIVATE_FIELDS = ('liked_by',)
+
+def _public(video):
+    return {k: v for k, v in video.items() if k not in PRIVATE_FIELDS}
+
+def _with_urls(video):
+    # Add full URLs so the frontend JavaScript can use them easily
+    v = _public(video)
+    v['thumbnail_url'] = url_for('stream.stream_file', filename=v['thumbnail']) if v.get('thumbnail') else None
+    v['video_url'] = url_for('stream.stream_file', filename=v['filename'])
+    # Downscaled variants: {'webp': {'320': url, ...}, 'jpeg': {...}} (empty until the thumbnails job ran)
+    v['thumbnail_variants'] = {
+        fmt: {str(width): url_for('stream.stream_file', filename=name) for width, name in variants(v, fmt)}
+        for fmt in (v.get('thumbnails') or {})
+    }
+    return v
+
 @api_bp.route('/search')
 def search():
+    """
+    Full-text and tag search: /api/search?q=cats&tags=outdoor,dog&mode=and|or
+    (tags may also be repeated: &tag=outdoor&tag=dog). Returns the matches plus
+    'facets', the most common other tags among them with their counts.
+    """
     query = request.args.get('q', '').strip()
-    db = current_app.services['db']
-    videos = db.search(query) if query else db.get_all_videos()
+    tags = request.args.getlist('tag') + [t for t in request.args.get('tags', '').split(',') if t.strip()]
+    if not query and not tags:
+        # No query: same as the first page of the feed
+        return list_videos()
+    mode = request.args.get('mode', 'and').lower()
+    if mode not in ('and', 'or'):
+        return jsonify({'error': "mode must be 'and' or 'or'"}), 400
+    limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+    facets = max(0, min(request.args.get('facets', 20, type=int), 100))
+
+    videos, top_tags = current_app.services['search'].browse(query, tags, mode=mode, limit=limit, facets=facets)
     
     # Enrich data for frontend
-    results = []
-    for v in videos:
-        # Add full URLs so the frontend JavaScript can use them easily
-        v['thumbnail_url'] = url_for('stream.stream_file', filename=v['thumbnail']) if v.get('thumbnail') else None
-        v['video_url'] = url_for('stream.stream_file', filename=v['filename'])
-        results.append(v)
+    results = [_with_urls(v) for v in videos]
         
+    return jsonify({'results': results, 'facets': [{'tag': tag, 'count': count} for tag, count in top_tags]})
+
+@api_bp.route('/tags')
+def tag_counts():
+    """ The most used tags over the whole catalog: /api/tags?limit=50 """
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    counts = current_app.services['search'].tag_counts(limit)
+    return jsonify({'tags': [{'tag': tag, 'count': count} for tag, count in counts]})
+
+@api_bp.route('/videos')
+def list_videos():
+    """ Newest-first feed, one page at a time: /api/videos?cursor=<next_cursor>&limit=24 """
+    db = current_app.services['db']
+    cursor = request.args.get('cursor')
+    limit = max(1, min(request.args.get('limit', current_app.config['FEED_PAGE_SIZE'], type=int), 100))
+    render = lambda videos, next_cursor: current_app.json.dumps(
+        {'results': [_with_urls(v) for v in videos], 'next_cursor': next_cursor}
+    )
+    try:
+        # Pages inside the materialized feed are served as cached JSON (refreshed when views / likes change)
+        body = current_app.services['feed'].rendered('json', cursor, limit, render, counters=True)
+        if body is None:
+            body = render(*db.list_videos(cursor=cursor, limit=limit))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    return current_app.response_class(body, mimetype='application/json')
+
+@api_bp.route('/trending')
+def trending():
+    """ Most popular videos right now (time-decayed views + likes): /api/trending?limit=24 """
+    limit = max(1, min(request.args.get('limit', current_app.config['FEED_PAGE_SIZE'], type=int), 100))
+    scores = dict(current_app.services['trending'].top(limit))
+    videos = current_app.services['db'].get_videos(list(scores))
+    
+    results = [dict(_with_urls(v), trending_score=round(scores[v['video_id']], 3)) for v in videos]
     return jsonify({'results': results})
 
 @api_bp.route('/videos/<video_id>')
 def get_video(video_id):
     db = current_app.services['db']
-    # Start by getting all videos to find the one we need
-    # (In a real DB, you'd have a get_by_id method, but this works for Mock)
-    videos = db.get_all_videos()
-    video = next((v for v in videos if v['video_id'] == video_id), None)
+    video = db.get_video(video_id)
     
     if not video:
         return jsonify({'error': 'Not found'}), 404
         
-    return jsonify(video)
+    return jsonify(_public(video))
+
+@api_bp.route('/cache/stats')
+@login_required
+def cache_stats():
+    db = current_app.services['db']
+    users = current_app.services['users']
+    if not hasattr(db, 'stats'):
+        return jsonify({'enabled': False})
+    stats = dict(enabled=True, **db.stats())
+    if hasattr(users, 'stats'):
+        stats['users'] = users.stats()
+    return jsonify(stats)
 
 @api_bp.route('/videos/<video_id>/like', methods=['POST'])
 @login_required
 def like_video(video_id):
     db = current_app.services['db']
-    # Toggle like (this is a simplified mock logic)
-    # In a real app, you'd track *who* liked it. 
-    # Here we just toggle the boolean on the video itself.
-    videos = db.get_all_videos()
-    video = next((v for v in videos if v['video_id'] == video_id), None)
+    # One atomic toggle per user (no whole-catalog rewrite)
+    liked, likes = db.toggle_like(video_id, current_user.id)
     
-    if video:
-        video['liked'] = not video.get('liked', False)
-        # Note: MockDB usually saves automatically on modification depending on implementation,
-        # but explicitly calling put/save is safer. 
-        # For this MockDB, modification in place works if using the list reference.
-        # To be safe, let's assume the DB service handles persistance on next write.
-        db._write(videos) # Force save
-        return jsonify({'liked': video['liked']})
+    if liked is None:
+        return jsonify({'error': 'Video not found'}), 404
+    current_app.services['trending'].add_like(video_id, current_user.id, liked)
         
-    return jsonify({'error': 'Video not found'}), 404
+    return jsonify({'liked': liked, 'likes': likes})
 
 @api_bp.route('/videos/<video_id>/view', methods=['POST'])
 def view_video(video_id):
     db = current_app.services['db']
-    videos = db.get_all_videos()
-    video = next((v for v in videos if v['video_id'] == video_id), None)
+    video = db.get_video(video_id)
     
-    if video:
-        video['views'] = video.get('views', 0) + 1
-        db._write(videos) # Force save
-        return jsonify({'views': video['views']})
-        
-    return jsonify({'error': 'Video not found'}), 404
\ No newline at end of file
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+
+    # Buffered: the stored count catches up at the next flush
+    pending = current_app.services['counters'].add_view(video_id)
+    current_app.services['trending'].add_view(video_id)
+    return jsonify({'views': int(video.get('views', 0)) + pending})
+
+
+# --- RESUMABLE UPLOADS ---
+# init -> PUT each part (any order, in parallel, retry any part on its own) -> complete.
+# GET on a session lists the parts already stored so a client can resume after a failure.
+
+def _get_upload_session(session_id):
+    session = current_app.services['uploads'].get(session_id)
+    if not session or session['user_id'] != current_user.id:
+        return None
+    return session
+
+def _max_parts(session):
+    # Enough parts for the declared size (or MAX_CONTENT_LENGTH), never more
+    limit = int(session.get('total_size') or current_app.config.get('MAX_CONTENT_LENGTH') or 0)
+    return min(math.ceil(limit / session['part_size']), 10000) if limit else 10000
+
+@api_bp.route('/uploads', methods=['POST'])
+@login_required
+def init_upload():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+
+    # The declared size bounds how many parts the session accepts (see _max_parts)
+    total_size = data.get('size')
+    if isinstance(total_size, bool) or not isinstance(total_size, int) or total_size < 1:
+        return jsonify({'error': 'size (bytes, a positive integer) is required'}), 400
+    max_size = current_app.config.get('MAX_CONTENT_LENGTH')
+    if max_size and total_size > max_size:
+        return jsonify({'error': 'File too large'}), 413
+
+    # Staged under a per-session folder so two users sending 'video.mp4' never collide
+    filename = f"uploads/{uuid.uuid4().hex}/{filename}"
+    storage = current_app.services['storage']
+    part_size = current_app.config['UPLOAD_CHUNK_SIZE']
+    upload_id = storage.create_multipart_upload(filename)
+    session = current_app.services['uploads'].create(current_user.id, filename, upload_id, part_size, total_size)
+
+    return jsonify({
+        'session_id': session['session_id'],
+        'filename': filename,
+        'part_size': part_size
+    }), 201
+
+@api_bp.route('/uploads/<session_id>')
+@login_required
+def get_upload(session_id):
+    session = _get_upload_session(session_id)
+    if not session:
+        return jsonify({'error': 'Not found'}), 404
+
+    parts = []
+    if session['status'] == 'uploading':
+        parts = current_app.services['storage'].list_parts(session['filename'], session['upload_id'])
+    return jsonify({
+        'session_id': session_id,
+        'filename': session['filename'],
+        'part_size': session['part_size'],
+        'status': session['status'],
+        'parts': [{'part_number': p['PartNumber'], 'size': p['Size']} for p in parts]
+    })
+
+@api_bp.route('/uploads/<session_id>/parts/<int:part_number>', methods=['PUT'])
+@login_required
+def put_upload_part(session_id, part_number):
+    session = _get_upload_session(session_id)
+    if not session:
+        return jsonify({'error': 'Not found'}), 404
+    if session['status'] != 'uploading':
+        return jsonify({'error': 'Upload already finished'}), 409
+    if not 1 <= part_number <= _max_parts(session):
+        return jsonify({'error': f"part_number must be between 1 and {_max_parts(session)}"}), 400
+    if request.content_length is None or request.content_length > session['part_size']:
+        return jsonify({'error': f"Parts must declare a Content-Length of at most {session['part_size']} bytes"}), 413
+
+    etag = current_app.services['storage'].upload_part(
+        session['filename'], session['upload_id'], part_number, request.stream
+    )
+    return jsonify({'part_number': part_number, 'etag': etag})
+
+@api_bp.route('/uploads/<session_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(session_id):
+    session = _get_upload_session(session_id)
+    if not session:
+        return jsonify({'error': 'Not found'}), 404
+    if session['status'] == 'complete':
+        return jsonify({'filename': session['filename'], 'size': session['total_size']})
+
+    storage = current_app.services['storage']
+    parts = storage.list_parts(session['filename'], session['upload_id'])
+    numbers = [p['PartNumber'] for p in parts]
+    if not numbers or numbers != list(range(1, len(numbers) + 1)):
+        return jsonify({'error': 'Missing parts', 'received': numbers}), 409
+
+    size = sum(p['Size'] for p in parts)
+    max_size = current_app.config.get('MAX_CONTENT_LENGTH')
+    if max_size and size > max_size:
+        return jsonify({'error': 'File too large'}), 413
+    if session['total_size'] and size != int(session['total_size']):
+        return jsonify({'error': f"Expected {session['total_size']} bytes, received {size}"}), 409
+
+    filename = storage.complete_multipart_upload(session['filename'], session['upload_id'], parts)
+    if not filename:
+        return jsonify({'error': 'Storage error'}), 500
+
+    session.update({'status': 'complete', 'filename': filename, 'total_size': size})
+    current_app.services['uploads'].save(session)
+    return jsonify({'filename': filename, 'size': size})
+
+@api_bp.route('/uploads/<session_id>', methods=['DELETE'])
+@login_required
+def abort_upload(session_id):
+    session = _get_upload_session(session_id)
+    if not session:
+        return jsonify({'error': 'Not found'}), 404
+    if session['status'] == 'uploading':
+        current_app.services['storage'].abort_multipart_upload(session['filename'], session['upload_id'])
+    current_app.services['uploads'].delete(session_id)
+    return jsonify({'aborted': True})
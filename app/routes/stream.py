@@ -1,100 +1,90 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, send_from_directory, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app, Response
 from flask_login import login_required, current_user
 import os
+import posixpath
 import traceback
 from werkzeug.utils import secure_filename
+from app.services.streaming import MultipartStreamReader
+from app.services.media_server import send_media
+from app.services.thumbnails import variants
+from app.services.hls import rewrite_playlist
+from app.services.cas import digest_of
+from app.services.jobs import next_window
 
 # Import services
 from app.config_services import (
     db_service, 
     storage_service, 
-    analyzer_service, 
-    notifier_service
+    job_queue
 )
 
 stream_bp = Blueprint('stream', __name__)
 
+# Responsive thumbnails: templates pick a variant (or the original) instead of always the full image
+THUMBNAIL_SIZES = "(max-width: 480px) 100vw, (max-width: 768px) 50vw, (max-width: 1024px) 33vw, 25vw"
+
+@stream_bp.app_context_processor
+def thumbnail_helpers():
+    def thumbnail_srcset(video, fmt='jpeg'):
+        return ', '.join(f"{url_for('stream.stream_file', filename=name)} {width}w"
+                         for width, name in variants(video, fmt))
+
+    def thumbnail_url(video, width=320):
+        # Smallest JPEG variant at least 'width' wide, else the largest one, else the original
+        options = variants(video, 'jpeg')
+        name = next((n for w, n in options if w >= width), options[-1][1] if options else video.get('thumbnail'))
+        return url_for('stream.stream_file', filename=name) if name else None
+
+    return {'thumbnail_srcset': thumbnail_srcset, 'thumbnail_url': thumbnail_url,
+            'thumbnail_sizes': THUMBNAIL_SIZES}
+
 @stream_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
     if request.method == 'POST':
         print("\n" + "="*40)
         print("[DEBUG] --- STARTING UPLOAD ---")
+
+        # Streaming mode: parse the body ourselves so Werkzeug never spools it to a temp file
+        if current_app.config.get('STREAMING_UPLOADS') and request.mimetype == 'multipart/form-data':
+            return _streaming_upload()
         
         # --- FIX: SMART FILE DETECTION ---
         # We look for 'video' OR 'video_file' to match whatever your HTML sends
         video_file = request.files.get('video') or request.files.get('video_file')
         thumb_file = request.files.get('thumbnail') or request.files.get('thumbnail_file')
+        # The video may already be in storage via the resumable /api/uploads flow
+        video_url = _completed_upload(request.form.get('video_upload'))
 
         # 1. Check if files were found
-        if not video_file:
-            print("[ERROR] Video file missing! Checked 'video' and 'video_file'")
+        if not video_url and not (video_file and video_file.filename):
+            print("[ERROR] Video file missing! Checked 'video', 'video_file' and 'video_upload'")
             flash('No video file found.')
             return redirect(request.url)
             
-        if not thumb_file:
-            print("[ERROR] Thumbnail file missing! Checked 'thumbnail' and 'thumbnail_file'")
-            flash('No thumbnail file found.')
-            return redirect(request.url)
-        
-        print(f"[DEBUG] Video Filename: '{video_file.filename}'")
-        print(f"[DEBUG] Thumb Filename: '{thumb_file.filename}'")
-
-        if video_file.filename == '' or thumb_file.filename == '':
-            print("[ERROR] One of the filenames is empty")
-            flash('No selected file')
-            return redirect(request.url)
+        # The thumbnail is optional: without one, the 'thumbnails' job grabs a frame of the video
+        if not thumb_file or thumb_file.filename == '':
+            print("[DEBUG] No thumbnail sent, one will be derived from the video")
+            thumb_file = None
 
         try:
-            # 2. Clean Names
-            clean_vid_name = secure_filename(video_file.filename)
-            clean_thumb_name = secure_filename(thumb_file.filename)
-            
-            # 3. Storage Upload
-            print(f"[DEBUG] Saving video to Storage...")
-            video_url = storage_service.upload_file(video_file, clean_vid_name)
+            # 2. Storage Upload
+            if not video_url:
+                print(f"[DEBUG] Saving video to Storage...")
+                video_url = storage_service.upload_file(video_file, secure_filename(video_file.filename))
             print(f"[DEBUG] Video Saved: {video_url}")
             
-            print(f"[DEBUG] Saving thumbnail to Storage...")
-            thumb_url = storage_service.upload_file(thumb_file, clean_thumb_name)
-            print(f"[DEBUG] Thumbnail Saved: {thumb_url}")
-
-            if not video_url or not thumb_url:
-                print("[ERROR] Storage Service returned None!")
-                flash('Upload failed due to storage error.')
-                return redirect(request.url)
-
-            # 4. AI Analysis
-            print("[DEBUG] Running AI Analysis...")
-            bucket_name = os.environ.get('AWS_BUCKET_NAME', 'mock-bucket')
-            ai_tags = analyzer_service.detect_labels(bucket_name, thumb_url)
-            print(f"[DEBUG] AI Tags Found: {ai_tags}")
-            
-            # 5. Database Save
-            title = request.form.get('title')
-            tags = request.form.get('tags', '')
-            user_tag_list = [t.strip() for t in tags.split(',') if t.strip()]
-            final_tags = list(set(user_tag_list + ai_tags))
-            
-            print("[DEBUG] Saving to Database...")
-            db_service.put_video(
-                title=title,
-                description=request.form.get('description'),
-                tags=final_tags,
-                filename=video_url,
-                thumbnail_filename=thumb_url,
-                user_id=current_user.id
-            )
-            print("[SUCCESS] Database Entry Created!")
-
-            # 6. Notification
-            notifier_service.send_notification(
-                subject=f"New Upload: {title}",
-                message=f"User {current_user.username} uploaded video."
-            )
-
-            flash('Video uploaded successfully!')
-            return redirect(url_for('web.gallery'))
+            thumb_url = None
+            if thumb_file:
+                print(f"[DEBUG] Saving thumbnail to Storage...")
+                thumb_url = storage_service.upload_file(thumb_file, secure_filename(thumb_file.filename))
+                if not thumb_url:
+                    print("[ERROR] Storage Service returned None!")
+                    flash('Upload failed due to storage error.')
+                    return redirect(request.url)
+                print(f"[DEBUG] Thumbnail Saved: {thumb_url}")
+
+            return _finish_upload(video_url, thumb_url, request.form)
 
         except Exception as e:
             print(f"[CRITICAL ERROR] Exception during upload: {e}")
@@ -104,6 +94,108 @@ def upload():
 
     return render_template('upload.html')
 
+def _streaming_upload():
+    """
+    Reads the multipart body as it arrives and pipes each file part straight
+    into storage_service.upload_stream. Memory stays at ~one chunk per upload.
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary:
+        flash('Malformed upload.')
+        return redirect(request.url)
+
+    reader = MultipartStreamReader(
+        request.stream, boundary,
+        chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'],
+        max_field_size=current_app.config.get('MAX_FORM_MEMORY_SIZE') or 500 * 1024
+    )
+    form = {}
+    video_url = thumb_url = None
+
+    try:
+        for kind, name, value in reader.parts():
+            if kind == 'field':
+                form[name] = value
+                continue
+            if not value.filename:
+                continue
+
+            clean_name = secure_filename(value.filename)
+            if name in ('video', 'video_file'):
+                print(f"[DEBUG] Streaming video to Storage: '{clean_name}'")
+                video_url, size, checksum = storage_service.upload_stream(value.iter_chunks(), clean_name)
+                print(f"[DEBUG] Video Saved: {video_url} ({size} bytes, sha256={checksum})")
+            elif name in ('thumbnail', 'thumbnail_file'):
+                print(f"[DEBUG] Streaming thumbnail to Storage: '{clean_name}'")
+                thumb_url, size, checksum = storage_service.upload_stream(value.iter_chunks(), clean_name)
+                print(f"[DEBUG] Thumbnail Saved: {thumb_url} ({size} bytes)")
+
+        video_url = video_url or _completed_upload(form.get('video_upload'))
+        return _finish_upload(video_url, thumb_url, form)
+
+    except Exception as e:
+        print(f"[CRITICAL ERROR] Exception during streaming upload: {e}")
+        traceback.print_exc()
+        flash('An internal error occurred.')
+        return redirect(request.url)
+
+def _completed_upload(session_id):
+    """ Returns the stored filename of a finished /api/uploads session owned by the current user """
+    if not session_id:
+        return None
+    uploads = current_app.services['uploads']
+    session = uploads.get(session_id)
+    if not session or session['user_id'] != current_user.id or session['status'] != 'complete':
+        print(f"[ERROR] Upload session '{session_id}' is not a completed upload of this user")
+        return None
+    uploads.delete(session_id)
+    return session['filename']
+
+def _finish_upload(video_url, thumb_url, form):
+    """ Steps shared by both upload modes once the files are in storage """
+    if not video_url:
+        print("[ERROR] Storage Service returned None!")
+        flash('Upload failed due to storage error.')
+        return redirect(request.url)
+
+    # 4. Database Save (user tags now; AI tags are merged in by the 'analyze' job)
+    title = form.get('title')
+    tags = form.get('tags', '')
+    user_tag_list = list(dict.fromkeys(t.strip() for t in tags.split(',') if t.strip()))
+    
+    print("[DEBUG] Saving to Database...")
+    video_id = db_service.put_video(
+        title=title,
+        description=form.get('description'),
+        tags=user_tag_list,
+        filename=video_url,
+        thumbnail_filename=thumb_url,
+        user_id=current_user.id
+    )
+    if not video_id:
+        flash('Upload failed due to database error.')
+        return redirect(request.url)
+    print("[SUCCESS] Database Entry Created!")
+
+    # 5. Thumbnail variants, AI Analysis, HLS packaging + Notification run in the background job workers
+    #    (without an uploaded thumbnail, the analysis runs on the derived one)
+    job_queue.enqueue('thumbnails', {'video_id': video_id, 'thumbnail': thumb_url, 'video': video_url,
+                                     'analyze': not thumb_url})
+    if thumb_url:
+        job_queue.enqueue('analyze', {'video_id': video_id, 'thumbnail': thumb_url})
+    if current_app.config.get('HLS_ENABLED'):
+        job_queue.enqueue('hls', {'video_id': video_id, 'video': video_url})
+    # Due at the end of the current flush window, so a burst of uploads goes out as one batch
+    batch = current_app.config.get('NOTIFY_MODE', 'batch') != 'direct'
+    job_queue.enqueue('notify', {
+        'subject': f"New Upload: {title}",
+        'message': f"User {current_user.username} uploaded video."
+    }, delay=next_window(current_app.config.get('NOTIFY_FLUSH_INTERVAL', 0)) if batch else 0)
+    print(f"[DEBUG] Queued analysis + notification for {video_id}")
+
+    flash('Video uploaded successfully!')
+    return redirect(url_for('web.gallery'))
+
 @stream_bp.route('/watch/<video_id>')
 def watch(video_id):
     video = db_service.get_video(video_id)
@@ -119,12 +211,55 @@ def stream_file(filename):
     OR redirects to S3 URL (if running on AWS).
     """
     if os.environ.get('FLASK_ENV') == 'production':
+        if filename.endswith('.m3u8'):
+            return _s3_playlist(filename)
+
+        if current_app.config.get('S3_SIGNED_URLS'):
+            # AWS (private bucket): Redirect to a cached presigned URL.
+            # The redirect may be cached only as long as the URL stays in our cache.
+            url, max_age = storage_service.signed_url(filename, current_app.config['SIGNED_URL_EXPIRATION'])
+            response = redirect(url)
+            response.headers['Cache-Control'] = f"public, max-age={max_age}"
+            return response
+
         # AWS: Redirect to the public S3 URL
         bucket = os.environ.get('AWS_BUCKET_NAME')
         region = os.environ.get('AWS_REGION', 'us-east-1')
         s3_url = f"https://{bucket}.s3.{region}.amazonaws.com/{filename}"
-        return redirect(s3_url)
+        response = redirect(s3_url)
+        response.headers['Cache-Control'] = (_immutable_cache_control(filename)
+                                             or f"public, max-age={current_app.config['PUBLIC_URL_MAX_AGE']}")
+        return response
     else:
-        # Local: Serve from the 'mock_aws/local_s3' folder
+        # Local: Serve from the 'mock_aws/local_s3' folder (Range + conditional GET aware)
         directory = current_app.config['MOCK_MEDIA_FOLDER']
-        return send_from_directory(directory, filename)
\ No newline at end of file
+        max_age = current_app.config['IMMUTABLE_MAX_AGE'] if digest_of(filename) else None
+        return send_media(directory, filename, max_age=max_age)
+
+def _immutable_cache_control(filename):
+    """ Content-addressed keys (cas/<sha256>...) never change: cacheable forever """
+    if not digest_of(filename):
+        return None
+    return f"public, max-age={current_app.config['IMMUTABLE_MAX_AGE']}, immutable"
+
+def _s3_url(key):
+    """ Where /file/<key> sends the browser: back through /file (signed redirect) or straight to the public object """
+    if current_app.config.get('S3_SIGNED_URLS'):
+        return url_for('stream.stream_file', filename=key)
+    bucket = os.environ.get('AWS_BUCKET_NAME')
+    region = os.environ.get('AWS_REGION', 'us-east-1')
+    return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+
+def _s3_playlist(filename):
+    """
+    Serves an HLS playlist from the bucket with its entries rewritten to absolute URLs.
+    Relative entries would resolve against a presigned URL and fail its signature.
+    """
+    data = storage_service.read_file(filename)
+    if data is None:
+        abort(404)
+    body = rewrite_playlist(data.decode('utf-8'), posixpath.dirname(filename), _s3_url)
+    response = Response(body, mimetype='application/vnd.apple.mpegurl')
+    # VOD playlists never change, and the URLs inside them do not expire
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['PUBLIC_URL_MAX_AGE']}"
+    return response
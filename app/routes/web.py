@@ -1,10 +1,11 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from markupsafe import Markup
 
 # Import services
-from app.config_services import users_service, db_service, storage_service
+from app.config_services import users_service, db_service, media_storage, search_index, explore_feed, trending
 
 web_bp = Blueprint('web', __name__)
 
@@ -16,17 +17,31 @@ def home():
 @web_bp.route('/explore')
 def gallery():
     """ The Video Feed """
-    videos = db_service.get_all_videos()
     search_query = request.args.get('search', '').lower()
     
     if search_query:
-        videos = [
-            v for v in videos 
-            if search_query in v['title'].lower() or 
-            search_query in ' '.join(v.get('tags', [])).lower()
-        ]
+        videos = search_index.search(search_query)
+        return render_template('gallery.html', videos=videos, next_cursor=None)
+
+    if request.args.get('tab') == 'trending':
+        ranked = [video_id for video_id, _ in trending.top(current_app.config['TRENDING_SIZE'])]
+        return render_template('gallery.html', videos=db_service.get_videos(ranked), next_cursor=None, tab='trending')
+
+    # One page of the newest videos; '?cursor=' walks further back.
+    # Pages inside the materialized feed come pre-rendered; older ones are read from the DB.
+    cursor = request.args.get('cursor')
+    limit = current_app.config['FEED_PAGE_SIZE']
+    render = lambda videos, next_cursor: Markup(
+        render_template('_video_grid.html', videos=videos, next_cursor=next_cursor)
+    )
+    try:
+        grid = explore_feed.rendered('grid', cursor, limit, render)
+        if grid is None:
+            grid = render(*db_service.list_videos(cursor=cursor, limit=limit))
+    except ValueError:
+        abort(400)
     
-    return render_template('gallery.html', videos=videos)
+    return render_template('gallery.html', grid=grid)
 
 # --- NOTE: 'Watch' and 'Upload' are removed from here. ---
 # --- They are now handled in 'stream.py' to keep code clean. ---
@@ -34,10 +49,8 @@ def gallery():
 @web_bp.route('/admin')
 @login_required
 def admin():
-    # Admin/Profile Page
-    all_videos = db_service.get_all_videos()
-    # Filter for logged-in user
-    my_videos = [v for v in all_videos if v.get('user_id') == current_user.id]
+    # Admin/Profile Page (only the logged-in user's videos, via the user index)
+    my_videos = db_service.get_user_videos(current_user.id)
     return render_template('admin.html', videos=my_videos)
 
 @web_bp.route('/settings', methods=['GET', 'POST'])
@@ -58,7 +71,8 @@ def settings():
             elif avatar_file and avatar_file.filename:
                 safe_name = secure_filename(avatar_file.filename)
                 unique_name = f"avatar_{current_user.id}_{safe_name}"
-                avatar_filename = storage_service.upload_file(avatar_file, unique_name)
+                # Plain storage: avatars are per-user names, not refcounted content-addressed objects
+                avatar_filename = media_storage.upload_file(avatar_file, unique_name)
 
             success, msg = users_service.update_profile(current_user.id, new_username, avatar_filename)
             flash(msg, 'success' if success else 'error')
@@ -0,0 +1,5 @@
+import mimetypes
+
+# HLS files, for local serving and S3 Content-Type ('.ts' would otherwise be guessed as a Qt translation file)
+mimetypes.add_type('video/mp2t', '.ts')
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
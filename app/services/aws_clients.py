@@ -0,0 +1,55 @@
+import os
+import threading
+import boto3
+from botocore.config import Config as BotoConfig
+from config import Config
+
+# One boto3 session per process. Clients are built on first use and shared by every
+# service and thread of the worker (boto3 clients are thread-safe; building one means
+# loading its API model, which is what made worker boot slow).
+_lock = threading.Lock()
+_state = {'pid': None, 'session': None, 'cache': {}}
+
+
+def _session():
+    # Called with _lock held. Forked workers (Gunicorn --preload) must not reuse the parent's sockets.
+    if _state['pid'] != os.getpid():
+        _state.update(pid=os.getpid(), session=boto3.session.Session(), cache={})
+    return _state['session']
+
+
+def _config(max_pool_connections=None):
+    return BotoConfig(
+        max_pool_connections=max_pool_connections or getattr(Config, 'AWS_MAX_POOL_CONNECTIONS', 25),
+        retries={'max_attempts': 5, 'mode': 'standard'}
+    )
+
+
+def client(service, endpoint_url=None, max_pool_connections=None):
+    """The process-wide client for 'service' (in AWS_REGION), created on first call"""
+    region = os.environ.get('AWS_REGION', 'us-east-1')
+    key = ('client', service, region, endpoint_url, max_pool_connections)
+    with _lock:
+        session = _session()
+        if key not in _state['cache']:
+            _state['cache'][key] = session.client(
+                service, region_name=region, endpoint_url=endpoint_url, config=_config(max_pool_connections)
+            )
+        return _state['cache'][key]
+
+
+def resource(service):
+    """The process-wide resource (e.g. 'dynamodb') for 'service' in AWS_REGION, created on first call"""
+    region = os.environ.get('AWS_REGION', 'us-east-1')
+    key = ('resource', service, region)
+    with _lock:
+        session = _session()
+        if key not in _state['cache']:
+            _state['cache'][key] = session.resource(service, region_name=region, config=_config())
+        return _state['cache'][key]
+
+
+def reset():
+    """Drops the session and every client (e.g. after credentials changed)"""
+    with _lock:
+        _state.update(pid=None, session=None, cache={})
@@ -1,43 +1,424 @@
-import boto3
+import math
 import uuid
 import os
+import mimetypes
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from datetime import datetime
-from botocore.exceptions import ClientError
+from decimal import Decimal
+from botocore.exceptions import ClientError, BotoCoreError
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
 from werkzeug.security import generate_password_hash, check_password_hash
-from app.services.base import StorageService, VideoDBService, UsersService, NotificationService, AnalyzerService
+from app.services.base import StorageService, VideoDBService, UsersService, NotificationService, AnalyzerService, merge_labels
+from app.services.streaming import ChunkStream, HashingReader, iter_chunks
+from app.services.cache import TTLCache
+from app.services.pagination import encode_cursor, decode_cursor
+from app.services.cas import digest_of, CLAIM_TIMEOUT
+from app.services.trending import TrendingIndex, MIN_SCORE, log_add, log_sub
+from app.services import aws_clients
 from app.models import User
 from config import Config  # <--- NEW IMPORT
+from boto3.dynamodb.conditions import Key, Attr
+
+def _content_type(filename):
+    # Browsers / HLS players rely on it (S3 would default to binary/octet-stream)
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def _object_headers(filename):
+    headers = {'ContentType': _content_type(filename)}
+    if digest_of(filename):
+        # Content-addressed keys never change content: let browsers / CDNs keep them forever
+        headers['CacheControl'] = 'public, max-age=31536000, immutable'
+    return headers
+
+def _s3_client():
+    # Shared by S3Storage and RekognitionAnalyzer (ETag lookups): one pool per worker
+    return aws_clients.client(
+        's3',
+        endpoint_url=getattr(Config, 'S3_ENDPOINT_URL', None),
+        max_pool_connections=max(getattr(Config, 'S3_MAX_POOL_CONNECTIONS', 50),
+                                 getattr(Config, 'S3_TRANSFER_CONCURRENCY', 10))
+    )
 
 # --- 1. S3 STORAGE ---
-class S3Storage:
+class S3Storage(StorageService):
+    """
+    Objects live in AWS_BUCKET_NAME (or any S3-compatible endpoint: S3_ENDPOINT_URL).
+
+    One client per process (aws_clients), created on first use and shared by all
+    request threads: boto3 clients are thread-safe, and its connection pool
+    (S3_MAX_POOL_CONNECTIONS) keeps TLS connections warm across uploads. Uploads go through the transfer manager:
+    parts of one file are sent S3_TRANSFER_CONCURRENCY at a time, which is
+    what lets a single upload fill the instance's bandwidth.
+    """
     def __init__(self):
-        # We save files to the 'static/uploads' folder on the server
-        self.upload_folder = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
-        if not os.path.exists(self.upload_folder):
-            os.makedirs(self.upload_folder)
+        self.bucket = os.environ.get('AWS_BUCKET_NAME')
+        self.part_size = max(getattr(Config, 'UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024), 5 * 1024 * 1024)
+        concurrency = getattr(Config, 'S3_TRANSFER_CONCURRENCY', 10)
+        self.transfer = TransferConfig(
+            multipart_threshold=self.part_size,
+            multipart_chunksize=self.part_size,
+            max_concurrency=concurrency,
+            use_threads=concurrency > 1
+        )
+        self._url_cache = TTLCache(maxsize=getattr(Config, 'SIGNED_URL_CACHE_SIZE', 10000))
+
+    @cached_property
+    def s3(self):
+        return _s3_client()
 
     def upload_file(self, file_obj, filename):
-        """Saves file to local disk instead of S3"""
-        filename = secure_filename(filename)
-        file_path = os.path.join(self.upload_folder, filename)
-        
-        # Save the file
-        file_obj.save(file_path)
-        return filename
+        """Uploads a file object (or Werkzeug FileStorage) to the bucket; returns the key"""
+        stream = getattr(file_obj, 'stream', file_obj)
+        try:
+            # (Werkzeug's SpooledTemporaryFile has no seekable() before Python 3.11)
+            stream.seek(0)
+        except (AttributeError, OSError):
+            pass  # not seekable: upload from where it is
+        try:
+            self.s3.upload_fileobj(stream, self.bucket, filename,
+                                   ExtraArgs=_object_headers(filename), Config=self.transfer)
+            return filename
+        except (ClientError, BotoCoreError, S3UploadFailedError) as e:
+            print(f"[ERROR] S3 upload failed for {filename}: {e}")
+            return None
+
+    def upload_stream(self, chunks, filename):
+        """
+        Streams chunks into the bucket without holding the file: small files are
+        a single PUT, larger ones a multipart upload whose parts are sent in
+        parallel (memory ~ part_size x S3_TRANSFER_CONCURRENCY).
+        """
+        reader = HashingReader(iter_chunks(chunks, self.part_size))
+        try:
+            self.s3.upload_fileobj(ChunkStream(reader), self.bucket, filename,
+                                   ExtraArgs=_object_headers(filename), Config=self.transfer)
+            return filename, reader.size, reader.hexdigest()
+        except Exception as e:
+            # The transfer manager aborts the multipart upload itself
+            print(f"[ERROR] S3 streaming upload failed: {e}")
+            return None, 0, None
+
+    def copy_file(self, source, dest):
+        """Server-side copy (multipart UploadPartCopy for large objects): no bytes pass through us"""
+        try:
+            self.s3.copy({'Bucket': self.bucket, 'Key': source}, self.bucket, dest,
+                         ExtraArgs={**_object_headers(dest), 'MetadataDirective': 'REPLACE'},
+                         Config=self.transfer)
+            return dest
+        except (ClientError, BotoCoreError) as e:
+            print(f"[ERROR] S3 copy {source} -> {dest} failed: {e}")
+            return None
+
+    def _upload_part(self, key, upload_id, part_number, data, attempts=3):
+        """Uploads one part, retrying just that part with exponential backoff"""
+        for attempt in range(1, attempts + 1):
+            try:
+                response = self.s3.upload_part(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=data
+                )
+                return {'PartNumber': part_number, 'ETag': response['ETag']}
+            except (ClientError, BotoCoreError) as e:
+                if attempt == attempts:
+                    raise
+                print(f"[WARN] Part {part_number} of {key} failed ({e}), retry {attempt}/{attempts - 1}")
+                time.sleep(0.5 * 2 ** (attempt - 1))
+
+    def read_file(self, filename):
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=filename)['Body'].read()
+        except ClientError as e:
+            print(f"[ERROR] S3 get_object failed for {filename}: {e}")
+            return None
+
+    def media_source(self, filename):
+        # ffmpeg reads the object over HTTPS (Range requests), so the bucket can stay private
+        return self.signed_url(filename, 3600)[0]
+
+    def exists(self, filename):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=filename)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete_file(self, filename):
+        try:
+            self.s3.delete_object(Bucket=self.bucket, Key=filename)
+            return True
+        except ClientError as e:
+            print(f"[ERROR] S3 delete_object failed for {filename}: {e}")
+            return False
+
+    # --- Resumable uploads (native S3 multipart) ---
+    def create_multipart_upload(self, filename):
+        return self.s3.create_multipart_upload(Bucket=self.bucket, Key=filename)['UploadId']
+
+    def upload_part(self, filename, upload_id, part_number, chunks):
+        data = b''.join(iter_chunks(chunks))
+        return self._upload_part(filename, upload_id, int(part_number), data)['ETag']
+
+    def list_parts(self, filename, upload_id):
+        parts = []
+        paginator = self.s3.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=filename, UploadId=upload_id):
+            for part in page.get('Parts', []):
+                parts.append({'PartNumber': part['PartNumber'], 'ETag': part['ETag'], 'Size': part['Size']})
+        return parts
+
+    def complete_multipart_upload(self, filename, upload_id, parts):
+        try:
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=filename, UploadId=upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': p['PartNumber'], 'ETag': p['ETag']}
+                    for p in sorted(parts, key=lambda p: p['PartNumber'])
+                ]}
+            )
+            return filename
+        except ClientError as e:
+            print(f"[ERROR] S3 complete_multipart_upload failed: {e}")
+            return None
+
+    def abort_multipart_upload(self, filename, upload_id):
+        try:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=filename, UploadId=upload_id)
+        except ClientError as e:
+            print(f"[WARN] S3 abort_multipart_upload failed: {e}")
 
     def generate_presigned_url(self, object_name, expiration=3600):
-        """Returns the local web path for the image"""
-        # Returns: /static/uploads/filename.jpg
-        return f"/static/uploads/{object_name}"
+        """Returns a signed GET URL for a private object (cached, see signed_url)"""
+        return self.signed_url(object_name, expiration)[0]
+
+    def signed_url(self, object_name, expiration=3600):
+        """
+        Returns (url, seconds_the_url_may_still_be_cached).
+        URLs are reused from an LRU until shortly before their signature expires,
+        so a gallery page full of thumbnails signs each object once per window.
+        """
+        key = (object_name, expiration)
+        url = self._url_cache.get(key)
+        if url is None:
+            url = self.s3.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket, 'Key': object_name},
+                ExpiresIn=expiration
+            )
+            margin = getattr(Config, 'SIGNED_URL_EXPIRY_MARGIN', 300)
+            self._url_cache.set(key, url, ttl=max(expiration - margin, 0))
+        return url, int(self._url_cache.ttl_remaining(key))
     
+# --- DYNAMO HELPERS ---
+def _to_dynamo(value):
+    """DynamoDB rejects Python floats: imported records get Decimals instead"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    return value
+
+def _read_all_pages(operation, **kwargs):
+    """Runs a table.query / table.scan and follows LastEvaluatedKey until the end"""
+    items = []
+    while True:
+        response = operation(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        kwargs['ExclusiveStartKey'] = last_key
+
+def _parallel_scan(table, segments=1, **kwargs):
+    """
+    Yields every item of the table. With segments > 1 the table is read as that many
+    Segment/TotalSegments scans on a thread pool; pages are handed over through a
+    bounded queue, so memory stays at a few pages whatever the table size.
+    """
+    if segments <= 1:
+        while True:
+            response = table.scan(**kwargs)
+            yield from response.get('Items', [])
+            if not response.get('LastEvaluatedKey'):
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    pages = queue.Queue(maxsize=segments * 2)
+    stop = threading.Event()
+
+    def scan_segment(segment):
+        args = dict(kwargs, Segment=segment, TotalSegments=segments)
+        try:
+            while not stop.is_set():
+                response = table.scan(**args)
+                pages.put(response.get('Items', []))
+                if not response.get('LastEvaluatedKey'):
+                    break
+                args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(None)
+
+    with ThreadPoolExecutor(max_workers=segments, thread_name_prefix='scan') as pool:
+        for segment in range(segments):
+            pool.submit(scan_segment, segment)
+        try:
+            done = 0
+            while done < segments:
+                page = pages.get()
+                if page is None:
+                    done += 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            # Consumer stopped early (or failed): let the scanners finish their current page and exit
+            stop.set()
+            while done < segments:
+                if pages.get() is None:
+                    done += 1
+
+def _batch_write(table_name, items, attempts=8):
+    """
+    BatchWriteItem, 25 puts per call; unprocessed items are re-sent with exponential backoff.
+    Returns how many items (from the start of the list) were written.
+    """
+    resource = aws_clients.resource('dynamodb')
+    for start in range(0, len(items), 25):
+        pending = {table_name: [{'PutRequest': {'Item': item}} for item in items[start:start + 25]]}
+        for attempt in range(attempts):
+            try:
+                pending = resource.batch_write_item(RequestItems=pending).get('UnprocessedItems')
+            except ClientError as e:
+                print(f"[ERROR] DynamoDB batch_write_item failed: {e}")
+                return start
+            if not pending:
+                break
+            time.sleep(min(0.05 * 2 ** attempt, 2))
+        else:
+            print(f"[ERROR] DynamoDB kept {len(pending[table_name])} item(s) unprocessed, giving up")
+            return start
+    return len(items)
+
+def _is_missing_index(error):
+    return error.response.get('Error', {}).get('Code') == 'ValidationException'
+
+def ensure_indexes(table, indexes, wait=False):
+    """
+    Creates any GSI in 'indexes' that the table does not have yet.
+    DynamoDB only accepts one new GSI per UpdateTable call and backfills it on its own.
+    Returns the names of the indexes that were created.
+    """
+    created = []
+    for index in indexes:
+        table.reload()
+        existing = {gsi['IndexName'] for gsi in (table.global_secondary_indexes or [])}
+        if index['IndexName'] in existing:
+            continue
+
+        create = {
+            'IndexName': index['IndexName'],
+            'KeySchema': index['KeySchema'],
+            'Projection': {'ProjectionType': 'ALL'}
+        }
+        billing = (table.billing_mode_summary or {}).get('BillingMode', 'PROVISIONED')
+        if billing == 'PROVISIONED':
+            create['ProvisionedThroughput'] = {
+                'ReadCapacityUnits': table.provisioned_throughput['ReadCapacityUnits'],
+                'WriteCapacityUnits': table.provisioned_throughput['WriteCapacityUnits']
+            }
+
+        print(f"[INFO] Creating index {index['IndexName']} on {table.name}")
+        table.meta.client.update_table(
+            TableName=table.name,
+            AttributeDefinitions=index['AttributeDefinitions'],
+            GlobalSecondaryIndexUpdates=[{'Create': create}]
+        )
+        created.append(index['IndexName'])
+        if wait:
+            _wait_for_index(table, index['IndexName'])
+    return created
+
+def _wait_for_index(table, index_name, delay=10):
+    while True:
+        table.reload()
+        status = next((gsi.get('IndexStatus') for gsi in (table.global_secondary_indexes or [])
+                       if gsi['IndexName'] == index_name), None)
+        if status in (None, 'ACTIVE'):
+            return
+        print(f"[INFO] Waiting for {index_name} ({status})...")
+        time.sleep(delay)
+
 # --- 2. DYNAMO VIDEO DB ---
 class DynamoDBService(VideoDBService):
+    # user_id + upload_date: a user's videos, newest first, without a table scan
+    USER_INDEX = getattr(Config, 'DYNAMO_VIDEO_USER_INDEX', 'user_id-upload_date-index')
+    # feed + created_at: the whole catalog in upload order, read page by page.
+    # Every video carries the same 'feed' value, so one partition holds the global timeline.
+    FEED_INDEX = getattr(Config, 'DYNAMO_VIDEO_FEED_INDEX', 'feed-created_at-index')
+    FEED_KEY = 'ALL'
+    FEED_CURSOR_KEYS = {'feed', 'created_at', 'video_id'}
+    INDEXES = [{
+        'IndexName': USER_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'upload_date', 'KeyType': 'RANGE'}
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'upload_date', 'AttributeType': 'S'}
+        ]
+    }, {
+        'IndexName': FEED_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'feed', 'KeyType': 'HASH'},
+            {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'feed', 'AttributeType': 'S'},
+            {'AttributeName': 'created_at', 'AttributeType': 'S'}
+        ]
+    }]
+
     def __init__(self):
-        table_name = os.environ.get('DYNAMO_TABLE_VIDEO')
-        region = os.environ.get('AWS_REGION', 'us-east-1')
-        self.dynamodb = boto3.resource('dynamodb', region_name=region)
-        self.table = self.dynamodb.Table(table_name)
-        print(f"[INFO] DynamoDBService initialized: table={table_name}")
+        self.table_name = os.environ.get('DYNAMO_TABLE_VIDEO')
+        print(f"[INFO] DynamoDBService initialized: table={self.table_name}")
+
+    @cached_property
+    def table(self):
+        return aws_clients.resource('dynamodb').Table(self.table_name)
+
+    def ensure_indexes(self, wait=False):
+        return ensure_indexes(self.table, self.INDEXES, wait)
+
+    def backfill(self):
+        """
+        Gives old items the attributes the indexes are keyed on.
+        Items without a GSI key attribute are silently left out of that index.
+        Returns the number of items updated.
+        """
+        missing = _read_all_pages(
+            self.table.scan,
+            FilterExpression=Attr('upload_date').not_exists() | Attr('feed').not_exists() | Attr('created_at').not_exists(),
+            ProjectionExpression='video_id, upload_date'
+        )
+        for item in missing:
+            upload_date = item.get('upload_date') or '1970-01-01'
+            self.table.update_item(
+                Key={'video_id': item['video_id']},
+                UpdateExpression="SET upload_date = :d, feed = :f, created_at = if_not_exists(created_at, :c)",
+                ExpressionAttributeValues={':d': upload_date, ':f': self.FEED_KEY, ':c': f"{upload_date}T00:00:00"}
+            )
+        return len(missing)
     
     def put_video(self, title, description, tags, filename, user_id, thumbnail_filename=None):
         try:
@@ -48,7 +429,8 @@ class DynamoDBService(VideoDBService):
             else:
                 tag_list = tags if isinstance(tags, list) else []
             
-            upload_date = datetime.now().strftime("%Y-%m-%d")
+            now = datetime.now()
+            upload_date = now.strftime("%Y-%m-%d")
 
             item = {
                 'video_id': video_id,
@@ -59,48 +441,275 @@ class DynamoDBService(VideoDBService):
                 'filename': filename,
                 'thumbnail': thumbnail_filename,
                 'upload_date': upload_date,
+                'created_at': now.isoformat(timespec='microseconds'),
+                'feed': self.FEED_KEY,
                 'views': 0,
                 'likes': 0
             }
             self.table.put_item(Item=item)
+            self._publish('put', item)
             return video_id
         except ClientError as e:
             print(f"[ERROR] DynamoDB put_item failed: {e}")
             return None
     
+    def put_videos(self, videos):
+        items = {}
+        for video in videos:
+            item = _to_dynamo(self._complete_record(video))
+            item['feed'] = self.FEED_KEY
+            # toggle_like keeps 'liked_by' as a string set (exports / the mock backend have a list);
+            # DynamoDB has no empty sets
+            if item.get('liked_by'):
+                item['liked_by'] = set(item['liked_by'])
+            else:
+                item.pop('liked_by', None)
+            items[item['video_id']] = item  # a batch may not hold the same key twice
+        items = list(items.values())
+        written = _batch_write(self.table_name, items)
+        for item in items[:written]:
+            self._publish('put', item)
+        return written
+
+    def scan_videos(self, segments=1):
+        return _parallel_scan(self.table, segments)
+
     def get_all_videos(self):
         try:
-            response = self.table.scan()
-            items = response.get('Items', [])
+            items = _read_all_pages(self.table.scan)
             items.sort(key=lambda x: x.get('upload_date', ''), reverse=True)
             return items
         except ClientError as e:
             print(f"[ERROR] DynamoDB scan failed: {e}")
             return []
 
+    def list_videos(self, cursor=None, limit=20):
+        kwargs = {
+            'IndexName': self.FEED_INDEX,
+            'KeyConditionExpression': Key('feed').eq(self.FEED_KEY),
+            'ScanIndexForward': False,
+            'Limit': limit
+        }
+        start_key = decode_cursor(cursor)
+        if start_key:
+            # Only keys feed_cursor / the index query issued; anything else would fail inside DynamoDB
+            if set(start_key) != self.FEED_CURSOR_KEYS or start_key['feed'] != self.FEED_KEY:
+                raise ValueError("Invalid cursor")
+            kwargs['ExclusiveStartKey'] = start_key
+        try:
+            response = self.table.query(**kwargs)
+            return response.get('Items', []), encode_cursor(response.get('LastEvaluatedKey'))
+        except ClientError as e:
+            if not _is_missing_index(e):
+                print(f"[ERROR] DynamoDB feed query failed: {e}")
+                return [], None
+            # Index not created yet (run 'flask db create-indexes'): slow path, same order and cursors
+            print(f"[WARN] {self.FEED_INDEX} missing, falling back to a table scan")
+            items = _read_all_pages(self.table.scan,
+                                    FilterExpression=Attr('feed').eq(self.FEED_KEY) & Attr('created_at').exists())
+            items.sort(key=lambda x: (x['created_at'], x['video_id']), reverse=True)
+            if start_key:
+                position = (start_key['created_at'], start_key['video_id'])
+                items = [v for v in items if (v['created_at'], v['video_id']) < position]
+            page = items[:limit]
+            return page, self.feed_cursor(page[-1]) if len(items) > limit else None
+
+    def feed_cursor(self, video):
+        # Same shape as the index query's LastEvaluatedKey
+        return encode_cursor({'feed': self.FEED_KEY, 'created_at': video['created_at'], 'video_id': video['video_id']})
+
     def get_video(self, video_id):
         try:
             response = self.table.get_item(Key={'video_id': video_id})
             return response.get('Item')
         except ClientError:
             return None
+
+    def get_videos(self, video_ids, attempts=8):
+        """BatchGetItem, 100 keys per call; unprocessed keys are re-requested with backoff"""
+        video_ids = list(dict.fromkeys(video_ids))
+        resource = aws_clients.resource('dynamodb')
+        found = {}
+        for start in range(0, len(video_ids), 100):
+            pending = {self.table_name: {'Keys': [{'video_id': vid} for vid in video_ids[start:start + 100]]}}
+            for attempt in range(attempts):
+                try:
+                    response = resource.batch_get_item(RequestItems=pending)
+                except ClientError as e:
+                    print(f"[ERROR] DynamoDB batch_get_item failed: {e}")
+                    break
+                found.update((item['video_id'], item) for item in response['Responses'].get(self.table_name, []))
+                pending = response.get('UnprocessedKeys')
+                if not pending:
+                    break
+                time.sleep(min(0.05 * 2 ** attempt, 2))
+        return [found[vid] for vid in video_ids if vid in found]
+
+    def increment_views(self, video_id, amount=1):
+        try:
+            response = self.table.update_item(
+                Key={'video_id': video_id},
+                UpdateExpression="ADD #views :n",
+                ConditionExpression="attribute_exists(video_id)",
+                ExpressionAttributeNames={'#views': 'views'},
+                ExpressionAttributeValues={':n': amount},
+                ReturnValues='UPDATED_NEW'
+            )
+        except ClientError as e:
+            # Throttling / timeouts propagate: the ViewCounter keeps the views and retries them
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return None
+        views = int(response['Attributes']['views'])
+        self._publish('counters', {'video_id': video_id, 'views': views})
+        return views
+
+    def toggle_like(self, video_id, user_id):
+        """
+        One conditional UpdateItem per direction: 'liked_by' (a string set) and
+        'likes' change together, so concurrent toggles can never drift apart.
+        """
+        attempts = (
+            (True, "ADD liked_by :u, likes :delta", "attribute_exists(video_id) AND NOT contains(liked_by, :uid)", 1),
+            (False, "DELETE liked_by :u ADD likes :delta", "contains(liked_by, :uid)", -1)
+        )
+        for liked, update, condition, delta in attempts:
+            try:
+                response = self.table.update_item(
+                    Key={'video_id': video_id},
+                    UpdateExpression=update,
+                    ConditionExpression=condition,
+                    ExpressionAttributeValues={':u': {user_id}, ':uid': user_id, ':delta': delta},
+                    ReturnValues='UPDATED_NEW'
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                    continue
+                print(f"[ERROR] DynamoDB like toggle failed: {e}")
+                return None, None
+            likes = int(response['Attributes']['likes'])
+            self._publish('counters', {'video_id': video_id, 'likes': likes})
+            return liked, likes
+        return None, None
+
+    def update_video(self, video_id, fields):
+        names = {f"#f{i}": name for i, name in enumerate(fields)}
+        values = {f":v{i}": value for i, value in enumerate(fields.values())}
+        try:
+            response = self.table.update_item(
+                Key={'video_id': video_id},
+                UpdateExpression="SET " + ", ".join(f"#f{i} = :v{i}" for i in range(len(fields))),
+                ConditionExpression="attribute_exists(video_id)",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"[ERROR] DynamoDB video update failed: {e}")
+            return None
+        video = response['Attributes']
+        self._publish('update', video)
+        return video
+
+    def add_tags(self, video_id, tags, attempts=5):
+        """
+        'tags' is a list attribute, so merging is read -> merge -> conditional write
+        (only if the list is still the one we read); retried when another writer won.
+        """
+        for _ in range(attempts):
+            video = self.get_video(video_id)
+            if not video:
+                return None
+            current = list(video.get('tags') or [])
+            merged = current + [t for t in dict.fromkeys(tags) if t not in current]
+            if merged == current:
+                return video
+            try:
+                response = self.table.update_item(
+                    Key={'video_id': video_id},
+                    UpdateExpression="SET tags = :new",
+                    ConditionExpression="attribute_not_exists(tags) OR tags = :old",
+                    ExpressionAttributeValues={':new': merged, ':old': current},
+                    ReturnValues='ALL_NEW'
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                    continue
+                print(f"[ERROR] DynamoDB tag update failed: {e}")
+                return None
+            video = response['Attributes']
+            self._publish('update', video)
+            return video
+        print(f"[ERROR] Gave up merging tags into {video_id} after {attempts} conflicting writes")
+        return None
+
+    def set_labels(self, video_id, labels, attempts=5):
+        """Same read -> merge -> conditional write as add_tags, on 'tags' and 'labels' together"""
+        for _ in range(attempts):
+            video = self.get_video(video_id)
+            if not video:
+                return None
+            current = {'tags': video.get('tags'), 'labels': video.get('labels')}
+            merged = merge_labels(dict(video), labels)
+            if all(merged[name] == list(value or []) for name, value in current.items()):
+                return video
+            condition = " AND ".join(f"attribute_not_exists({name})" if value is None else f"{name} = :old_{name}"
+                                     for name, value in current.items())
+            values = {f":old_{name}": value for name, value in current.items() if value is not None}
+            try:
+                response = self.table.update_item(
+                    Key={'video_id': video_id},
+                    UpdateExpression="SET tags = :tags, labels = :labels",
+                    ConditionExpression=f"attribute_exists(video_id) AND {condition}",
+                    ExpressionAttributeValues=dict(values, **{':tags': merged['tags'], ':labels': merged['labels']}),
+                    ReturnValues='ALL_NEW'
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                    continue
+                print(f"[ERROR] DynamoDB label update failed: {e}")
+                return None
+            video = response['Attributes']
+            self._publish('update', video)
+            return video
+        print(f"[ERROR] Gave up relabelling {video_id} after {attempts} conflicting writes")
+        return None
             
     def get_user_videos(self, user_id):
-        from boto3.dynamodb.conditions import Attr
         try:
-            response = self.table.scan(FilterExpression=Attr('user_id').eq(user_id))
-            return response.get('Items', [])
-        except ClientError:
-            return []
+            return _read_all_pages(
+                self.table.query,
+                IndexName=self.USER_INDEX,
+                KeyConditionExpression=Key('user_id').eq(user_id),
+                ScanIndexForward=False
+            )
+        except ClientError as e:
+            if not _is_missing_index(e):
+                return []
+            # Index not created yet (run 'flask db create-indexes'): slow path
+            print(f"[WARN] {self.USER_INDEX} missing, falling back to a table scan")
+            items = _read_all_pages(self.table.scan, FilterExpression=Attr('user_id').eq(user_id))
+            items.sort(key=lambda x: x.get('upload_date', ''), reverse=True)
+            return items
 
 # --- 3. DYNAMO USERS ---
 class DynamoUsers(UsersService):
+    # email -> user: login and signup look users up without a table scan
+    EMAIL_INDEX = getattr(Config, 'DYNAMO_USER_EMAIL_INDEX', 'email-index')
+    INDEXES = [{
+        'IndexName': EMAIL_INDEX,
+        'KeySchema': [{'AttributeName': 'email', 'KeyType': 'HASH'}],
+        'AttributeDefinitions': [{'AttributeName': 'email', 'AttributeType': 'S'}]
+    }]
+
     def __init__(self):
-        table_name = os.environ.get('DYNAMO_TABLE_USER')
-        region = os.environ.get('AWS_REGION', 'us-east-1')
-        self.dynamodb = boto3.resource('dynamodb', region_name=region)
-        self.table = self.dynamodb.Table(table_name)
-        print(f"[INFO] DynamoUsers initialized: table={table_name}")
+        self.table_name = os.environ.get('DYNAMO_TABLE_USER')
+        print(f"[INFO] DynamoUsers initialized: table={self.table_name}")
+
+    @cached_property
+    def table(self):
+        return aws_clients.resource('dynamodb').Table(self.table_name)
 
     def create_user(self, email, username, password):
         if self.get_user_by_email(email):
@@ -124,6 +733,18 @@ class DynamoUsers(UsersService):
             print(f"[ERROR] Create user failed: {e}")
             return None, "Database error."
 
+    def scan_users(self, segments=1):
+        for item in _parallel_scan(self.table, segments):
+            yield {k: item.get(k) for k in ('user_id', 'email', 'username', 'password_hash', 'avatar')}
+
+    def import_users(self, users):
+        items = {}
+        for u in users:
+            user_id = u.get('user_id') or u.get('id')
+            items[user_id] = {'user_id': user_id, 'email': u['email'], 'username': u.get('username'),
+                              'password_hash': u.get('password_hash'), 'avatar': u.get('avatar')}
+        return _batch_write(self.table_name, list(items.values()))
+
     def validate_login(self, email, password):
         user_data = self.get_user_by_email(email)
         if not user_data:
@@ -140,14 +761,25 @@ class DynamoUsers(UsersService):
         
         return None, "Incorrect password."
 
+    def ensure_indexes(self, wait=False):
+        return ensure_indexes(self.table, self.INDEXES, wait)
+
     def get_user_by_email(self, email):
         try:
-            from boto3.dynamodb.conditions import Attr
-            response = self.table.scan(FilterExpression=Attr('email').eq(email))
+            response = self.table.query(
+                IndexName=self.EMAIL_INDEX,
+                KeyConditionExpression=Key('email').eq(email),
+                Limit=1
+            )
             items = response.get('Items', [])
             return items[0] if items else None
-        except ClientError:
-            return None
+        except ClientError as e:
+            if not _is_missing_index(e):
+                return None
+            # Index not created yet (run 'flask db create-indexes'): slow path
+            print(f"[WARN] {self.EMAIL_INDEX} missing, falling back to a table scan")
+            items = _read_all_pages(self.table.scan, FilterExpression=Attr('email').eq(email))
+            return items[0] if items else None
 
     def get_user_by_id(self, user_id):
         try:
@@ -199,11 +831,14 @@ class DynamoUsers(UsersService):
 # --- 4. SNS NOTIFIER (NEW) ---
 class SNSNotifier(NotificationService):
     def __init__(self):
-        self.sns = boto3.client('sns', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
         # Get ARN from Config
         self.topic_arn = getattr(Config, 'SNS_TOPIC_ARN', None)
         print(f"[INFO] SNSNotifier initialized for Topic: {self.topic_arn}")
 
+    @cached_property
+    def sns(self):
+        return aws_clients.client('sns')
+
     def send_notification(self, subject, message):
         if not self.topic_arn:
             print("[WARN] No SNS_TOPIC_ARN set. Skipping notification.")
@@ -216,21 +851,89 @@ class SNSNotifier(NotificationService):
                 Message=message
             )
             print(f"[INFO] SNS Notification sent: {subject}")
+            return True
         except ClientError as e:
             print(f"[ERROR] Failed to send SNS: {e}")
+            return False
+
+    def send_batch(self, messages):
+        """Publishes up to 10 messages per PublishBatch call; returns the indexes that failed"""
+        if not self.topic_arn:
+            print("[WARN] No SNS_TOPIC_ARN set. Skipping notifications.")
+            return []
+
+        failed = []
+        for start in range(0, len(messages), 10):
+            entries = [
+                {'Id': str(i), 'Subject': subject, 'Message': message}
+                for i, (subject, message) in enumerate(messages[start:start + 10], start)
+            ]
+            try:
+                response = self.sns.publish_batch(TopicArn=self.topic_arn, PublishBatchRequestEntries=entries)
+            except ClientError as e:
+                print(f"[ERROR] Failed to send SNS batch: {e}")
+                failed.extend(int(entry['Id']) for entry in entries)
+                continue
+            for entry in response.get('Failed', []):
+                print(f"[ERROR] SNS batch entry failed: {entry.get('Code')} {entry.get('Message')}")
+                failed.append(int(entry['Id']))
+        print(f"[INFO] SNS batch sent: {len(messages) - len(failed)}/{len(messages)}")
+        return failed
 
 # --- 5. REKOGNITION ANALYZER (NEW) ---
 class RekognitionAnalyzer(AnalyzerService):
-    def __init__(self):
+    """
+    Label detection with a content-hash cache.
+
+    Results are cached under the object's ETag (a hash of its bytes), so a
+    re-uploaded or duplicated thumbnail is never sent to Rekognition twice.
+    The cache is a per-worker TTLCache plus the optional SharedCache (memcached).
+    Rekognition has no multi-image DetectLabels call, so detect_labels_batch
+    dedupes the batch by content and runs the remaining calls on a bounded
+    thread pool.
+    """
+    def __init__(self, shared=None):
         self.region = os.environ.get('AWS_REGION', 'us-east-1')
-        self.client = boto3.client('rekognition', region_name=self.region)
-        print(f"[INFO] Rekognition Connected in {self.region}")
+        self.shared = shared
+        self.cache_ttl = getattr(Config, 'REKOGNITION_CACHE_TTL', 30 * 24 * 3600)
+        self.concurrency = getattr(Config, 'REKOGNITION_CONCURRENCY', 8)
+        self._cache = TTLCache(maxsize=getattr(Config, 'REKOGNITION_CACHE_SIZE', 10000), ttl=self.cache_ttl)
+        print(f"[INFO] RekognitionAnalyzer initialized in {self.region}")
 
-    def detect_labels(self, bucket, filename, max_labels=5):
+    @cached_property
+    def client(self):
+        return aws_clients.client('rekognition')
+
+    @cached_property
+    def s3(self):
+        return _s3_client()
+
+    def _content_hash(self, bucket, filename):
+        """The object's ETag, or None if it cannot be read (then the result is not cached)"""
+        try:
+            return self.s3.head_object(Bucket=bucket, Key=filename)['ETag'].strip('"')
+        except ClientError as e:
+            print(f"[WARN] Could not read ETag of {bucket}/{filename}: {e}")
+            return None
+
+    def _cache_key(self, content_hash, max_labels, min_confidence):
+        return f"labels:{content_hash}:{max_labels}:{min_confidence}"
+
+    def _cached(self, key):
+        labels = self._cache.get(key)
+        if labels is None and self.shared:
+            labels = self.shared.get(key)
+            if labels is not None:
+                self._cache.set(key, labels)
+        return labels
+
+    def _store(self, key, labels):
+        self._cache.set(key, labels)
+        if self.shared:
+            self.shared.set(key, labels, self.cache_ttl)
+
+    def _call(self, bucket, filename, max_labels, min_confidence):
         try:
-            # Use Config for confidence level
-            min_confidence = getattr(Config, 'REKOGNITION_MIN_CONFIDENCE', 75)
-            
             response = self.client.detect_labels(
                 Image={
                     'S3Object': {
@@ -247,4 +950,289 @@ class RekognitionAnalyzer(AnalyzerService):
             
         except ClientError as e:
             print(f"[ERROR] Rekognition Failed: {e}")
-            return []
\ No newline at end of file
+            return None
+
+    def detect_labels(self, bucket, filename, max_labels=5):
+        return self.detect_labels_batch([(bucket, filename)], max_labels)[(bucket, filename)]
+
+    def detect_labels_batch(self, items, max_labels=5, min_confidence=None):
+        """
+        items: (bucket, filename) pairs. Returns {(bucket, filename): tags or None}.
+        min_confidence defaults to REKOGNITION_MIN_CONFIDENCE (it is part of the cache key).
+        """
+        if min_confidence is None:
+            min_confidence = getattr(Config, 'REKOGNITION_MIN_CONFIDENCE', 75)
+        items = list(dict.fromkeys(items))
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(items) or 1))) as pool:
+            # 1. Content hashes (HEAD requests) -> group identical images
+            hashes = dict(zip(items, pool.map(lambda item: self._content_hash(*item), items)))
+            groups = {}
+            for item, content_hash in hashes.items():
+                key = self._cache_key(content_hash, max_labels, min_confidence) if content_hash else item
+                groups.setdefault(key, []).append(item)
+
+            # 2. Cache hits cost nothing
+            pending = {}
+            for key, group in groups.items():
+                labels = self._cached(key) if isinstance(key, str) else None
+                if labels is not None:
+                    results.update((item, list(labels)) for item in group)
+                else:
+                    pending[key] = group
+
+            # 3. One Rekognition call per distinct image, at most 'concurrency' at a time
+            futures = {
+                key: pool.submit(self._call, group[0][0], group[0][1], max_labels, min_confidence)
+                for key, group in pending.items()
+            }
+            for key, future in futures.items():
+                labels = future.result()
+                if labels is not None and isinstance(key, str):
+                    self._store(key, labels)
+                results.update((item, list(labels) if labels is not None else None) for item in pending[key])
+
+        if pending:
+            print(f"[INFO] Rekognition: {len(items)} image(s), {len(pending)} API call(s)")
+        return results
+
+# --- 6. OBJECT REFERENCE COUNTS (content-addressed storage) ---
+class DynamoObjectRefs:
+    """
+    DynamoDB version of cas.ObjectRefs, shared by every instance.
+    One item per stored object: {'object_key', 'size', 'refs', 'created_at', 'deleting'?},
+    and one per referencing video: {'object_key': 'video#<id>', 'object_keys': {...}}
+    (no 'refs' attribute, so orphan scans never match it).
+    """
+    VIDEO_PREFIX = 'video#'
+
+    def __init__(self, table_name=None):
+        self.table_name = table_name or os.environ.get('DYNAMO_TABLE_OBJECTS')
+
+    @cached_property
+    def table(self):
+        return aws_clients.resource('dynamodb').Table(self.table_name)
+
+    def register(self, key, size):
+        now = int(time.time())
+        try:
+            response = self.table.update_item(
+                Key={'object_key': key},
+                UpdateExpression="SET #s = :s, created_at = :now, refs = if_not_exists(refs, :zero) REMOVE deleting",
+                ConditionExpression=Attr('deleting').not_exists() | Attr('deleting').lt(now - CLAIM_TIMEOUT),
+                ExpressionAttributeNames={'#s': 'size'},
+                ExpressionAttributeValues={':s': size, ':now': now, ':zero': 0},
+                ReturnValues='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None  # gc is deleting it
+            raise
+        old = response.get('Attributes')
+        return bool(old) and 'deleting' not in old
+
+    def set_refs(self, video_id, keys):
+        # Swapping the video's item returns the previous set atomically: only the difference is applied
+        item_key = {'object_key': f"{self.VIDEO_PREFIX}{video_id}"}
+        if keys:
+            old = self.table.put_item(Item=dict(item_key, object_keys=set(keys)), ReturnValues='ALL_OLD')
+        else:
+            old = self.table.delete_item(Key=item_key, ReturnValues='ALL_OLD')
+        old = set(old.get('Attributes', {}).get('object_keys', ()))
+        now = int(time.time())
+        for key, amount in [(k, 1) for k in set(keys) - old] + [(k, -1) for k in old - set(keys)]:
+            self.table.update_item(
+                Key={'object_key': key},
+                UpdateExpression="SET created_at = :now ADD refs :n",
+                ExpressionAttributeValues={':now': now, ':n': amount}
+            )
+
+    def get(self, key):
+        item = self.table.get_item(Key={'object_key': key}, ProjectionExpression='refs').get('Item')
+        return int(item.get('refs', 0)) if item else None
+
+    def orphans(self, older_than):
+        items = _read_all_pages(
+            self.table.scan,
+            FilterExpression=Attr('refs').lte(0) & Attr('created_at').lt(int(time.time() - older_than)),
+            ProjectionExpression='object_key'
+        )
+        return [item['object_key'] for item in items]
+
+    def claim(self, key, older_than):
+        now = int(time.time())
+        try:
+            self.table.update_item(
+                Key={'object_key': key},
+                UpdateExpression="SET deleting = :now",
+                ConditionExpression=Attr('refs').lte(0) & Attr('created_at').lt(int(now - older_than))
+                                    & (Attr('deleting').not_exists() | Attr('deleting').lt(now - CLAIM_TIMEOUT)),
+                ExpressionAttributeValues={':now': now}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def release(self, key):
+        self.table.update_item(Key={'object_key': key}, UpdateExpression="REMOVE deleting")
+
+    def forget(self, key):
+        try:
+            self.table.delete_item(Key={'object_key': key}, ConditionExpression=Attr('deleting').exists())
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+# --- 7. TRENDING SCORES (shared by every instance) ---
+class DynamoTrending(TrendingIndex):
+    """
+    DynamoDB store for trending.TrendingIndex.
+    One item per scored video: {'video_id', 'board': 'ALL', 'score', 'expires_at'}; the GSI
+    on board + score is the ranking (read best first, Limit K). One item per like:
+    {'video_id': 'like#<video>#<user>', 'liked_at', 'expires_at'} (no 'board', so not in
+    the index). A score and the like items it depends on change together: read, then one
+    transaction conditional on the values that were read.
+    'expires_at' is when the item stops mattering: enable TTL on that attribute to prune them.
+    """
+    SCORE_INDEX = getattr(Config, 'DYNAMO_TRENDING_INDEX', 'board-score-index')
+    BOARD = 'ALL'
+    LIKE_PREFIX = 'like#'
+    LIKE_CHUNK = 50
+    INDEXES = [{
+        'IndexName': SCORE_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'board', 'KeyType': 'HASH'},
+            {'AttributeName': 'score', 'KeyType': 'RANGE'}
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'board', 'AttributeType': 'S'},
+            {'AttributeName': 'score', 'AttributeType': 'N'}
+        ]
+    }]
+
+    def __init__(self, table_name=None, **kwargs):
+        super().__init__(**kwargs)
+        self.table_name = table_name or os.environ.get('DYNAMO_TABLE_TRENDING')
+
+    @cached_property
+    def table(self):
+        return aws_clients.resource('dynamodb').Table(self.table_name)
+
+    def ensure_indexes(self, wait=False):
+        return ensure_indexes(self.table, self.INDEXES, wait)
+
+    def _expires_at(self, score):
+        # The time at which 'score' decays below MIN_SCORE
+        return int(self.half_life * (score - math.log2(MIN_SCORE))) + 1
+
+    def _like_key(self, video_id, user_id):
+        return {'video_id': f"{self.LIKE_PREFIX}{video_id}#{user_id}"}
+
+    def _write(self, changes, now):
+        left = {}
+        for video_id, events in changes.items():
+            chunks = self._chunks(events)
+            for n, chunk in enumerate(chunks):
+                try:
+                    written = self._write_chunk(video_id, chunk, now)
+                except ClientError as e:
+                    print(f"[ERROR] Trending update of {video_id} failed: {e}")
+                    written = False
+                if not written:
+                    left[video_id] = [event for rest in chunks[n:] for event in rest]
+                    break
+        return left
+
+    def _chunks(self, events):
+        # A transaction holds the score plus at most LIKE_CHUNK like items (the limit is 100)
+        chunks, likes = [[]], 0
+        for event in events:
+            if event[0] != 'view':
+                if likes == self.LIKE_CHUNK:
+                    chunks.append([])
+                    likes = 0
+                likes += 1
+            chunks[-1].append(event)
+        return chunks
+
+    def _write_chunk(self, video_id, events, now, attempts=8):
+        """
+        Read the score and the like items involved, apply the events, then write all of it in
+        one transaction conditional on what was read: a like item is only recorded together
+        with the score it changed. Returns False if other writers kept winning.
+        """
+        floor = self._floor(now)
+        users = list(dict.fromkeys(value[0] for kind, value in events if kind != 'view'))
+        for attempt in range(attempts):
+            item = self.table.get_item(Key={'video_id': video_id}, ConsistentRead=True).get('Item')
+            read = {}
+            for user_id in users:
+                like = self.table.get_item(Key=self._like_key(video_id, user_id), ConsistentRead=True).get('Item')
+                read[user_id] = like['liked_at'] if like else None
+            liked = dict(read)
+            score = float(item['score']) if item else None
+            for kind, value in events:
+                if kind == 'view':
+                    score = log_add(score, self._boost(self.view_weight * value, now))
+                elif kind == 'like' and liked[value[0]] is None:
+                    liked[value[0]] = Decimal(str(value[1]))
+                    score = log_add(score, self._boost(self.like_weight, value[1]))
+                elif kind == 'unlike' and liked[value[0]] is not None:
+                    score = log_sub(score, self._boost(self.like_weight, float(liked[value[0]])))
+                    liked[value[0]] = None
+
+            ops = [self._score_op(video_id, item, score, floor)]
+            for user_id in users:
+                if liked[user_id] != read[user_id]:
+                    ops.append(self._like_op(video_id, user_id, read[user_id], liked[user_id]))
+            try:
+                self.table.meta.client.transact_write_items(TransactItems=ops)
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                time.sleep(min(0.05 * 2 ** attempt, 1))  # another instance wrote first
+        print(f"[WARN] Trending score of {video_id} kept changing")
+        return False
+
+    def _condition(self, attribute, old):
+        if old is None:
+            return {'ConditionExpression': 'attribute_not_exists(video_id)'}
+        return {'ConditionExpression': f"{attribute} = :old", 'ExpressionAttributeValues': {':old': old}}
+
+    def _score_op(self, video_id, item, score, floor):
+        key = {'video_id': video_id}
+        condition = self._condition('score', item['score'] if item else None)
+        if score is not None and score >= floor:
+            return {'Put': dict(condition, TableName=self.table_name, Item={
+                'video_id': video_id, 'board': self.BOARD, 'score': Decimal(str(score)),
+                'expires_at': self._expires_at(score)})}
+        if item:
+            return {'Delete': dict(condition, TableName=self.table_name, Key=key)}
+        return {'ConditionCheck': dict(condition, TableName=self.table_name, Key=key)}
+
+    def _like_op(self, video_id, user_id, old, liked_at):
+        key = self._like_key(video_id, user_id)
+        condition = self._condition('liked_at', old)
+        if liked_at is None:
+            return {'Delete': dict(condition, TableName=self.table_name, Key=key)}
+        boost = self._boost(self.like_weight, float(liked_at))
+        return {'Put': dict(condition, TableName=self.table_name,
+                            Item=dict(key, liked_at=liked_at, expires_at=self._expires_at(boost)))}
+
+    def _ranked(self, limit):
+        items = self.table.query(
+            IndexName=self.SCORE_INDEX,
+            KeyConditionExpression=Key('board').eq(self.BOARD),
+            ScanIndexForward=False,
+            Limit=limit
+        ).get('Items', [])
+        return [(item['video_id'], float(item['score'])) for item in items]
+
+    def _log_score(self, video_id):
+        item = self.table.get_item(Key={'video_id': video_id}).get('Item')
+        return float(item['score']) if item and 'score' in item else None
@@ -1,4 +1,7 @@
+import uuid
 from abc import ABC, abstractmethod
+from datetime import datetime
+from app.services.pagination import encode_cursor
 
 # --- 1. STORAGE INTERFACE ---
 class StorageService(ABC):
@@ -10,8 +13,137 @@ class StorageService(ABC):
         """
         pass
 
+    @abstractmethod
+    def upload_stream(self, chunks, filename):
+        """
+        Uploads a file from an iterator of byte chunks (or a file-like object)
+        without ever holding the whole file in memory.
+        Returns (filename, size_in_bytes, sha256_hex) on success, or (None, 0, None) on failure.
+        """
+        pass
+
+    @abstractmethod
+    def read_file(self, filename):
+        """
+        Returns the stored object's bytes, or None if it does not exist.
+        Meant for small objects (thumbnails).
+        """
+        pass
+
+    @abstractmethod
+    def media_source(self, filename):
+        """
+        Returns a local path or a (temporary) URL that tools like ffmpeg can read the object from.
+        """
+        pass
+
+    @abstractmethod
+    def exists(self, filename):
+        """
+        True if an object is stored under 'filename'.
+        """
+        pass
+
+    @abstractmethod
+    def delete_file(self, filename):
+        """
+        Removes the stored object. Returns True on success (or if it was already gone).
+        """
+        pass
+
+    @abstractmethod
+    def copy_file(self, source, dest):
+        """
+        Copies a stored object to a new name inside the backend (no download / re-upload).
+        Returns dest on success, None on failure.
+        """
+        pass
+
+    def move_file(self, source, dest):
+        """
+        Renames a stored object: copy, then delete the source. Returns dest or None.
+        """
+        if not self.copy_file(source, dest):
+            return None
+        self.delete_file(source)
+        return dest
+
+    # --- Resumable (multipart) uploads ---
+    @abstractmethod
+    def create_multipart_upload(self, filename):
+        """
+        Starts a multipart upload for 'filename'.
+        Returns an upload_id that stays valid across worker restarts.
+        """
+        pass
+
+    @abstractmethod
+    def upload_part(self, filename, upload_id, part_number, chunks):
+        """
+        Stores one part (1-based part_number). Re-sending a part replaces it,
+        so a failed part can be retried on its own.
+        Returns the part's ETag.
+        """
+        pass
+
+    @abstractmethod
+    def list_parts(self, filename, upload_id):
+        """
+        Returns the parts received so far: [{'PartNumber', 'ETag', 'Size'}, ...] sorted by number.
+        """
+        pass
+
+    @abstractmethod
+    def complete_multipart_upload(self, filename, upload_id, parts):
+        """
+        Assembles the given parts (as returned by list_parts) into the final object.
+        Returns the filename on success, None on failure.
+        """
+        pass
+
+    @abstractmethod
+    def abort_multipart_upload(self, filename, upload_id):
+        """
+        Discards an unfinished upload and all of its parts.
+        """
+        pass
+
 # --- 2. VIDEO DATABASE INTERFACE ---
+def merge_labels(video, labels):
+    """
+    Replaces the video's detected labels with 'labels' and keeps the user's own tags (in place).
+    'labels' holds the tags label detection added, not those the user already had, so taking
+    the old labels out never removes a user tag. (Videos labelled before 'labels' was recorded
+    keep their old labels as ordinary tags.)
+    """
+    previous = set(video.get('labels') or ())
+    kept = [t for t in video.get('tags') or [] if t not in previous]
+    added = [t for t in dict.fromkeys(labels) if t not in kept]
+    video['tags'] = kept + added
+    video['labels'] = added
+    return video
+
+
 class VideoDBService(ABC):
+    # --- Change notifications (search index, caches and feeds subscribe here) ---
+    def subscribe(self, callback):
+        """
+        Registers callback(event, video), called after every write made through this service.
+        event is 'put' for a new video (video = the full record), 'update' after other
+        metadata changed (video = the full updated record) or 'counters' after a
+        views/likes change (video = {'video_id', 'views'} or {'video_id', 'likes'}).
+        'put' is also published when put_videos replaces an existing video (re-imports),
+        so a subscriber must treat it as "this is now the whole record", never as +1.
+        """
+        self.__dict__.setdefault('_subscribers', []).append(callback)
+
+    def _publish(self, event, video):
+        for callback in self.__dict__.get('_subscribers', []):
+            try:
+                callback(event, video)
+            except Exception as e:
+                print(f"[ERROR] '{event}' subscriber {callback} failed: {e}")
+
     @abstractmethod
     def put_video(self, title, description, tags, filename, user_id, thumbnail_filename=None):
         """
@@ -19,6 +151,34 @@ class VideoDBService(ABC):
         """
         pass
 
+    @abstractmethod
+    def put_videos(self, videos):
+        """
+        Saves full video records in bulk (imports, migrations); an existing video_id is replaced.
+        Missing video_id / created_at / upload_date / counters are filled in (see _complete_record).
+        Publishes 'put' for each, replaced ones included. Returns the number of videos written.
+        """
+        pass
+
+    @staticmethod
+    def _complete_record(video):
+        now = datetime.now()
+        video = dict(video)
+        video.setdefault('video_id', str(uuid.uuid4()))
+        video['tags'] = list(video.get('tags') or [])
+        video['upload_date'] = video.get('upload_date') or now.strftime("%Y-%m-%d")
+        video['created_at'] = video.get('created_at') or now.isoformat(timespec='microseconds')
+        video['views'] = int(video.get('views') or 0)
+        video['likes'] = int(video.get('likes') or 0)
+        return video
+
+    def scan_videos(self, segments=1):
+        """
+        Yields every video record, in no particular order (exports, migrations).
+        Backends that can read in parallel use up to 'segments' concurrent scans.
+        """
+        yield from self.get_all_videos()
+
     @abstractmethod
     def get_all_videos(self):
         """
@@ -26,6 +186,23 @@ class VideoDBService(ABC):
         """
         pass
 
+    @abstractmethod
+    def list_videos(self, cursor=None, limit=20):
+        """
+        Retrieves one page of videos, newest first.
+        'cursor' is the opaque token returned by the previous page (None for the first page).
+        Returns (videos, next_cursor); next_cursor is None on the last page.
+        """
+        pass
+
+    def feed_cursor(self, video):
+        """
+        The list_videos cursor for the page that starts right after 'video'
+        (lets a materialized feed hand out cursors the backend understands).
+        """
+        created_at = video.get('created_at') or f"{video.get('upload_date', '')}T00:00:00"
+        return encode_cursor({'created_at': created_at, 'video_id': video['video_id']})
+
     @abstractmethod
     def get_video(self, video_id):
         """
@@ -33,6 +210,14 @@ class VideoDBService(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_videos(self, video_ids):
+        """
+        Retrieves several videos in as few round trips as the backend allows.
+        Returns them in the order of video_ids (duplicates once); unknown ids are skipped.
+        """
+        pass
+
     @abstractmethod
     def get_user_videos(self, user_id):
         """
@@ -40,6 +225,48 @@ class VideoDBService(ABC):
         """
         pass
 
+    @abstractmethod
+    def increment_views(self, video_id, amount=1):
+        """
+        Atomically adds 'amount' to the view counter of one video.
+        Returns the new view count, or None if the video does not exist.
+        Raises if the write failed for any other reason (callers retry).
+        """
+        pass
+
+    @abstractmethod
+    def toggle_like(self, video_id, user_id):
+        """
+        Likes the video for user_id, or removes the like if it is already there.
+        Returns (liked, likes), or (None, None) if the video does not exist.
+        """
+        pass
+
+    @abstractmethod
+    def update_video(self, video_id, fields):
+        """
+        Sets metadata attributes of one video (e.g. {'thumbnail': ..., 'thumbnails': {...}}).
+        Not for counters (increment_views / toggle_like) or tags (add_tags / set_labels).
+        Returns the updated video, or None if the video does not exist.
+        """
+        pass
+
+    @abstractmethod
+    def add_tags(self, video_id, tags):
+        """
+        Merges 'tags' into the video's tag list (existing tags are kept, duplicates skipped).
+        Returns the updated video, or None if the video does not exist.
+        """
+        pass
+
+    @abstractmethod
+    def set_labels(self, video_id, labels):
+        """
+        Replaces the labels previously detected for the video with 'labels' (see merge_labels):
+        the user's own tags are kept. Returns the updated video, or None if the video does not exist.
+        """
+        pass
+
 # --- 3. USERS SERVICE INTERFACE (The Missing Part) ---
 class UsersService(ABC):
     @abstractmethod
@@ -88,6 +315,21 @@ class UsersService(ABC):
         """
         pass
 
+    @abstractmethod
+    def scan_users(self, segments=1):
+        """
+        Yields every user as a dict {'user_id', 'email', 'username', 'password_hash', 'avatar'}
+        (exports, migrations). Backends that can read in parallel use up to 'segments' scans.
+        """
+        pass
+
+    @abstractmethod
+    def import_users(self, users):
+        """
+        Bulk insert/replace of user records ({'user_id' or 'id', 'email', ...}). Returns the count.
+        """
+        pass
+
 # --- 4. Notification Service (SNS) ---
 
 class NotificationService(ABC):
@@ -95,9 +337,18 @@ class NotificationService(ABC):
     def send_notification(self, subject, message):
         """
         Sends a notification (Email/SMS) to the admin or user.
+        Returns False if sending failed (the job queue retries it).
         """
         pass
 
+    def send_batch(self, messages):
+        """
+        Sends several (subject, message) pairs. Returns the indexes of the ones that failed.
+        Backends override this with a bulk API; the default sends them one by one.
+        """
+        return [i for i, (subject, message) in enumerate(messages)
+                if self.send_notification(subject, message) is False]
+
 # --- 5. Analysis (Rekognition) ---
 
 class AnalyzerService(ABC):
@@ -105,5 +356,16 @@ class AnalyzerService(ABC):
     def detect_labels(self, bucket, filename, max_labels=5):
         """
         Scans an image and returns a list of tags.
+        Returns None if the analysis itself failed (the job queue retries it).
         """
         pass
+
+    def detect_labels_batch(self, items, max_labels=5, min_confidence=None):
+        """
+        Analyzes many images: items is an iterable of (bucket, filename) pairs.
+        Returns {(bucket, filename): tags or None}. Backends override this with
+        concurrent / deduplicated versions; the default runs one after another
+        (and ignores min_confidence).
+        """
+        return {(bucket, filename): self.detect_labels(bucket, filename, max_labels)
+                for bucket, filename in dict.fromkeys(items)}
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from app.services.catalog import _json_default
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache where every entry also expires after a TTL.
+
+    - maxsize bounds memory: the least recently used entry is evicted first.
+    - ttl is the default lifetime in seconds; set() can override it per entry.
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def ttl_remaining(self, key):
+        """Seconds until 'key' expires (0 if it is missing or already expired)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return 0
+            return max(0, entry[0] - time.monotonic())
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# --- SHARED (CROSS-WORKER) CACHE ---
+try:
+    from pymemcache.client.base import PooledClient
+except ImportError:  # optional dependency: pip install pymemcache
+    PooledClient = None
+
+
+class JSONSerde:
+    """
+    Stores memcached values as JSON, so nothing read back from the cache can run code
+    (a planted pickle would). Decimals and sets become numbers and lists, as in the
+    catalog export; an int is stored as plain digits, which memcached's incr works on.
+    """
+    def serialize(self, key, value):
+        return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8'), 0
+
+    def deserialize(self, key, value, flags):
+        return json.loads(value)
+
+
+class SharedCache:
+    """
+    Thin memcached client shared by all Gunicorn workers on a box.
+    Any connection problem is treated as a cache miss, never as a request failure.
+    """
+    def __init__(self, server, prefix='snapstream:', timeout=0.05):
+        if PooledClient is None:
+            raise RuntimeError("pymemcache is not installed")
+        host, _, port = server.partition(':')
+        self.client = PooledClient(
+            (host, int(port or 11211)), serde=JSONSerde(),
+            connect_timeout=timeout, timeout=timeout, max_pool_size=16
+        )
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key):
+        key = f"{self.prefix}{key}"
+        # memcached keys: max 250 bytes, no whitespace
+        if len(key) > 200 or any(c.isspace() for c in key):
+            key = self.prefix + hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return key
+
+    def get(self, key, default=None):
+        try:
+            value = self.client.get(self._key(key), _MISSING)
+        except Exception:
+            self.errors += 1
+            return default
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self._key(key), value, expire=int(ttl), noreply=True)
+        except Exception:
+            self.errors += 1
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._key(key), noreply=True)
+        except Exception:
+            self.errors += 1
+
+    def incr(self, key):
+        """Atomically bumps a counter (used as a generation number); returns the new value or None."""
+        try:
+            value = self.client.incr(self._key(key), 1)
+            if value is None:
+                self.client.add(self._key(key), 1, noreply=False)
+                value = 1
+            return value
+        except Exception:
+            self.errors += 1
+            return None
@@ -0,0 +1,267 @@
+import threading
+from app.services.base import VideoDBService, UsersService
+from app.services.cache import TTLCache
+from app.models import User
+
+_MISSING = object()
+_NOT_FOUND = 'user:not-found'  # negative-cache marker (a string so it survives pickling)
+# What user_loader needs of a user; the password hash is never cached (memcached has no auth)
+SESSION_FIELDS = ('id', 'username', 'email', 'bio', 'avatar')
+
+
+# --- 1. READ-THROUGH VIDEO CACHE ---
+class CachedVideoDB(VideoDBService):
+    """
+    Wraps any VideoDBService with a two-level read-through cache:
+
+    1. a per-worker TTLCache (LRU + TTL), checked first;
+    2. an optional SharedCache (memcached) shared by all workers on the box.
+
+    Invalidation: a new video or changed metadata (tags...) clears every cached list
+    (feed pages, user lists), and any write to a video (views, likes...) drops that
+    video's entry.
+    Writes go to the local cache and to the shared one, so other workers see them
+    within local_ttl at the latest. Concurrent misses on the same key in one worker
+    load from the backend only once.
+    """
+    def __init__(self, inner, ttl=60, local_ttl=10, maxsize=10000, shared=None):
+        self.inner = inner
+        self.ttl = ttl
+        self.shared = shared
+        self.videos = TTLCache(maxsize=maxsize, ttl=local_ttl)
+        self.lists = TTLCache(maxsize=256, ttl=local_ttl)
+        self._local_generation = 0
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        inner.subscribe(self._on_change)
+
+    def __getattr__(self, name):
+        # Backend-specific extras (ensure_indexes, backfill, ...) pass straight through
+        if name == 'inner':
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    # --- Change notifications come from the wrapped service ---
+    def subscribe(self, callback):
+        self.inner.subscribe(callback)
+
+    def _publish(self, event, video):
+        self.inner._publish(event, video)
+
+    def _on_change(self, event, video):
+        self.invalidate(video.get('video_id'), lists=(event in ('put', 'update')))
+
+    def invalidate(self, video_id=None, lists=False):
+        if video_id:
+            self.videos.delete(f"video:{video_id}")
+            if self.shared:
+                self.shared.delete(f"video:{video_id}")
+        if lists:
+            self.lists.clear()
+            self._local_generation += 1
+            if self.shared:
+                self.shared.incr('lists:generation')
+
+    # --- Read-through helpers ---
+    def _key_lock(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _read_through(self, local, key, loader):
+        value = local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._key_lock(key):
+            value = local.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if self.shared:
+                value = self.shared.get(key, _MISSING)
+            if value is _MISSING:
+                value = loader()
+                if value is not None and self.shared:
+                    self.shared.set(key, value, self.ttl)
+            if value is not None:
+                local.set(key, value)
+
+        with self._locks_guard:
+            self._locks.pop(key, None)
+        return value
+
+    def _list_key(self, *parts):
+        generation = self._local_generation
+        if self.shared:
+            generation = self.shared.get('lists:generation', 0)
+        return ':'.join(['list', str(generation)] + [str(p) for p in parts])
+
+    # --- VideoDBService ---
+    def put_video(self, *args, **kwargs):
+        return self.inner.put_video(*args, **kwargs)
+
+    def get_video(self, video_id):
+        video = self._read_through(self.videos, f"video:{video_id}", lambda: self.inner.get_video(video_id))
+        return dict(video) if video else None
+
+    def put_videos(self, videos):
+        return self.inner.put_videos(videos)
+
+    def scan_videos(self, segments=1):
+        return self.inner.scan_videos(segments)
+
+    def get_videos(self, video_ids):
+        """Cached videos are served locally; only the misses go to the backend, as one batch"""
+        video_ids = list(dict.fromkeys(video_ids))
+        found = {}
+        for vid in video_ids:
+            video = self.videos.get(f"video:{vid}", _MISSING)
+            if video is _MISSING and self.shared:
+                video = self.shared.get(f"video:{vid}", _MISSING)
+                if video is not _MISSING:
+                    self.videos.set(f"video:{vid}", video)
+            if video is not _MISSING:
+                found[vid] = video
+        missing = [vid for vid in video_ids if vid not in found]
+        if missing:
+            for video in self.inner.get_videos(missing):
+                key = f"video:{video['video_id']}"
+                self.videos.set(key, video)
+                if self.shared:
+                    self.shared.set(key, video, self.ttl)
+                found[video['video_id']] = video
+        return [dict(found[vid]) for vid in video_ids if found.get(vid)]
+
+    def get_all_videos(self):
+        videos = self._read_through(self.lists, self._list_key('all'), self.inner.get_all_videos)
+        return [dict(v) for v in videos or []]
+
+    def get_user_videos(self, user_id):
+        videos = self._read_through(self.lists, self._list_key('user', user_id),
+                                    lambda: self.inner.get_user_videos(user_id))
+        return [dict(v) for v in videos or []]
+
+    def list_videos(self, cursor=None, limit=20):
+        videos, next_cursor = self._read_through(
+            self.lists, self._list_key('feed', cursor, limit),
+            lambda: self.inner.list_videos(cursor=cursor, limit=limit)
+        )
+        return [dict(v) for v in videos], next_cursor
+
+    def feed_cursor(self, video):
+        return self.inner.feed_cursor(video)
+
+    # Counter writes go straight through; the 'counters' event they publish invalidates the video
+    def increment_views(self, video_id, amount=1):
+        return self.inner.increment_views(video_id, amount)
+
+    def toggle_like(self, video_id, user_id):
+        return self.inner.toggle_like(video_id, user_id)
+
+    def add_tags(self, video_id, tags):
+        return self.inner.add_tags(video_id, tags)
+
+    def set_labels(self, video_id, labels):
+        return self.inner.set_labels(video_id, labels)
+
+    def update_video(self, video_id, fields):
+        return self.inner.update_video(video_id, fields)
+
+    # --- Metrics ---
+    def stats(self):
+        stats = {
+            'videos': {'hits': self.videos.hits, 'misses': self.videos.misses, 'size': len(self.videos)},
+            'lists': {'hits': self.lists.hits, 'misses': self.lists.misses, 'size': len(self.lists)}
+        }
+        if self.shared:
+            stats['shared'] = {'hits': self.shared.hits, 'misses': self.shared.misses, 'errors': self.shared.errors}
+        return stats
+
+
+# --- 2. USER-SESSION CACHE ---
+class CachedUsers(UsersService):
+    """
+    Wraps any UsersService so Flask-Login's user_loader (get_user_by_id on every
+    authenticated request) is served from memory.
+
+    - Bounded per-worker LRU with TTL (+ the optional SharedCache).
+    - Unknown / deleted ids are cached too (negative_ttl), so a stale session
+      cookie does not hit storage on every request.
+    - update_profile and change_password drop the cached user.
+    - Only SESSION_FIELDS are cached: the users it returns carry no password hash
+      (validate_login / change_password always go to the inner service).
+    """
+    def __init__(self, inner, ttl=30, negative_ttl=10, maxsize=10000, shared=None):
+        self.inner = inner
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.shared = shared
+        self.users = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def __getattr__(self, name):
+        if name == 'inner':
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def invalidate(self, user_id):
+        self.users.delete(f"user:{user_id}")
+        if self.shared:
+            self.shared.delete(f"user:{user_id}")
+
+    def get_user_by_id(self, user_id):
+        key = f"user:{user_id}"
+        user = self.users.get(key, _MISSING)
+        if user is _MISSING and self.shared:
+            user = self.shared.get(key, _MISSING)
+            if user is not _MISSING:
+                self.users.set(key, user, ttl=self.negative_ttl if user == _NOT_FOUND else self.ttl)
+        if user is _MISSING:
+            user = self.inner.get_user_by_id(user_id)
+            ttl = self.ttl if user is not None else self.negative_ttl
+            if user is None:
+                user = _NOT_FOUND
+            else:
+                user = {field: getattr(user, field, None) for field in SESSION_FIELDS}
+            self.users.set(key, user, ttl=ttl)
+            if self.shared:
+                self.shared.set(key, user, ttl)
+        if user == _NOT_FOUND:
+            return None
+        return User(user['id'], user['username'], user['email'], None, bio=user['bio'] or "", avatar=user['avatar'])
+
+    def get_user_by_email(self, email):
+        return self.inner.get_user_by_email(email)
+
+    def scan_users(self, segments=1):
+        return self.inner.scan_users(segments)
+
+    def import_users(self, users):
+        count = self.inner.import_users(users)
+        self.users.clear()
+        return count
+
+    def validate_login(self, email, password):
+        return self.inner.validate_login(email, password)
+
+    def create_user(self, email, username, password):
+        user, error = self.inner.create_user(email, username, password)
+        if user is not None:
+            self.invalidate(user.id)
+        return user, error
+
+    def update_profile(self, user_id, new_username, avatar_filename=None):
+        try:
+            return self.inner.update_profile(user_id, new_username, avatar_filename)
+        finally:
+            self.invalidate(user_id)
+
+    def change_password(self, user_id, current_password, new_password):
+        try:
+            return self.inner.change_password(user_id, current_password, new_password)
+        finally:
+            self.invalidate(user_id)
+
+    def stats(self):
+        return {'hits': self.users.hits, 'misses': self.users.misses, 'size': len(self.users)}
@@ -0,0 +1,253 @@
+import os
+import re
+import time
+import uuid
+from werkzeug.utils import secure_filename
+from app.services.base import StorageService
+from app.services.sqlite_impl import SQLiteDatabase
+
+CAS_PREFIX = 'cas/'
+CAS_KEY_RE = re.compile(r"^cas/[0-9a-f]{2}/([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+TMP_PREFIX = 'tmp/cas/'
+# A gc claim older than this is considered abandoned (gc died between claim and delete)
+CLAIM_TIMEOUT = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    object_key TEXT PRIMARY KEY,
+    size       INTEGER,
+    refs       INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    deleting   REAL  -- set while 'flask storage gc' deletes the object
+);
+CREATE INDEX IF NOT EXISTS objects_orphans ON objects (refs, created_at);
+
+CREATE TABLE IF NOT EXISTS object_refs (
+    object_key TEXT NOT NULL,
+    video_id   TEXT NOT NULL,
+    PRIMARY KEY (object_key, video_id)
+);
+CREATE INDEX IF NOT EXISTS object_refs_video ON object_refs (video_id);
+"""
+
+
+def cas_key(digest, filename):
+    """sha256 hex + original extension -> 'cas/ab/ab12...ef.mp4'"""
+    ext = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return f"{CAS_PREFIX}{digest[:2]}/{digest}{ext}"
+
+
+def digest_of(key):
+    """The sha256 a content-addressed key was derived from, or None for any other key"""
+    match = CAS_KEY_RE.match(key or '')
+    return match.group(1) if match else None
+
+
+# --- 1. REFERENCE COUNTS (local; DynamoObjectRefs on AWS) ---
+class ObjectRefs:
+    """
+    Reference counts of stored objects, in a SQLite (WAL) file.
+    An object is registered with 0 references when stored; refs counts the distinct
+    videos pointing at it (set_refs is idempotent, so re-importing a video does not
+    count twice). Objects still at 0 after a grace period are orphans (uploads whose
+    video was never saved) and can be garbage-collected.
+
+    Deleting is claim-first: gc marks the row ('deleting') before it deletes the
+    object, and register refuses (returns None) while a claim is held, so an upload
+    can never decide the object is already stored while it is being removed.
+    """
+    def __init__(self, path):
+        self.db = SQLiteDatabase(path, schema=SCHEMA)
+        columns = [r['name'] for r in self.db.conn.execute("PRAGMA table_info(objects)")]
+        if 'deleting' not in columns:  # files created before claims existed
+            self.db.conn.execute("ALTER TABLE objects ADD COLUMN deleting REAL")
+
+    def register(self, key, size):
+        """
+        Records a freshly uploaded object. Returns True if the object was already
+        known (the upload may skip its write), False if the caller must store it,
+        None while gc is deleting it (retry shortly).
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT deleting FROM objects WHERE object_key = ?", (key,)).fetchone()
+            if row and row['deleting'] and row['deleting'] > now - CLAIM_TIMEOUT:
+                return None
+            # Re-registering an unreferenced object restarts its grace period (a duplicate upload just landed)
+            conn.execute("INSERT INTO objects (object_key, size, refs, created_at) VALUES (?, ?, 0, ?) "
+                         "ON CONFLICT (object_key) DO UPDATE SET size = excluded.size, deleting = NULL, "
+                         "created_at = CASE WHEN refs = 0 THEN excluded.created_at ELSE created_at END",
+                         (key, size, now))
+            return row is not None and not row['deleting']
+
+    def set_refs(self, video_id, keys):
+        """Makes 'keys' the set of objects video_id points at (adds / drops its references)"""
+        keys = set(keys)
+        now = time.time()
+        with self.db.transaction() as conn:
+            old = {r['object_key'] for r in conn.execute(
+                "SELECT object_key FROM object_refs WHERE video_id = ?", (video_id,))}
+            for key in keys - old:
+                conn.execute("INSERT INTO object_refs (object_key, video_id) VALUES (?, ?)", (key, video_id))
+            for key in old - keys:
+                conn.execute("DELETE FROM object_refs WHERE object_key = ? AND video_id = ?", (key, video_id))
+            for key in keys ^ old:
+                # A dropped reference restarts the grace period, like a fresh upload
+                conn.execute("INSERT INTO objects (object_key, refs, created_at) VALUES (?, 0, ?) "
+                             "ON CONFLICT (object_key) DO NOTHING", (key, now))
+                conn.execute("UPDATE objects SET created_at = ?, "
+                             "refs = (SELECT COUNT(*) FROM object_refs WHERE object_key = ?) "
+                             "WHERE object_key = ?", (now, key, key))
+
+    def get(self, key):
+        row = self.db.conn.execute("SELECT refs FROM objects WHERE object_key = ?", (key,)).fetchone()
+        return row['refs'] if row else None
+
+    def orphans(self, older_than):
+        """Candidates only: gc must still claim() each one"""
+        rows = self.db.conn.execute("SELECT object_key FROM objects WHERE refs = 0 AND created_at < ?",
+                                    (time.time() - older_than,))
+        return [r['object_key'] for r in rows]
+
+    def claim(self, key, older_than):
+        """Marks an orphan as being deleted. True if it is still an orphan and no one else holds it."""
+        now = time.time()
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE objects SET deleting = ? WHERE object_key = ? AND refs = 0 AND created_at < ? "
+                "AND (deleting IS NULL OR deleting < ?)",
+                (now, key, now - older_than, now - CLAIM_TIMEOUT))
+            return cursor.rowcount == 1
+
+    def release(self, key):
+        """Gives up a claim (the object could not be deleted)"""
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE objects SET deleting = NULL WHERE object_key = ?", (key,))
+
+    def forget(self, key):
+        """Drops the row of a claimed object once it is deleted"""
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM objects WHERE object_key = ? AND deleting IS NOT NULL", (key,))
+
+
+# --- 2. CONTENT-ADDRESSED STORAGE ---
+class ContentAddressedStorage(StorageService):
+    """
+    Wraps any StorageService so uploads are stored under the SHA-256 of their bytes.
+
+    - upload_stream / upload_file stream the data once, straight into storage under
+      a temporary key (tmp/cas/...), hashing it on the way; the final key is only
+      known at the end. The object is then moved there server-side.
+    - If that key is already stored, the temporary object is deleted instead: a
+      duplicate upload leaves no second copy behind.
+    - Keys never change content, so they can be cached forever ('immutable').
+    - Reference counts: the wrapper subscribes to the video DB and counts the
+      videos pointing at an object (filename / thumbnail). 'flask storage gc'
+      removes objects nothing references.
+
+    Resumable (multipart) uploads pass through untouched (the API stages them
+    under a unique key per session): hashing them would mean reading the
+    assembled object back.
+    Derived files (thumbnail variants, HLS) go to the inner storage directly.
+    """
+    def __init__(self, inner, refs, register_wait=CLAIM_TIMEOUT):
+        self.inner = inner
+        self.refs = refs
+        self.register_wait = register_wait
+
+    def __getattr__(self, name):
+        # Backend-specific extras (signed_url, generate_presigned_url...) pass straight through
+        if name == 'inner':
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def attach(self, db_service):
+        db_service.subscribe(self._on_video_change)
+
+    def _on_video_change(self, event, video):
+        # 'put' may repeat for the same video (re-imports): set_refs counts each video once
+        if event not in ('put', 'update'):
+            return
+        keys = {key for key in (video.get('filename'), video.get('thumbnail')) if digest_of(key)}
+        self.refs.set_refs(video['video_id'], keys)
+
+    def _register(self, key, size):
+        # None = gc is deleting this object right now: wait for it to finish (or its claim to expire)
+        deadline = time.monotonic() + self.register_wait
+        while True:
+            known = self.refs.register(key, size)
+            if known is not None or time.monotonic() > deadline:
+                return bool(known)
+            time.sleep(0.2)
+
+    # --- Uploads ---
+    def upload_stream(self, chunks, filename):
+        # Streamed once, straight into storage under a temporary name; the backend hashes on the way
+        tmp = f"{TMP_PREFIX}{uuid.uuid4().hex}/{secure_filename(filename or '') or 'upload'}"
+        stored, size, digest = self.inner.upload_stream(chunks, tmp)
+        if not stored:
+            print(f"[ERROR] Content-addressed upload of {filename} failed")
+            return None, 0, None
+
+        key = cas_key(digest, filename)
+        if self._register(key, size) and self.inner.exists(key):
+            print(f"[INFO] {filename} is a duplicate of {key}, nothing kept")
+            self.inner.delete_file(tmp)
+        elif not self.inner.move_file(tmp, key):  # server-side: no bytes pass through us
+            self.inner.delete_file(tmp)
+            return None, 0, None
+        return key, size, digest
+
+    def upload_file(self, file_obj, filename):
+        return self.upload_stream(file_obj.stream, filename)[0]
+
+    # --- Resumable uploads: passed through ---
+    def create_multipart_upload(self, filename):
+        return self.inner.create_multipart_upload(filename)
+
+    def upload_part(self, filename, upload_id, part_number, chunks):
+        return self.inner.upload_part(filename, upload_id, part_number, chunks)
+
+    def list_parts(self, filename, upload_id):
+        return self.inner.list_parts(filename, upload_id)
+
+    def complete_multipart_upload(self, filename, upload_id, parts):
+        return self.inner.complete_multipart_upload(filename, upload_id, parts)
+
+    def abort_multipart_upload(self, filename, upload_id):
+        return self.inner.abort_multipart_upload(filename, upload_id)
+
+    # --- Reads ---
+    def read_file(self, filename):
+        return self.inner.read_file(filename)
+
+    def media_source(self, filename):
+        return self.inner.media_source(filename)
+
+    def exists(self, filename):
+        return self.inner.exists(filename)
+
+    def delete_file(self, filename):
+        return self.inner.delete_file(filename)
+
+    def copy_file(self, source, dest):
+        return self.inner.copy_file(source, dest)
+
+    def move_file(self, source, dest):
+        return self.inner.move_file(source, dest)
+
+    # --- Maintenance ---
+    def gc(self, older_than=24 * 3600):
+        """Deletes stored objects that no video references (after a grace period). Returns the count."""
+        deleted = 0
+        for key in self.refs.orphans(older_than):
+            # Claim first: an upload of the same content landing now re-registers the key and wins
+            if not self.refs.claim(key, older_than):
+                continue
+            if self.inner.delete_file(key):
+                self.refs.forget(key)
+                deleted += 1
+            else:
+                self.refs.release(key)
+        return deleted
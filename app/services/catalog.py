@@ -0,0 +1,135 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from decimal import Decimal
+from itertools import islice
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency: pip install pyarrow (only for --format parquet)
+    pa = None
+
+# Columnar layout: typed columns for the attributes every record has, the rest as JSON in 'extra'
+# (same split as the SQLite backend)
+VIDEO_FIELDS = (('video_id', 'string'), ('user_id', 'string'), ('title', 'string'), ('description', 'string'),
+                ('tags', 'list'), ('filename', 'string'), ('thumbnail', 'string'), ('upload_date', 'string'),
+                ('created_at', 'string'), ('views', 'int'), ('likes', 'int'))
+USER_FIELDS = (('user_id', 'string'), ('email', 'string'), ('username', 'string'),
+               ('password_hash', 'string'), ('avatar', 'string'))
+FIELDS = {'videos': VIDEO_FIELDS, 'users': USER_FIELDS}
+FORMATS = ('jsonl', 'parquet')
+
+
+def _json_default(value):
+    # DynamoDB numbers come back as Decimal, string sets as set
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def filename(kind, fmt, compress=True):
+    """'videos', 'jsonl' -> 'videos.jsonl.gz'"""
+    return f"{kind}.{fmt}" + ('.gz' if fmt == 'jsonl' and compress else '')
+
+
+# --- 1. NEWLINE-DELIMITED JSON (optionally gzipped) ---
+def write_jsonl(records, path):
+    opener = gzip.open if path.endswith('.gz') else open
+    count = 0
+    with opener(path, 'wt', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, default=_json_default, separators=(',', ':')) + '\n')
+            count += 1
+    return count
+
+
+def read_jsonl(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# --- 2. PARQUET (columnar) ---
+def _arrow_schema(fields):
+    types = {'string': pa.string(), 'int': pa.int64(), 'list': pa.list_(pa.string())}
+    return pa.schema([(name, types[kind]) for name, kind in fields] + [('extra', pa.string())])
+
+
+def write_parquet(records, path, fields, batch_size=10000):
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+    schema = _arrow_schema(fields)
+    names = {name for name, _ in fields}
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch in _batches(records, batch_size):
+            columns = {name: [] for name in schema.names}
+            for record in batch:
+                for name, kind in fields:
+                    value = record.get(name)
+                    if kind == 'int':
+                        value = int(value or 0)
+                    elif kind == 'list':
+                        value = [str(v) for v in value or []]
+                    elif value is not None:
+                        value = str(value)
+                    columns[name].append(value)
+                extra = {k: v for k, v in record.items() if k not in names}
+                columns['extra'].append(json.dumps(extra, default=_json_default) if extra else None)
+            writer.write_table(pa.table(columns, schema=schema))  # one row group per batch
+            count += len(batch)
+    return count
+
+
+def read_parquet(path):
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches():
+        for row in batch.to_pylist():
+            extra = row.pop('extra', None)
+            if extra:
+                row.update(json.loads(extra))
+            yield {k: v for k, v in row.items() if v is not None}
+
+
+# --- 3. EXPORT / IMPORT ---
+def export_records(records, path, kind, fmt='jsonl'):
+    """Streams 'records' ('videos' or 'users') to path. Returns the count."""
+    if fmt == 'parquet':
+        return write_parquet(records, path, FIELDS[kind])
+    return write_jsonl(records, path)
+
+
+def read_records(path):
+    """Yields the records of an export file (format from the extension)"""
+    return read_parquet(path) if path.endswith('.parquet') else read_jsonl(path)
+
+
+def import_records(records, write_batch, batch_size=500, workers=4):
+    """
+    Feeds records to write_batch(list) -> written count, batch_size at a time, with up to
+    'workers' batches in flight (reading the file overlaps the writes). Returns the total written.
+    """
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import') as pool:
+        in_flight = set()
+        for batch in _batches(records, batch_size):
+            if len(in_flight) >= workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                total += sum(f.result() for f in done)
+            in_flight.add(pool.submit(write_batch, batch))
+        total += sum(f.result() for f in in_flight)
+    return total
@@ -0,0 +1,68 @@
+import atexit
+import threading
+from collections import defaultdict
+
+
+class ViewCounter:
+    """
+    Write-behind buffer for view counts.
+
+    Views are added to an in-memory tally and flushed to db_service.increment_views
+    in batches (every flush_interval seconds, or sooner once max_pending views are
+    waiting). A hot video watched 500 times between flushes costs one atomic
+    update instead of 500 read-modify-writes. Pending views are flushed at exit.
+    """
+    def __init__(self, db_service, flush_interval=5, max_pending=1000):
+        self.db = db_service
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = defaultdict(int)
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        # Started lazily so forked Gunicorn workers each get their own flusher
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name='view-counter')
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def add_view(self, video_id, amount=1):
+        """Records views; returns how many views of this video are still waiting to be flushed."""
+        with self._lock:
+            self._pending[video_id] += amount
+            self._pending_total += amount
+            pending = self._pending[video_id]
+            if self._pending_total >= self.max_pending:
+                self._wake.set()
+        self._ensure_thread()
+        return pending
+
+    def pending(self, video_id):
+        with self._lock:
+            return self._pending.get(video_id, 0)
+
+    def flush(self):
+        """Writes every pending tally with one increment per video. Returns the number of videos updated."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(int)
+                self._pending_total = 0
+            for video_id, amount in batch.items():
+                try:
+                    self.db.increment_views(video_id, amount)
+                except Exception as e:
+                    print(f"[ERROR] Flushing {amount} views for {video_id} failed: {e}")
+                    with self._lock:
+                        self._pending[video_id] += amount
+                        self._pending_total += amount
+            return len(batch)
@@ -0,0 +1,163 @@
+import bisect
+import threading
+import time
+from app.services.cache import TTLCache
+from app.services.pagination import decode_cursor
+
+# What a feed entry keeps of a video: enough for the gallery card and /api/videos
+SUMMARY_FIELDS = ('video_id', 'user_id', 'title', 'description', 'tags', 'filename', 'thumbnail',
+                  'thumbnails', 'hls', 'upload_date', 'created_at', 'views', 'likes')
+
+
+def summarize(video):
+    return {field: video[field] for field in SUMMARY_FIELDS if field in video}
+
+
+def _sort_key(video):
+    return (video.get('created_at') or f"{video.get('upload_date', '')}T00:00:00", video['video_id'])
+
+
+class ExploreFeed:
+    """
+    Materialized Explore feed: the newest 'size' video summaries, in feed order.
+
+    - Built with one list_videos query on first use, then kept current incrementally
+      from the video DB's change events ('put' inserts, 'update' / 'counters' patch
+      the entry in place). Pages inside the window never touch the database.
+    - Other workers' writes are picked up by a rebuild once the window is older than
+      max_age seconds (in the background; requests keep using the current window).
+    - rendered() caches the output of a page (HTML fragment, JSON body) until that
+      page changes, so a hit on the public feed is a dict lookup.
+    """
+    def __init__(self, db_service, size=240, max_age=30, fragments=64):
+        self.db = db_service
+        self.size = size
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._keys = []          # ascending (created_at, video_id)
+        self._by_id = {}         # video_id -> summary
+        self._complete = True    # False if older videos exist beyond the window
+        self._built_at = None
+        self._rebuilding = False
+        self._replay = None      # events seen while a rebuild was running
+        self.version = 0         # bumped when entries / order change
+        self.counters_version = 0
+        self.fragments = TTLCache(maxsize=fragments, ttl=max_age)
+        db_service.subscribe(self._on_change)
+
+    # --- Maintenance ---
+    def _on_change(self, event, video):
+        with self._lock:
+            if self._built_at is None:
+                return
+            if self._replay is not None:
+                self._replay.append((event, video))
+            self._apply(event, video)
+
+    def _apply(self, event, video):
+        video_id = video.get('video_id')
+        if event == 'put':
+            self._insert(summarize(video))
+        elif video_id in self._by_id:
+            self._by_id[video_id] = dict(self._by_id[video_id], **summarize(video))
+            if event == 'counters':
+                self.counters_version += 1
+            else:
+                self.version += 1
+
+    def _insert(self, entry):
+        key = _sort_key(entry)
+        if entry['video_id'] in self._by_id:
+            self._keys.remove(_sort_key(self._by_id[entry['video_id']]))
+        elif len(self._keys) >= self.size and self._keys and key < self._keys[0]:
+            return  # older than everything in a full window
+        bisect.insort(self._keys, key)
+        self._by_id[entry['video_id']] = entry
+        while len(self._keys) > self.size:
+            _, dropped = self._keys.pop(0)
+            del self._by_id[dropped]
+            self._complete = False
+        self.version += 1
+
+    def rebuild(self):
+        with self._lock:
+            self._replay = []
+        try:
+            videos, next_cursor = self.db.list_videos(limit=self.size)
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+        by_id = {v['video_id']: summarize(v) for v in videos}
+        with self._lock:
+            self._keys = sorted(_sort_key(v) for v in by_id.values())
+            self._by_id = by_id
+            self._complete = next_cursor is None
+            # Writes made while the query ran may be missing from its result
+            replay, self._replay = self._replay, None
+            for event, video in replay:
+                self._apply(event, video)
+            self._built_at = time.monotonic()
+            self.version += 1
+        print(f"[INFO] Explore feed built: {len(by_id)} videos")
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            with self._lock:
+                if self._built_at is None:
+                    self.rebuild()
+        elif time.monotonic() - self._built_at > self.max_age and not self._rebuilding:
+            self._rebuilding = True
+            threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"[ERROR] Explore feed rebuild failed: {e}")
+        finally:
+            self._rebuilding = False
+
+    # --- Reads ---
+    def page(self, cursor=None, limit=20):
+        """
+        Same contract as db_service.list_videos, served from the window.
+        Returns None if the page reaches past the window (the caller asks the database).
+        Raises ValueError for an invalid cursor.
+        """
+        after = decode_cursor(cursor)
+        self._ensure_fresh()
+        with self._lock:
+            if after:
+                end = bisect.bisect_left(self._keys, (after.get('created_at', ''), after.get('video_id', '')))
+            else:
+                end = len(self._keys)
+            start = max(0, end - limit)
+            if start == 0 and end - start < limit and not self._complete:
+                return None
+            page = [dict(self._by_id[vid]) for _, vid in reversed(self._keys[start:end])]
+            more = start > 0 or not self._complete
+        next_cursor = None
+        if page and more:
+            next_cursor = self.db.feed_cursor(page[-1])
+        return page, next_cursor
+
+    def rendered(self, kind, cursor, limit, render, counters=False):
+        """
+        render(videos, next_cursor) for one page, cached until the page changes.
+        counters=True if the output shows views / likes. None if the page is not in the window.
+        """
+        self._ensure_fresh()
+        key = (kind, self.version, self.counters_version if counters else None, cursor, limit)
+        output = self.fragments.get(key)
+        if output is None:
+            result = self.page(cursor, limit)
+            if result is None:
+                return None
+            output = render(*result)
+            self.fragments.set(key, output)
+        return output
+
+    def stats(self):
+        return {'size': len(self._keys), 'version': self.version,
+                'fragments': {'hits': self.fragments.hits, 'misses': self.fragments.misses}}
@@ -0,0 +1,139 @@
+import json
+import os
+import posixpath
+import shutil
+import subprocess
+import tempfile
+
+# (height, video kbps) ladder; renditions taller than the source are skipped
+DEFAULT_RENDITIONS = ((360, 800), (720, 2800), (1080, 5000))
+AUDIO_KBPS = 128
+MANIFEST = 'master.m3u8'
+
+
+def hls_prefix(video_id):
+    return f"hls/{video_id}"
+
+
+def probe(source, timeout=120):
+    """(width, height, has_audio) of the video at 'source', via ffprobe"""
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe:
+        raise RuntimeError("ffprobe not found")
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_entries', 'stream=codec_type,width,height', '-of', 'json', source],
+        capture_output=True, timeout=timeout, check=True
+    )
+    streams = json.loads(result.stdout).get('streams', [])
+    video = next(s for s in streams if s.get('codec_type') == 'video')
+    return int(video['width']), int(video['height']), any(s.get('codec_type') == 'audio' for s in streams)
+
+
+def pick_renditions(source_height, renditions=DEFAULT_RENDITIONS):
+    """Ladder steps up to the source height (never upscale); at least the smallest one"""
+    picked = [r for r in renditions if r[0] <= source_height]
+    return picked or [min(renditions)]
+
+
+def master_playlist(variants):
+    """
+    variants: [(playlist_name, width, height, video_kbps, has_audio), ...]
+    Returns the master playlist text; players pick a rendition by BANDWIDTH.
+    """
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for name, width, height, kbps, has_audio in variants:
+        bandwidth = (kbps + (AUDIO_KBPS if has_audio else 0)) * 1000
+        codecs = 'avc1.4d401f,mp4a.40.2' if has_audio else 'avc1.4d401f'
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height},CODECS="{codecs}"')
+        lines.append(name)
+    return '\n'.join(lines) + '\n'
+
+
+def rewrite_playlist(text, base, make_url):
+    """
+    Replaces every URI line of a playlist (relative to 'base', the playlist's own
+    storage folder) with make_url(storage_key). Used when the files themselves
+    are only reachable through signed / redirected URLs.
+    """
+    lines = []
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            line = make_url(posixpath.normpath(posixpath.join(base, line)))
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+class HLSPackager:
+    """
+    Transcodes an uploaded video into an HLS ladder with a local ffmpeg and
+    stores the result through the StorageService:
+
+        hls/<video_id>/master.m3u8        master playlist (one entry per rendition)
+        hls/<video_id>/<h>p.m3u8          media playlist of one rendition
+        hls/<video_id>/<h>p_00001.ts      segment_seconds-long segments
+
+    Keyframes are forced every segment_seconds so all renditions cut at the same
+    timestamps and players can switch between them at any segment boundary.
+    The video record gets {'hls': 'hls/<video_id>/master.m3u8'} when done.
+    """
+    def __init__(self, storage, db, renditions=DEFAULT_RENDITIONS, segment_seconds=6, preset='veryfast',
+                 timeout=3600):
+        self.storage = storage
+        self.db = db
+        self.renditions = renditions
+        self.segment_seconds = segment_seconds
+        self.preset = preset
+        self.timeout = timeout
+
+    def _transcode(self, source, workdir, height, kbps, has_audio):
+        name = f"{height}p"
+        cmd = [
+            shutil.which('ffmpeg'), '-v', 'error', '-y', '-i', source,
+            '-map', '0:v:0', '-vf', f"scale=-2:{height}",
+            '-c:v', 'libx264', '-preset', self.preset, '-profile:v', 'main',
+            '-b:v', f"{kbps}k", '-maxrate', f"{int(kbps * 1.07)}k", '-bufsize', f"{int(kbps * 1.5)}k",
+            '-force_key_frames', f"expr:gte(t,n_forced*{self.segment_seconds})", '-sc_threshold', '0',
+        ]
+        if has_audio:
+            cmd += ['-map', '0:a:0', '-c:a', 'aac', '-b:a', f"{AUDIO_KBPS}k", '-ac', '2']
+        cmd += [
+            '-f', 'hls', '-hls_time', str(self.segment_seconds), '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(workdir, f"{name}_%05d.ts"),
+            os.path.join(workdir, f"{name}.m3u8")
+        ]
+        result = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed for {name}: {result.stderr.decode(errors='replace')[-500:]}")
+        return f"{name}.m3u8"
+
+    def package(self, video_id, video_file):
+        """Returns the updated video record, or None if ffmpeg is not installed"""
+        if not shutil.which('ffmpeg'):
+            print("[WARN] ffmpeg not found, skipping HLS packaging")
+            return None
+
+        source = self.storage.media_source(video_file)
+        width, height, has_audio = probe(source)
+        prefix = hls_prefix(video_id)
+
+        with tempfile.TemporaryDirectory(prefix='hls-') as workdir:
+            variants = []
+            for rendition_height, kbps in pick_renditions(height, self.renditions):
+                playlist = self._transcode(source, workdir, rendition_height, kbps, has_audio)
+                rendition_width = int(round(width * rendition_height / height / 2)) * 2
+                variants.append((playlist, rendition_width, rendition_height, kbps, has_audio))
+            with open(os.path.join(workdir, MANIFEST), 'w') as f:
+                f.write(master_playlist(variants))
+
+            # Segments first, manifest last: a manifest in storage means the whole ladder is there
+            names = sorted(os.listdir(workdir), key=lambda n: (n == MANIFEST, n.endswith('.m3u8'), n))
+            for name in names:
+                with open(os.path.join(workdir, name), 'rb') as f:
+                    if not self.storage.upload_stream(f, f"{prefix}/{name}")[0]:
+                        raise IOError(f"could not store {prefix}/{name}")
+            print(f"[INFO] HLS for {video_id}: {len(variants)} rendition(s), {len(names)} files")
+
+        video = self.db.update_video(video_id, {'hls': f"{prefix}/{MANIFEST}"})
+        if video is None:
+            raise LookupError(f"video {video_id} not found")
+        return video
@@ -0,0 +1,335 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import traceback
+import uuid
+from app.services.sqlite_impl import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id       TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL,            -- queued | running | done | dead
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    run_at       REAL NOT NULL,            -- not before (retries are delayed)
+    lease_until  REAL,                     -- a running job whose lease expired is picked up again
+    last_error   TEXT,
+    created_at   REAL NOT NULL,
+    finished_at  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at);
+"""
+
+
+# --- 1. DURABLE QUEUE ---
+class JobQueue:
+    """
+    Local durable job queue: one SQLite (WAL) file shared by every worker on the box.
+
+    - enqueue() is a single INSERT, cheap enough for the request thread.
+    - claim() hands a job to exactly one worker (BEGIN IMMEDIATE) with a lease;
+      the worker renews it while the job runs, so a short lease covers long jobs
+      and the job of a worker that died is claimable again once the lease expires.
+    - A failed job is retried with exponential backoff; after max_attempts it is
+      moved to the dead-letter list (status 'dead') and kept for inspection/retry.
+    """
+    def __init__(self, path, max_attempts=5, retry_delay=10, lease=300):
+        self.db = SQLiteDatabase(path, schema=SCHEMA)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self._listeners = []
+
+    def on_enqueue(self, callback):
+        self._listeners.append(callback)
+
+    def enqueue(self, kind, payload, delay=0):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, payload, status, run_at, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), now + delay, now)
+            )
+        for callback in self._listeners:
+            callback()
+        return job_id
+
+    def claim(self):
+        """Takes the next due job (or one whose lease expired); returns it as a dict, or None"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' AND run_at <= ?) "
+                "OR (status = 'running' AND lease_until < ?) ORDER BY run_at LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ? WHERE job_id = ?",
+                (now + self.lease, row['job_id'])
+            )
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['attempts'] += 1
+        return job
+
+    def claim_more(self, kind, limit):
+        """Takes up to 'limit' further due jobs of one kind (for handlers that work in batches)"""
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND ((status = 'queued' AND run_at <= ?) "
+                "OR (status = 'running' AND lease_until < ?)) ORDER BY run_at LIMIT ?",
+                (kind, now, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ? WHERE job_id = ?",
+                [(now + self.lease, row['job_id']) for row in rows]
+            )
+        return [dict(row, payload=json.loads(row['payload']), attempts=row['attempts'] + 1) for row in rows]
+
+    def renew(self, jobs):
+        """Extends the lease of running jobs; returns how many are still held by this claim"""
+        until = time.time() + self.lease
+        with self.db.transaction() as conn:
+            # A job claimed again after its lease expired has more attempts: that claim owns it now
+            return sum(conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND status = 'running' AND attempts = ?",
+                (until, job['job_id'], job['attempts'])
+            ).rowcount for job in jobs)
+
+    def complete(self, job_id):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', lease_until = NULL, finished_at = ? WHERE job_id = ?",
+                         (time.time(), job_id))
+
+    def fail(self, job, error):
+        """Schedules a retry (delay doubles each attempt) or dead-letters the job. Returns the new status."""
+        if job['attempts'] >= self.max_attempts:
+            status, run_at = 'dead', job['run_at']
+        else:
+            status, run_at = 'queued', time.time() + self.retry_delay * 2 ** (job['attempts'] - 1)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, run_at = ?, lease_until = NULL, last_error = ?, finished_at = ? "
+                "WHERE job_id = ?",
+                (status, run_at, str(error)[:2000], time.time() if status == 'dead' else None, job['job_id'])
+            )
+        return status
+
+    def get(self, job_id):
+        row = self.db.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def dead_letters(self, limit=100):
+        rows = self.db.conn.execute(
+            "SELECT * FROM jobs WHERE status = 'dead' ORDER BY finished_at DESC LIMIT ?", (limit,)
+        )
+        return [dict(r, payload=json.loads(r['payload'])) for r in rows]
+
+    def retry_dead(self, job_id=None):
+        """Puts one dead job (or all of them) back in the queue with a fresh attempt count"""
+        query = "UPDATE jobs SET status = 'queued', attempts = 0, run_at = ?, finished_at = NULL WHERE status = 'dead'"
+        args = [time.time()]
+        if job_id:
+            query += " AND job_id = ?"
+            args.append(job_id)
+        with self.db.transaction() as conn:
+            count = conn.execute(query, args).rowcount
+        if count:
+            for callback in self._listeners:
+                callback()
+        return count
+
+    def purge(self, older_than=7 * 24 * 3600):
+        """Deletes finished jobs older than 'older_than' seconds"""
+        with self.db.transaction() as conn:
+            return conn.execute("DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+                                (time.time() - older_than,)).rowcount
+
+    def counts(self):
+        rows = self.db.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {r['status']: r['n'] for r in rows}
+
+
+# --- 2. WORKER POOL ---
+class JobWorkerPool:
+    """
+    Background threads that claim jobs and run handlers[job['kind']](payload).
+    A handler marked with @batched(n) gets the payloads of up to n due jobs of its
+    kind at once and returns the indexes of the ones that failed.
+
+    create_app starts the pool in every web process (threads do not survive a fork,
+    so a pool started before Gunicorn forks restarts in each child); an enqueue also
+    (re)starts it. 'flask jobs work' runs a pool in the foreground for a dedicated
+    worker process. Between jobs, idle threads sleep poll_interval seconds or until
+    something is enqueued.
+    """
+    def __init__(self, queue, handlers, threads=2, poll_interval=2):
+        self.queue = queue
+        self.handlers = handlers
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._workers = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._started = False
+        queue.on_enqueue(self._on_enqueue)
+        atexit.register(self._stopping.set)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._workers = []
+        if self._started:
+            self.start()
+
+    def _on_enqueue(self):
+        self._wake.set()
+        self.start()
+
+    def start(self):
+        with self._lock:
+            self._started = True
+            self._workers = [t for t in self._workers if t.is_alive()]
+            while len(self._workers) < self.threads:
+                t = threading.Thread(target=self._run, daemon=True, name=f"job-worker-{len(self._workers)}")
+                t.start()
+                self._workers.append(t)
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not self.run_once():
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self):
+        """Runs at most one job; returns False when the queue had nothing due"""
+        try:
+            job = self.queue.claim()
+        except Exception as e:
+            print(f"[ERROR] Could not claim a job: {e}")
+            return False
+        if job is None:
+            return False
+
+        handler = self.handlers.get(job['kind'])
+        jobs = [job]
+        if getattr(handler, 'batch_size', None):
+            jobs += self.queue.claim_more(job['kind'], handler.batch_size - 1)
+        running = threading.Event()
+        threading.Thread(target=self._renew_leases, args=(jobs, running), daemon=True).start()
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job kind '{job['kind']}'")
+            if getattr(handler, 'batch_size', None):
+                failed = set(handler([j['payload'] for j in jobs]))
+            else:
+                handler(job['payload'])
+                failed = set()
+            errors = {i: RuntimeError("not delivered") for i in failed}
+        except Exception as e:
+            errors = {i: e for i in range(len(jobs))}
+        finally:
+            running.set()
+
+        for i, j in enumerate(jobs):
+            if i not in errors:
+                self.queue.complete(j['job_id'])
+                continue
+            status = self.queue.fail(j, errors[i])
+            print(f"[ERROR] Job {j['kind']} {j['job_id']} failed (attempt {j['attempts']}, now {status}): {errors[i]}")
+            if status == 'dead':
+                traceback.print_exception(type(errors[i]), errors[i], errors[i].__traceback__)
+        return True
+
+    def _renew_leases(self, jobs, done):
+        # Renews every third of a lease until the handler returns (HLS transcodes take hours)
+        while not done.wait(self.queue.lease / 3):
+            try:
+                if self.queue.renew(jobs) < len(jobs) and not done.is_set():
+                    print(f"[WARN] Lost the lease of a running {jobs[0]['kind']} job, it may run twice")
+            except Exception as e:
+                print(f"[WARN] Could not renew job leases: {e}")
+
+    def drain(self):
+        """Runs due jobs in the calling thread until none are left; returns how many ran"""
+        ran = 0
+        while self.run_once():
+            ran += 1
+        return ran
+
+
+def next_window(interval, now=None):
+    """Delay until the next multiple of 'interval' seconds: jobs enqueued within one window fall due together"""
+    if not interval:
+        return 0
+    now = time.time() if now is None else now
+    return math.ceil(now / interval) * interval - now
+
+
+def batched(size):
+    """Marks a handler as taking a list of payloads (up to 'size' due jobs of its kind at once)"""
+    def mark(handler):
+        handler.batch_size = size
+        return handler
+    return mark
+
+
+# --- 3. POST-UPLOAD JOBS ---
+def post_upload_handlers(db_service, analyzer_service, notifier_service, bucket, thumbnails=None, hls=None,
+                         notify_batch=1):
+    """
+    Handlers for the work stream.upload used to do inline:
+      'analyze'    - label the thumbnail and add the labels to the video's tags (set_labels)
+      'notify'     - announce the new upload (up to notify_batch due announcements are
+                     sent together, via notifier_service.send_batch; notify_batch=1 is one
+                     send_notification per announcement)
+      'thumbnails' - build the feed's thumbnail variants (a ThumbnailGenerator); with
+                     no uploaded thumbnail, derive one from the video and analyze that
+      'hls'        - transcode the video into an HLS ladder (an HLSPackager)
+    """
+    def analyze(payload):
+        labels = analyzer_service.detect_labels(bucket, payload['thumbnail'])
+        if labels is None:
+            raise RuntimeError(f"label detection failed for {payload['thumbnail']}")
+        print(f"[DEBUG] AI Tags Found for {payload['video_id']}: {labels}")
+        if db_service.set_labels(payload['video_id'], labels) is None:
+            raise LookupError(f"video {payload['video_id']} not found")
+
+    @batched(notify_batch)
+    def notify_batch_of(payloads):
+        return notifier_service.send_batch([(p['subject'], p['message']) for p in payloads])
+
+    def notify(payload):
+        if notifier_service.send_notification(payload['subject'], payload['message']) is False:
+            raise RuntimeError(f"notification '{payload['subject']}' was not sent")
+
+    def make_thumbnails(payload):
+        video = thumbnails.generate(payload['video_id'], payload.get('thumbnail'), payload.get('video'))
+        if payload.get('analyze') and video and video.get('thumbnail'):
+            analyze({'video_id': payload['video_id'], 'thumbnail': video['thumbnail']})
+
+    handlers = {'analyze': analyze, 'notify': notify_batch_of if notify_batch > 1 else notify}
+    if thumbnails is not None:
+        handlers['thumbnails'] = make_thumbnails
+    if hls is not None:
+        handlers['hls'] = lambda payload: hls.package(payload['video_id'], payload['video'])
+    return handlers
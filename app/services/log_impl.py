@@ -0,0 +1,330 @@
+import bisect
+import glob
+import json
+import os
+import re
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+from app.services.base import VideoDBService, merge_labels
+from app.services.pagination import encode_cursor, decode_cursor
+
+SNAPSHOT, LOG = 0, 1
+
+
+def _dumps(record):
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class LogVideoDB(VideoDBService):
+    """
+    Log-structured local video catalog.
+
+    Files (in db_path):
+      catalog.snapshot  - header line {"generation": g}, then one line per live video
+      catalog.<g>.log   - every write since that snapshot, one JSON line each
+
+    - Every write (new video, counters, tags, metadata) appends the video's new
+      record to the log: O(1) per write instead of rewriting the whole catalog.
+    - Memory holds only an index (video_id -> file + offset, feed order, per-user
+      ids); records are read back from disk on demand.
+    - Once the log passes compact_bytes a background thread writes a new snapshot
+      holding only the latest record of each video and starts an empty log, so
+      startup loads the snapshot and replays just the tail written after it.
+    - Other workers' appends (and compactions) are picked up before every call,
+      by comparing the files on disk with what this process has indexed.
+    """
+    def __init__(self, db_path=None, compact_bytes=4 * 1024 * 1024):
+        if db_path is None:
+            BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            db_path = os.path.join(BASE_DIR, 'mock_aws', 'local_db')
+        os.makedirs(db_path, exist_ok=True)
+        self.db_path = db_path
+        self.snapshot_file = os.path.join(db_path, 'catalog.snapshot')
+        self.compact_bytes = compact_bytes
+        self._thread_lock = threading.RLock()
+        self._compacting = False
+        self._files = [None, None]
+        self._snapshot_id = None
+        self._load()
+        print(f"[INFO] LogVideoDB initialized: {len(self._offsets)} videos, generation {self._generation}")
+
+    # --- Files & locking ---
+    def _log_file(self, generation):
+        return os.path.join(self.db_path, f"catalog.{generation}.log")
+
+    @contextmanager
+    def _locked(self):
+        """Serializes appends and compaction across threads and (via flock) Gunicorn workers"""
+        with self._thread_lock, open(os.path.join(self.db_path, 'catalog.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _close_files(self):
+        for f in self._files:
+            if f:
+                f.close()
+        self._files = [None, None]
+
+    # --- Loading / replay ---
+    def _load(self):
+        """(Re)builds the in-memory index: the snapshot, then the log written after it"""
+        with self._thread_lock:
+            self._close_files()
+            self._offsets = {}                  # video_id -> (SNAPSHOT | LOG, offset)
+            self._keys = []                     # ascending (created_at, video_id)
+            self._by_user = defaultdict(set)    # user_id -> video_ids
+            self._generation = 0
+            self._snapshot_id = None
+            self._log_end = 0
+
+            if os.path.exists(self.snapshot_file):
+                f = open(self.snapshot_file, 'rb')
+                stat = os.fstat(f.fileno())
+                self._snapshot_id = (stat.st_ino, stat.st_mtime_ns)
+                self._generation = json.loads(f.readline())['generation']
+                self._files[SNAPSHOT] = f
+                self._replay(SNAPSHOT, f.tell())
+
+            path = self._log_file(self._generation)
+            if not os.path.exists(path):
+                open(path, 'ab').close()
+            self._files[LOG] = open(path, 'rb')
+            self._log_end = self._replay(LOG, 0)
+
+    def _replay(self, source, start):
+        """Indexes every complete record from 'start' on; returns the offset after the last one"""
+        f = self._files[source]
+        f.seek(start)
+        offset = start
+        for line in iter(f.readline, b''):
+            if not line.endswith(b'\n'):
+                break  # torn write at the tail (crash mid-append); _append truncates it
+            try:
+                video = json.loads(line)
+            except ValueError:
+                break
+            self._index(video, source, offset)
+            offset += len(line)
+        return offset
+
+    def _index(self, video, source, offset):
+        video_id = video['video_id']
+        if video_id not in self._offsets:
+            bisect.insort(self._keys, (self._sort_key(video), video_id))
+            self._by_user[video.get('user_id')].add(video_id)
+        self._offsets[video_id] = (source, offset)
+
+    def _sync(self):
+        """Picks up what other workers wrote: a new snapshot means reload, a longer log means replay its tail"""
+        try:
+            stat = os.stat(self.snapshot_file)
+            snapshot_id = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            snapshot_id = None
+        if snapshot_id != self._snapshot_id:
+            self._load()
+            return
+        try:
+            size = os.path.getsize(self._log_file(self._generation))
+        except OSError:
+            self._load()
+            return
+        if size > self._log_end:
+            self._log_end = self._replay(LOG, self._log_end)
+
+    @staticmethod
+    def _sort_key(video):
+        return video.get('created_at') or f"{video.get('upload_date', '')}T00:00:00"
+
+    # --- Record access ---
+    def _read_record(self, video_id):
+        location = self._offsets.get(video_id)
+        if location is None:
+            return None
+        f = self._files[location[0]]
+        f.seek(location[1])
+        return json.loads(f.readline())
+
+    def _append(self, video):
+        """Appends the video's current record to the log (caller holds _locked)"""
+        record = _dumps(video)
+        with open(self._log_file(self._generation), 'ab') as f:
+            if f.seek(0, os.SEEK_END) != self._log_end:
+                f.truncate(self._log_end)  # drop a torn record left by a crashed writer
+            f.write(record)
+        self._index(video, LOG, self._log_end)
+        self._log_end += len(record)
+        if self._log_end > self.compact_bytes and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._background_compact, daemon=True, name='catalog-compact').start()
+
+    def _update(self, video_id, change):
+        """Read-modify-append of one video under the lock; returns the new record or None"""
+        with self._locked():
+            self._sync()
+            video = self._read_record(video_id)
+            if video is None:
+                return None
+            change(video)
+            self._append(video)
+        return video
+
+    # --- Compaction ---
+    def _background_compact(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"[ERROR] Catalog compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """Writes a snapshot of the latest record of every video and starts an empty log"""
+        with self._locked():
+            self._sync()
+            old_generation = self._generation
+            generation = old_generation + 1
+            tmp = self.snapshot_file + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(_dumps({'generation': generation}))
+                for _, video_id in self._keys:
+                    f.write(_dumps(self._read_record(video_id)))
+                f.flush()
+                os.fsync(f.fileno())
+            open(self._log_file(generation), 'ab').close()
+            os.replace(tmp, self.snapshot_file)
+            self._load()
+            for path in glob.glob(os.path.join(self.db_path, 'catalog.*.log')):
+                match = re.search(r"catalog\.(\d+)\.log$", path)
+                if match and int(match.group(1)) < generation:
+                    os.remove(path)
+        print(f"[INFO] Catalog compacted: {len(self._offsets)} videos, generation {generation}")
+
+    # --- VideoDBService ---
+    def put_video(self, title, description, tags, filename, user_id, thumbnail_filename=None):
+        now = datetime.now()
+        new_video = {
+            'video_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'title': title,
+            'description': description,
+            'tags': tags if isinstance(tags, list) else [],
+            'filename': filename,
+            'thumbnail': thumbnail_filename,
+            'upload_date': now.strftime("%Y-%m-%d"),
+            'created_at': now.isoformat(timespec='microseconds'),
+            'views': 0, 'likes': 0
+        }
+        with self._locked():
+            self._sync()
+            self._append(new_video)
+        self._publish('put', new_video)
+        return new_video['video_id']
+
+    def put_videos(self, videos):
+        records = [self._complete_record(v) for v in videos]
+        with self._locked():
+            self._sync()
+            for video in records:
+                self._append(video)
+        for video in records:
+            self._publish('put', video)
+        return len(records)
+
+    def get_all_videos(self):
+        with self._thread_lock:
+            self._sync()
+            return [self._read_record(vid) for _, vid in reversed(self._keys)]
+
+    def list_videos(self, cursor=None, limit=20):
+        after = decode_cursor(cursor)
+        with self._thread_lock:
+            self._sync()
+            keys = self._keys
+            end = bisect.bisect_left(keys, (after.get('created_at', ''), after.get('video_id', ''))) if after else len(keys)
+            start = max(0, end - limit)
+            page = [self._read_record(vid) for _, vid in reversed(keys[start:end])]
+            next_cursor = None
+            if start > 0:
+                created_at, video_id = keys[start]
+                next_cursor = encode_cursor({'created_at': created_at, 'video_id': video_id})
+        return page, next_cursor
+
+    def get_video(self, video_id):
+        with self._thread_lock:
+            self._sync()
+            return self._read_record(video_id)
+
+    def get_videos(self, video_ids):
+        video_ids = list(dict.fromkeys(video_ids))
+        with self._thread_lock:
+            self._sync()
+            # Read in file order (one forward sweep per file), then restore the requested order
+            wanted = sorted((self._offsets[vid], vid) for vid in video_ids if vid in self._offsets)
+            found = {vid: self._read_record(vid) for _, vid in wanted}
+        return [found[vid] for vid in video_ids if vid in found]
+
+    def get_user_videos(self, user_id):
+        with self._thread_lock:
+            self._sync()
+            videos = [self._read_record(vid) for vid in self._by_user.get(user_id, ())]
+        return sorted(videos, key=self._sort_key, reverse=True)
+
+    def increment_views(self, video_id, amount=1):
+        def change(video):
+            video['views'] = video.get('views', 0) + amount
+        video = self._update(video_id, change)
+        if video is None:
+            return None
+        self._publish('counters', {'video_id': video_id, 'views': video['views']})
+        return video['views']
+
+    def toggle_like(self, video_id, user_id):
+        liked = []
+
+        def change(video):
+            liked_by = video.setdefault('liked_by', [])
+            liked.append(user_id not in liked_by)
+            if liked[0]:
+                liked_by.append(user_id)
+            else:
+                liked_by.remove(user_id)
+            video['likes'] = len(liked_by)
+        video = self._update(video_id, change)
+        if video is None:
+            return None, None
+        self._publish('counters', {'video_id': video_id, 'likes': video['likes']})
+        return liked[0], video['likes']
+
+    def update_video(self, video_id, fields):
+        video = self._update(video_id, lambda video: video.update(fields))
+        if video is not None:
+            self._publish('update', video)
+        return video
+
+    def add_tags(self, video_id, tags):
+        def change(video):
+            current = video.setdefault('tags', [])
+            current.extend(t for t in dict.fromkeys(tags) if t not in current)
+        video = self._update(video_id, change)
+        if video is not None:
+            self._publish('update', video)
+        return video
+
+    def set_labels(self, video_id, labels):
+        video = self._update(video_id, lambda video: merge_labels(video, labels))
+        if video is not None:
+            self._publish('update', video)
+        return video
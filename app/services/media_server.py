@@ -0,0 +1,142 @@
+import mimetypes
+import mmap
+import os
+import uuid
+from flask import request, abort, current_app, Response
+from werkzeug.http import http_date
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+MMAP_SLICE = 1024 * 1024  # bytes handed to the WSGI server per iteration
+MAX_RANGES = 16           # more ranges than this and we just send the whole file (RFC 9110 allows it)
+
+
+def send_media(directory, filename, max_age=None):
+    """
+    Range-aware replacement for send_from_directory, for serving video from local disk.
+
+    - Conditional GET: ETag / If-None-Match and Last-Modified / If-Modified-Since -> 304
+    - Range / If-Range: single range -> 206, multiple ranges -> 206 multipart/byteranges,
+      unsatisfiable -> 416
+    - Full responses go through wsgi.file_wrapper (sendfile under Gunicorn),
+      partial ones are sliced from an mmap, so a seek never re-sends the file.
+    - With MEDIA_X_ACCEL_PREFIX set, the byte serving is handed to Nginx instead.
+    - max_age=None uses MEDIA_CACHE_MAX_AGE; content-addressed files pass a long one
+      and are marked 'immutable' (browsers then skip revalidation entirely).
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    stat = os.stat(path)
+    size = stat.st_size
+    mtime = int(stat.st_mtime)
+    etag = f"{stat.st_mtime_ns:x}-{size:x}"
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': f"public, max-age={current_app.config.get('MEDIA_CACHE_MAX_AGE', 3600)}"
+    }
+    if max_age is not None:
+        headers['Cache-Control'] = f"public, max-age={max_age}, immutable"
+
+    # 1. Conditional GET
+    if request.if_none_match:
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers=headers)
+    elif request.if_modified_since and mtime <= request.if_modified_since.timestamp():
+        return Response(status=304, headers=headers)
+
+    # 2. Behind Nginx: let it do Range + sendfile from its internal location
+    accel_prefix = current_app.config.get('MEDIA_X_ACCEL_PREFIX')
+    if accel_prefix:
+        headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    # 3. Byte ranges
+    ranges = _requested_ranges(size, etag, mtime)
+    if ranges == []:
+        headers['Content-Range'] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    if ranges is None:
+        headers['Content-Length'] = str(size)
+        body = wrap_file(request.environ, open(path, 'rb'))
+        return Response(body, status=200, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+        headers['Content-Length'] = str(stop - start)
+        body = _iter_mmap(path, [(b'', start, stop)], b'')
+        return Response(body, status=206, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, (start, stop) in enumerate(ranges):
+        part_head = (
+            ('\r\n' if i else '') + f"--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+        ).encode('latin-1')
+        parts.append((part_head, start, stop))
+    closing = f"\r\n--{boundary}--\r\n".encode('latin-1')
+    headers['Content-Length'] = str(sum(len(h) + stop - start for h, start, stop in parts) + len(closing))
+    body = _iter_mmap(path, parts, closing)
+    return Response(body, status=206, headers=headers, direct_passthrough=True,
+                    content_type=f"multipart/byteranges; boundary={boundary}")
+
+
+def _requested_ranges(size, etag, mtime):
+    """
+    Returns None to serve the whole file, [] if no range is satisfiable,
+    or a sorted, coalesced list of (start, stop) byte offsets (stop exclusive).
+    """
+    rng = request.range
+    if rng is None or rng.units != 'bytes' or size == 0:
+        return None
+
+    # If-Range: only honour the Range if the client's copy is still current
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and int(if_range.date.timestamp()) != mtime:
+        return None
+
+    spans = []
+    for begin, end in rng.ranges:
+        if begin < 0:
+            start, stop = max(size + begin, 0), size
+        else:
+            start, stop = begin, size if end is None else min(end, size)
+        if start < stop:
+            spans.append((start, stop))
+    if not spans:
+        return []
+    if len(spans) > MAX_RANGES:
+        return None
+
+    spans.sort()
+    merged = [spans[0]]
+    for start, stop in spans[1:]:
+        last_start, last_stop = merged[-1]
+        if start <= last_stop:
+            merged[-1] = (last_start, max(last_stop, stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _iter_mmap(path, parts, closing):
+    """Yields each (header, start, stop) part as header bytes + mmap slices, then 'closing'."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for head, start, stop in parts:
+            if head:
+                yield head
+            for offset in range(start, stop, MMAP_SLICE):
+                yield mm[offset:min(offset + MMAP_SLICE, stop)]
+    if closing:
+        yield closing
@@ -1,11 +1,24 @@
 import json
 import os
 import uuid
+import shutil
+import hashlib
 import re
 import random
+import bisect
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
 from flask_login import UserMixin
-from app.services.base import StorageService, VideoDBService, UsersService, NotificationService, AnalyzerService
+from app.services.base import StorageService, VideoDBService, UsersService, NotificationService, AnalyzerService, merge_labels
+from app.services.streaming import HashingReader, iter_chunks
+from app.services.pagination import encode_cursor, decode_cursor
 
 # --- 1. USER CLASS ---
 class User(UserMixin):
@@ -24,6 +37,7 @@ class MockUsers(UsersService):
              db_path = os.path.join(BASE_DIR, 'mock_aws', 'local_db')
         self.db_path = os.path.join(db_path, 'users.json')
         os.makedirs(db_path, exist_ok=True)
+        self._import_lock = threading.Lock()
         self._ensure_db()
 
     def _ensure_db(self):
@@ -73,6 +87,19 @@ class MockUsers(UsersService):
         return False, "User not found"
     def change_password(self, user_id, current, new):
         return True, "Mock Password Changed"
+    def scan_users(self, segments=1):
+        for u in self._read_users():
+            yield {'user_id': u['id'], 'email': u['email'], 'username': u.get('username'),
+                   'password_hash': u.get('password_hash'), 'avatar': u.get('avatar')}
+    def import_users(self, users):
+        with self._import_lock:  # batches may be imported from several threads
+            records = {u['id']: u for u in self._read_users()}
+            for u in users:
+                user_id = u.get('user_id') or u.get('id')
+                records[user_id] = {'id': user_id, 'email': u['email'], 'username': u.get('username'),
+                                    'password_hash': u.get('password_hash'), 'avatar': u.get('avatar')}
+            self._save_users(list(records.values()))
+        return len(users)
 
 # --- 3. MOCK STORAGE (DEBUG VERSION) ---
 class MockStorage(StorageService):
@@ -113,6 +140,122 @@ class MockStorage(StorageService):
             print(f" [CRITICAL ERROR] Storage failed: {e}")
             return None
 
+    def upload_stream(self, chunks, filename):
+        """Writes chunks to a '.part' file and renames it into place once complete"""
+        full_path = os.path.join(self.base_path, filename)
+        tmp_path = full_path + '.part'
+        reader = HashingReader(iter_chunks(chunks))
+        try:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)  # keys may contain folders (hls/<id>/...)
+            with open(tmp_path, 'wb') as f:
+                for chunk in reader:
+                    f.write(chunk)
+            os.replace(tmp_path, full_path)
+            print(f" [SUCCESS] Streamed {filename} to disk. Size: {reader.size} bytes")
+            return filename, reader.size, reader.hexdigest()
+        except Exception as e:
+            print(f" [CRITICAL ERROR] Streaming upload failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None, 0, None
+
+    def read_file(self, filename):
+        full_path = os.path.join(self.base_path, filename)
+        if not os.path.isfile(full_path):
+            return None
+        with open(full_path, 'rb') as f:
+            return f.read()
+
+    def media_source(self, filename):
+        return os.path.join(self.base_path, filename)
+
+    def exists(self, filename):
+        return os.path.isfile(os.path.join(self.base_path, filename))
+
+    def delete_file(self, filename):
+        try:
+            os.remove(os.path.join(self.base_path, filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f" [CRITICAL ERROR] Deleting {filename} failed: {e}")
+            return False
+        return True
+
+    def copy_file(self, source, dest):
+        dest_path = os.path.join(self.base_path, dest)
+        try:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copyfile(os.path.join(self.base_path, source), dest_path + '.part')
+            os.replace(dest_path + '.part', dest_path)
+            return dest
+        except OSError as e:
+            print(f" [CRITICAL ERROR] Copying {source} to {dest} failed: {e}")
+            return None
+
+    def move_file(self, source, dest):
+        dest_path = os.path.join(self.base_path, dest)
+        try:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            os.replace(os.path.join(self.base_path, source), dest_path)
+            return dest
+        except OSError as e:
+            print(f" [CRITICAL ERROR] Moving {source} to {dest} failed: {e}")
+            return None
+
+    # --- Resumable uploads: one file per part under .uploads/<upload_id>/ ---
+    def _parts_dir(self, upload_id):
+        return os.path.join(self.base_path, '.uploads', secure_filename(upload_id))
+
+    def create_multipart_upload(self, filename):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._parts_dir(upload_id), exist_ok=True)
+        return upload_id
+
+    def upload_part(self, filename, upload_id, part_number, chunks):
+        parts_dir = self._parts_dir(upload_id)
+        if not os.path.isdir(parts_dir):
+            raise KeyError(f"Unknown upload: {upload_id}")
+        part_path = os.path.join(parts_dir, f"{int(part_number):05d}")
+        md5 = hashlib.md5()
+        with open(part_path + '.tmp', 'wb') as f:
+            for chunk in iter_chunks(chunks):
+                md5.update(chunk)
+                f.write(chunk)
+        os.replace(part_path + '.tmp', part_path)
+        return md5.hexdigest()
+
+    def list_parts(self, filename, upload_id):
+        parts_dir = self._parts_dir(upload_id)
+        if not os.path.isdir(parts_dir):
+            return []
+        parts = []
+        for name in sorted(os.listdir(parts_dir)):
+            if not name.isdigit():
+                continue
+            path = os.path.join(parts_dir, name)
+            parts.append({'PartNumber': int(name), 'ETag': None, 'Size': os.path.getsize(path)})
+        return parts
+
+    def complete_multipart_upload(self, filename, upload_id, parts):
+        parts_dir = self._parts_dir(upload_id)
+        full_path = os.path.join(self.base_path, filename)
+        try:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path + '.part', 'wb') as out:
+                for part in sorted(parts, key=lambda p: p['PartNumber']):
+                    with open(os.path.join(parts_dir, f"{part['PartNumber']:05d}"), 'rb') as f:
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+            os.replace(full_path + '.part', full_path)
+            shutil.rmtree(parts_dir, ignore_errors=True)
+            return filename
+        except OSError as e:
+            print(f" [CRITICAL ERROR] Assembling {filename} failed: {e}")
+            return None
+
+    def abort_multipart_upload(self, filename, upload_id):
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
 # --- 4. MOCK DATABASE (Keep as is) ---
 class MockDatabase(VideoDBService):
     def __init__(self, db_path=None):
@@ -123,17 +266,52 @@ class MockDatabase(VideoDBService):
         os.makedirs(db_path, exist_ok=True)
         if not os.path.exists(self.video_file):
             with open(self.video_file, 'w') as f: json.dump([], f)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Serializes read-modify-write cycles across threads and (via flock) Gunicorn workers"""
+        with self._thread_lock, open(self.video_file + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
 
     def _read(self):
         try:
             with open(self.video_file, 'r') as f: return json.load(f)
         except: return []
 
+    def _feed_index(self):
+        """
+        Ordered index for list_videos: ascending (created_at, video_id) keys plus an id -> video map.
+        Rebuilt only when videos.json changes on disk (any worker may have written it).
+        """
+        try:
+            stat = os.stat(self.video_file)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+        if getattr(self, '_feed_version', None) != version or version is None:
+            by_id = {v['video_id']: v for v in self._read()}
+            keys = sorted((self._sort_key(v), vid) for vid, v in by_id.items())
+            self._feed_cache = (keys, by_id)
+            self._feed_version = version
+        return self._feed_cache
+
+    @staticmethod
+    def _sort_key(video):
+        return video.get('created_at') or f"{video.get('upload_date', '')}T00:00:00"
+
     def _write(self, data):
-        with open(self.video_file, 'w') as f: json.dump(data, f, indent=4)
+        # Write to a temp file and rename, so readers never see a half-written file
+        with open(self.video_file + '.tmp', 'w') as f: json.dump(data, f, indent=4)
+        os.replace(self.video_file + '.tmp', self.video_file)
 
     def put_video(self, title, description, tags, filename, user_id, thumbnail_filename=None):
-        videos = self._read()
         tag_list = tags if isinstance(tags, list) else []
         new_video = {
             'video_id': str(uuid.uuid4()),
@@ -144,24 +322,120 @@ class MockDatabase(VideoDBService):
             'filename': filename,
             'thumbnail': thumbnail_filename,
             'upload_date': "2026-02-09",
+            'created_at': datetime.now().isoformat(timespec='microseconds'),
             'views': 0, 'likes': 0
         }
-        videos.insert(0, new_video)
-        self._write(videos)
+        with self._locked():
+            videos = self._read()
+            videos.insert(0, new_video)
+            self._write(videos)
+        self._publish('put', new_video)
         return new_video['video_id']
-    
+
+    def put_videos(self, videos):
+        """One read-modify-write of videos.json for the whole batch"""
+        records = [self._complete_record(v) for v in videos]
+        with self._locked():
+            existing = self._read()
+            batch = {v['video_id']: v for v in records}
+            kept = [v for v in existing if v['video_id'] not in batch]
+            new = sorted(batch.values(), key=self._sort_key, reverse=True)
+            self._write(new + kept)
+        for video in batch.values():
+            self._publish('put', video)
+        return len(batch)
+
     def get_all_videos(self): return self._read()
+    def list_videos(self, cursor=None, limit=20):
+        keys, by_id = self._feed_index()
+        after = decode_cursor(cursor)
+        # keys are ascending; the page is the 'limit' keys just below the cursor
+        end = bisect.bisect_left(keys, (after.get('created_at', ''), after.get('video_id', ''))) if after else len(keys)
+        start = max(0, end - limit)
+        page = [by_id[vid] for _, vid in reversed(keys[start:end])]
+        next_cursor = None
+        if start > 0:
+            created_at, video_id = keys[start]
+            next_cursor = encode_cursor({'created_at': created_at, 'video_id': video_id})
+        return page, next_cursor
     def get_video(self, video_id):
         videos = self._read()
         return next((v for v in videos if v['video_id'] == video_id), None)
+    def get_videos(self, video_ids):
+        # One pass: the id map is only rebuilt when videos.json changed
+        _, by_id = self._feed_index()
+        return [dict(by_id[vid]) for vid in dict.fromkeys(video_ids) if vid in by_id]
     def get_user_videos(self, user_id):
         videos = self._read()
         return [v for v in videos if v['user_id'] == user_id]
 
+    def increment_views(self, video_id, amount=1):
+        with self._locked():
+            videos = self._read()
+            video = next((v for v in videos if v['video_id'] == video_id), None)
+            if not video:
+                return None
+            video['views'] = video.get('views', 0) + amount
+            self._write(videos)
+        self._publish('counters', {'video_id': video_id, 'views': video['views']})
+        return video['views']
+
+    def toggle_like(self, video_id, user_id):
+        with self._locked():
+            videos = self._read()
+            video = next((v for v in videos if v['video_id'] == video_id), None)
+            if not video:
+                return None, None
+            liked_by = video.setdefault('liked_by', [])
+            liked = user_id not in liked_by
+            if liked:
+                liked_by.append(user_id)
+            else:
+                liked_by.remove(user_id)
+            video['likes'] = len(liked_by)
+            self._write(videos)
+        self._publish('counters', {'video_id': video_id, 'likes': video['likes']})
+        return liked, video['likes']
+
+    def update_video(self, video_id, fields):
+        with self._locked():
+            videos = self._read()
+            video = next((v for v in videos if v['video_id'] == video_id), None)
+            if not video:
+                return None
+            video.update(fields)
+            self._write(videos)
+        self._publish('update', video)
+        return video
+
+    def add_tags(self, video_id, tags):
+        with self._locked():
+            videos = self._read()
+            video = next((v for v in videos if v['video_id'] == video_id), None)
+            if not video:
+                return None
+            current = video.setdefault('tags', [])
+            current.extend(t for t in dict.fromkeys(tags) if t not in current)
+            self._write(videos)
+        self._publish('update', video)
+        return video
+
+    def set_labels(self, video_id, labels):
+        with self._locked():
+            videos = self._read()
+            video = next((v for v in videos if v['video_id'] == video_id), None)
+            if not video:
+                return None
+            merge_labels(video, labels)
+            self._write(videos)
+        self._publish('update', video)
+        return video
+
 # --- 5. STUBS ---
 class MockNotifier(NotificationService):
     def send_notification(self, subject, message):
         print(f" [MOCK EMAIL] {subject}")
+        return True
 
 class MockAnalyzer(AnalyzerService):
     def detect_labels(self, bucket, filename, max_labels=5):
@@ -0,0 +1,33 @@
+from app.services.base import NotificationService
+
+
+class BatchNotifier(NotificationService):
+    """
+    Sends groups of notifications with as few calls as possible. It holds nothing
+    itself: the durable 'notify' jobs are the buffer. The job workers hand it all
+    the notify jobs that are due at once (see jobs.batched), and a job is only
+    marked done once its message was accepted.
+
+    - mode 'batch':  every message is delivered, via inner.send_batch
+                     (SNS publish_batch, 10 per call);
+    - mode 'digest': one message summarizing the whole burst.
+    """
+    def __init__(self, inner, mode='batch', max_batch=50):
+        self.inner = inner
+        self.mode = mode
+        self.max_batch = max_batch
+
+    def send_notification(self, subject, message):
+        return self.inner.send_notification(subject, message)
+
+    def send_batch(self, messages):
+        """Returns the indexes of the messages that failed"""
+        if self.mode == 'digest' and len(messages) > 1:
+            subject = f"SnapStream: {len(messages)} new notifications"
+            body = '\n\n'.join(f"{subject}\n{message}" for subject, message in messages)
+            return [] if self.inner.send_notification(subject, body) is not False else list(range(len(messages)))
+
+        failed = []
+        for start in range(0, len(messages), self.max_batch):
+            failed.extend(start + i for i in self.inner.send_batch(messages[start:start + self.max_batch]))
+        return failed
@@ -0,0 +1,27 @@
+import base64
+import json
+
+
+def encode_cursor(key):
+    """
+    Turns a backend position (e.g. DynamoDB's LastEvaluatedKey) into an opaque,
+    URL-safe continuation token. None means 'no more pages'.
+    """
+    if not key:
+        return None
+    raw = json.dumps(key, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Raises ValueError for tokens we did not issue."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(key, dict) or not all(isinstance(v, str) for v in key.values()):
+        raise ValueError("Invalid cursor")
+    return key
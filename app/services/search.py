@@ -0,0 +1,270 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Matches in the title count more than matches in tags, which count more than the description
+FIELD_WEIGHTS = (('title', 3.0), ('tags', 2.0), ('description', 1.0))
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+# Prefix expansion: how many vocabulary terms one partial word may expand to, and their weight
+MAX_PREFIX_TERMS = 50
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def normalize_tag(tag):
+    return str(tag).strip().lower() if tag is not None else ''
+
+
+def _by_count(item):
+    # (tag, count) pairs: most used first, then alphabetical
+    return (-item[1], item[0])
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over title, description and tags with BM25 ranking.
+
+    - Kept current incrementally: it subscribes to the video DB service and
+      indexes every new video as put_video writes it.
+    - Every query word also matches as a prefix ("gam" finds "gaming"), using a
+      sorted vocabulary + bisect instead of scanning all terms.
+    - Tags (user tags and Rekognition labels) also get an exact index, tag -> video ids,
+      for tag filters (AND / OR) and tag-count facets (see browse()).
+    - Other workers' writes are picked up by a full rebuild once the index is
+      older than max_age seconds (done in the background; queries keep using the
+      current index meanwhile).
+    """
+    def __init__(self, db_service, max_age=300):
+        self.db = db_service
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._build_lock = threading.RLock()  # one full build at a time; writers only wait for the swap
+        self._built_at = None
+        self._rebuilding = False
+        self._replay = None                   # videos written while a build was running
+        self._reset()
+        db_service.subscribe(self._on_change)
+
+    def _reset(self):
+        self.postings = defaultdict(dict)   # term -> {video_id: weighted term frequency}
+        self.doc_terms = {}                 # video_id -> terms (for removal on re-index)
+        self.doc_len = {}                   # video_id -> weighted length
+        self.docs = {}                      # video_id -> video record
+        self.vocabulary = []                # sorted terms, for prefix lookups
+        self.total_len = 0.0
+        self.tags = defaultdict(set)        # normalized tag -> video_ids
+        self.doc_tags = {}                  # video_id -> normalized tags
+
+    # --- Maintenance ---
+    def _on_change(self, event, video):
+        if event not in ('put', 'update'):
+            return
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(video)
+            if self._built_at is not None:
+                self._add(video)
+
+    def rebuild(self):
+        # Build into a scratch index and swap it in, so queries are not blocked meanwhile
+        with self._build_lock:
+            with self._lock:
+                self._replay = []
+            try:
+                fresh = SearchIndex.__new__(SearchIndex)
+                fresh._reset()
+                for video in self.db.get_all_videos():
+                    fresh._add(video, sort_vocabulary=False)
+                fresh.vocabulary = sorted(fresh.postings)
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                for attr in ('postings', 'doc_terms', 'doc_len', 'docs', 'vocabulary', 'total_len', 'tags', 'doc_tags'):
+                    setattr(self, attr, getattr(fresh, attr))
+                # Writes made while the scan ran may be missing from its result
+                replay, self._replay = self._replay, None
+                for video in replay:
+                    self._add(video)
+                self._built_at = time.monotonic()
+        print(f"[INFO] Search index built: {len(self.docs)} videos, {len(self.vocabulary)} terms, {len(self.tags)} tags")
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            # Concurrent first requests wait for one build instead of each scanning the table
+            with self._build_lock:
+                if self._built_at is None:
+                    self.rebuild()
+        elif time.monotonic() - self._built_at > self.max_age:
+            with self._lock:
+                if self._rebuilding:
+                    return
+                self._rebuilding = True
+            threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def add(self, video):
+        with self._lock:
+            self._add(video)
+
+    def remove(self, video_id):
+        with self._lock:
+            self._remove(video_id)
+
+    def _add(self, video, sort_vocabulary=True):
+        video_id = video['video_id']
+        self._remove(video_id)
+
+        freqs = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS:
+            value = video.get(field)
+            text = ' '.join(value) if isinstance(value, (list, set, tuple)) else value
+            for term in tokenize(text):
+                freqs[term] += weight
+
+        for term, tf in freqs.items():
+            if sort_vocabulary and term not in self.postings:
+                bisect.insort(self.vocabulary, term)
+            self.postings[term][video_id] = tf
+        self.doc_terms[video_id] = list(freqs)
+        self.doc_len[video_id] = sum(freqs.values())
+        self.total_len += self.doc_len[video_id]
+        self.docs[video_id] = video
+
+        tags = {normalize_tag(t) for t in video.get('tags') or []} - {''}
+        for tag in tags:
+            self.tags[tag].add(video_id)
+        self.doc_tags[video_id] = tags
+
+    def _remove(self, video_id):
+        for term in self.doc_terms.pop(video_id, []):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(video_id, None)
+            if not docs:
+                del self.postings[term]
+                i = bisect.bisect_left(self.vocabulary, term)
+                if i < len(self.vocabulary) and self.vocabulary[i] == term:
+                    del self.vocabulary[i]
+        self.total_len -= self.doc_len.pop(video_id, 0.0)
+        self.docs.pop(video_id, None)
+        for tag in self.doc_tags.pop(video_id, ()):
+            ids = self.tags.get(tag)
+            if ids is not None:
+                ids.discard(video_id)
+                if not ids:
+                    del self.tags[tag]
+
+    # --- Queries ---
+    def _expand(self, word):
+        """The word itself (weight 1) plus vocabulary terms it is a prefix of."""
+        terms = {word: 1.0} if word in self.postings else {}
+        i = bisect.bisect_left(self.vocabulary, word)
+        while i < len(self.vocabulary) and len(terms) < MAX_PREFIX_TERMS:
+            term = self.vocabulary[i]
+            if not term.startswith(word):
+                break
+            terms.setdefault(term, PREFIX_WEIGHT)
+            i += 1
+        return terms
+
+    def _score(self, words):
+        """BM25 score of every video matching any of 'words' (call with the lock held)"""
+        scores = defaultdict(float)
+        n_docs = len(self.docs)
+        if not n_docs:
+            return scores
+        avg_len = self.total_len / n_docs
+        for word in dict.fromkeys(words):
+            for term, boost in self._expand(word).items():
+                docs = self.postings[term]
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for video_id, tf in docs.items():
+                    norm = K1 * (1 - B + B * self.doc_len[video_id] / avg_len)
+                    scores[video_id] += boost * idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def _tagged(self, tags, mode):
+        """Video ids carrying all ('and') or any ('or') of the tags (call with the lock held)"""
+        sets = sorted((self.tags.get(tag, set()) for tag in tags), key=len)
+        if mode == 'or':
+            return set().union(*sets)
+        matched = set(sets[0])
+        for ids in sets[1:]:
+            matched &= ids
+        return matched
+
+    def search(self, query, limit=50):
+        """Returns up to 'limit' videos matching 'query', best match first (current records from the DB)."""
+        words = tokenize(query)
+        if not words:
+            return []
+        self._ensure_fresh()
+
+        with self._lock:
+            scores = self._score(words)
+            ranked = [video_id for video_id, _ in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+        # Hydrate from the DB in one batch: the indexed copies lag behind on views / likes
+        return self.db.get_videos(ranked)
+
+    def browse(self, query='', tags=(), mode='and', limit=50, facets=20):
+        """
+        Videos matching 'query' (best match first) and/or carrying 'tags' (all of them for
+        mode='and', any for 'or'; newest first without a query).
+        Returns (videos, facets): facets are the [(tag, count), ...] most frequent among
+        all matches, not counting the tags filtered on.
+        """
+        words = tokenize(query)
+        tags = [t for t in dict.fromkeys(normalize_tag(t) for t in tags or ()) if t]
+        if not words and not tags:
+            return [], self.tag_counts(facets)
+        self._ensure_fresh()
+
+        with self._lock:
+            matched = self._tagged(tags, mode) if tags else None
+            if words:
+                scores = self._score(words)
+                if matched is not None:
+                    scores = {vid: score for vid, score in scores.items() if vid in matched}
+                matched = scores
+                ranked = heapq.nlargest(limit, scores, key=scores.get)
+            else:
+                ranked = heapq.nlargest(limit, matched, key=lambda vid: self.docs[vid].get('created_at') or '')
+
+            counts = defaultdict(int)
+            for video_id in matched:
+                for tag in self.doc_tags.get(video_id, ()):
+                    counts[tag] += 1
+            for tag in tags:
+                counts.pop(tag, None)
+            top_tags = heapq.nsmallest(facets, counts.items(), key=_by_count)
+
+        return self.db.get_videos(ranked), top_tags
+
+    def tag_counts(self, limit=50):
+        """The most used tags over the whole catalog: [(tag, video_count), ...]"""
+        self._ensure_fresh()
+        with self._lock:
+            return heapq.nsmallest(limit, ((tag, len(ids)) for tag, ids in self.tags.items()), key=_by_count)
@@ -0,0 +1,346 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.services.base import VideoDBService, UsersService, merge_labels
+from app.services.pagination import encode_cursor, decode_cursor
+from app.models import User
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id    TEXT PRIMARY KEY,
+    user_id     TEXT NOT NULL,
+    title       TEXT,
+    description TEXT,
+    tags        TEXT NOT NULL DEFAULT '[]',
+    filename    TEXT,
+    thumbnail   TEXT,
+    upload_date TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    views       INTEGER NOT NULL DEFAULT 0,
+    likes       INTEGER NOT NULL DEFAULT 0,
+    extra       TEXT NOT NULL DEFAULT '{}'  -- other attributes (thumbnail variants...), as JSON
+);
+CREATE INDEX IF NOT EXISTS videos_user_date ON videos (user_id, upload_date);
+CREATE INDEX IF NOT EXISTS videos_created ON videos (created_at, video_id);
+CREATE INDEX IF NOT EXISTS videos_upload_date ON videos (upload_date);
+
+CREATE TABLE IF NOT EXISTS video_likes (
+    video_id TEXT NOT NULL,
+    user_id  TEXT NOT NULL,
+    PRIMARY KEY (video_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id       TEXT PRIMARY KEY,
+    email         TEXT NOT NULL UNIQUE,
+    username      TEXT,
+    password_hash TEXT,
+    avatar        TEXT
+);
+"""
+
+VIDEO_COLUMNS = ('video_id', 'user_id', 'title', 'description', 'tags', 'filename',
+                 'thumbnail', 'upload_date', 'created_at', 'views', 'likes')
+
+
+# --- 1. CONNECTION HANDLING ---
+class SQLiteDatabase:
+    """
+    One SQLite file in WAL mode: readers never block the writer (or each other),
+    and separate Gunicorn workers can share it safely.
+    Each thread gets its own connection; writes use BEGIN IMMEDIATE transactions.
+    """
+    def __init__(self, path, schema=SCHEMA):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self.conn.executescript(schema)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection must not cross a fork (Gunicorn --preload): reopen in the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+# --- 2. SQLITE VIDEO DB ---
+class SQLiteVideoDB(VideoDBService):
+    def __init__(self, database):
+        self.db = database
+        columns = [r['name'] for r in database.conn.execute("PRAGMA table_info(videos)")]
+        if 'extra' not in columns:  # databases created before the column existed
+            database.conn.execute("ALTER TABLE videos ADD COLUMN extra TEXT NOT NULL DEFAULT '{}'")
+        print(f"[INFO] SQLiteVideoDB initialized: {database.path}")
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        video = dict(row)
+        video['tags'] = json.loads(video['tags'] or '[]')
+        video.update(json.loads(video.pop('extra') or '{}'))
+        return video
+
+    @staticmethod
+    def _to_row(video):
+        row = {col: video.get(col) for col in VIDEO_COLUMNS}
+        row['extra'] = json.dumps({k: v for k, v in video.items()
+                                   if k not in VIDEO_COLUMNS and k != 'liked_by'})
+        row['tags'] = json.dumps(list(video.get('tags') or []))
+        row['views'] = int(row['views'] or 0)
+        row['likes'] = int(row['likes'] or 0)
+        row['upload_date'] = row['upload_date'] or '1970-01-01'
+        row['created_at'] = row['created_at'] or f"{row['upload_date']}T00:00:00"
+        return row
+
+    def _insert(self, conn, rows):
+        columns = VIDEO_COLUMNS + ('extra',)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO videos ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + c for c in columns)})",
+            rows
+        )
+
+    def put_video(self, title, description, tags, filename, user_id, thumbnail_filename=None):
+        now = datetime.now()
+        video = {
+            'video_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'title': title,
+            'description': description or '',
+            'tags': tags if isinstance(tags, list) else [],
+            'filename': filename,
+            'thumbnail': thumbnail_filename,
+            'upload_date': now.strftime("%Y-%m-%d"),
+            'created_at': now.isoformat(timespec='microseconds'),
+            'views': 0,
+            'likes': 0
+        }
+        with self.db.transaction() as conn:
+            self._insert(conn, [self._to_row(video)])
+        self._publish('put', video)
+        return video['video_id']
+
+    def import_videos(self, videos):
+        """Bulk insert/replace of full video records in one transaction. Returns the count."""
+        rows = [self._to_row(v) for v in videos]
+        likes = [(v['video_id'], uid) for v in videos for uid in v.get('liked_by', [])]
+        with self.db.transaction() as conn:
+            self._insert(conn, rows)
+            conn.executemany("INSERT OR IGNORE INTO video_likes (video_id, user_id) VALUES (?, ?)", likes)
+        return len(rows)
+
+    def put_videos(self, videos):
+        records = [self._complete_record(v) for v in videos]
+        count = self.import_videos(records)
+        for video in records:
+            self._publish('put', video)
+        return count
+
+    def scan_videos(self, segments=1):
+        # Streams rows from the cursor instead of building the whole list
+        for row in self.db.conn.execute("SELECT * FROM videos"):
+            yield self._to_dict(row)
+
+    def get_all_videos(self):
+        rows = self.db.conn.execute("SELECT * FROM videos ORDER BY created_at DESC, video_id DESC")
+        return [self._to_dict(r) for r in rows]
+
+    def list_videos(self, cursor=None, limit=20):
+        after = decode_cursor(cursor)
+        if after:
+            rows = self.db.conn.execute(
+                "SELECT * FROM videos WHERE (created_at, video_id) < (?, ?) "
+                "ORDER BY created_at DESC, video_id DESC LIMIT ?",
+                (after.get('created_at', ''), after.get('video_id', ''), limit + 1)
+            ).fetchall()
+        else:
+            rows = self.db.conn.execute(
+                "SELECT * FROM videos ORDER BY created_at DESC, video_id DESC LIMIT ?", (limit + 1,)
+            ).fetchall()
+        videos = [self._to_dict(r) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = videos[-1]
+            next_cursor = encode_cursor({'created_at': last['created_at'], 'video_id': last['video_id']})
+        return videos, next_cursor
+
+    def get_video(self, video_id):
+        row = self.db.conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return self._to_dict(row)
+
+    def get_videos(self, video_ids):
+        video_ids = list(dict.fromkeys(video_ids))
+        found = {}
+        for start in range(0, len(video_ids), 500):  # stay under SQLite's bound-variable limit
+            chunk = video_ids[start:start + 500]
+            rows = self.db.conn.execute(
+                f"SELECT * FROM videos WHERE video_id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            found.update((row['video_id'], self._to_dict(row)) for row in rows)
+        return [found[vid] for vid in video_ids if vid in found]
+
+    def get_user_videos(self, user_id):
+        rows = self.db.conn.execute(
+            "SELECT * FROM videos WHERE user_id = ? ORDER BY upload_date DESC, created_at DESC", (user_id,)
+        )
+        return [self._to_dict(r) for r in rows]
+
+    def increment_views(self, video_id, amount=1):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE videos SET views = views + ? WHERE video_id = ?", (amount, video_id))
+            row = conn.execute("SELECT views FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        if row is None:
+            return None
+        self._publish('counters', {'video_id': video_id, 'views': row['views']})
+        return row['views']
+
+    def toggle_like(self, video_id, user_id):
+        with self.db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is None:
+                return None, None
+            removed = conn.execute(
+                "DELETE FROM video_likes WHERE video_id = ? AND user_id = ?", (video_id, user_id)
+            ).rowcount
+            if not removed:
+                conn.execute("INSERT INTO video_likes (video_id, user_id) VALUES (?, ?)", (video_id, user_id))
+            conn.execute("UPDATE videos SET likes = likes + ? WHERE video_id = ?",
+                         (-1 if removed else 1, video_id))
+            likes = conn.execute("SELECT likes FROM videos WHERE video_id = ?", (video_id,)).fetchone()['likes']
+        self._publish('counters', {'video_id': video_id, 'likes': likes})
+        return not removed, likes
+
+    def update_video(self, video_id, fields):
+        with self.db.transaction() as conn:
+            video = self._to_dict(conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,)).fetchone())
+            if video is None:
+                return None
+            video.update(fields)
+            self._insert(conn, [self._to_row(video)])
+        self._publish('update', video)
+        return video
+
+    def add_tags(self, video_id, tags):
+        with self.db.transaction() as conn:
+            video = self._to_dict(conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,)).fetchone())
+            if video is None:
+                return None
+            video['tags'] += [t for t in dict.fromkeys(tags) if t not in video['tags']]
+            conn.execute("UPDATE videos SET tags = ? WHERE video_id = ?", (json.dumps(video['tags']), video_id))
+        self._publish('update', video)
+        return video
+
+    def set_labels(self, video_id, labels):
+        with self.db.transaction() as conn:
+            video = self._to_dict(conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,)).fetchone())
+            if video is None:
+                return None
+            merge_labels(video, labels)
+            self._insert(conn, [self._to_row(video)])
+        self._publish('update', video)
+        return video
+
+
+# --- 3. SQLITE USERS ---
+class SQLiteUsers(UsersService):
+    def __init__(self, database):
+        self.db = database
+        print(f"[INFO] SQLiteUsers initialized: {database.path}")
+
+    @staticmethod
+    def _to_user(row):
+        if row is None:
+            return None
+        return User(row['user_id'], row['username'], row['email'], row['password_hash'], avatar=row['avatar'])
+
+    def create_user(self, email, username, password):
+        user_id = str(uuid.uuid4())
+        password_hash = generate_password_hash(password)
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "INSERT INTO users (user_id, email, username, password_hash, avatar) VALUES (?, ?, ?, ?, NULL)",
+                    (user_id, email, username, password_hash)
+                )
+        except sqlite3.IntegrityError:
+            return None, "Email already registered."
+        return User(user_id, username, email, password_hash), None
+
+    def import_users(self, users):
+        """Bulk insert/replace of user records ({'user_id' or 'id', 'email', ...}). Returns the count."""
+        rows = [(u.get('user_id') or u.get('id'), u['email'], u.get('username'),
+                 u.get('password_hash'), u.get('avatar')) for u in users]
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO users (user_id, email, username, password_hash, avatar) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def scan_users(self, segments=1):
+        for row in self.db.conn.execute("SELECT user_id, email, username, password_hash, avatar FROM users"):
+            yield dict(row)
+
+    def validate_login(self, email, password):
+        user = self.get_user_by_email(email)
+        if not user:
+            return None, "Email not found."
+        if check_password_hash(user.password_hash, password):
+            return user, None
+        return None, "Incorrect password."
+
+    def get_user_by_id(self, user_id):
+        row = self.db.conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return self._to_user(row)
+
+    def get_user_by_email(self, email):
+        row = self.db.conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return self._to_user(row)
+
+    def update_profile(self, user_id, new_username, avatar_filename=None):
+        with self.db.transaction() as conn:
+            if avatar_filename == "__DELETE__":
+                updated = conn.execute("UPDATE users SET username = ?, avatar = NULL WHERE user_id = ?",
+                                       (new_username, user_id)).rowcount
+            elif avatar_filename:
+                updated = conn.execute("UPDATE users SET username = ?, avatar = ? WHERE user_id = ?",
+                                       (new_username, avatar_filename, user_id)).rowcount
+            else:
+                updated = conn.execute("UPDATE users SET username = ? WHERE user_id = ?",
+                                       (new_username, user_id)).rowcount
+        if not updated:
+            return False, "User not found"
+        return True, "Profile updated"
+
+    def change_password(self, user_id, current_password, new_password):
+        user = self.get_user_by_id(user_id)
+        if not user or not check_password_hash(user.password_hash, current_password):
+            return False, "Incorrect current password"
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE users SET password_hash = ? WHERE user_id = ?",
+                         (generate_password_hash(new_password), user_id))
+        return True, "Password updated"
@@ -0,0 +1,139 @@
+import hashlib
+import io
+from werkzeug.sansio.multipart import MultipartDecoder, NEED_DATA, Field, File, Data, Epilogue
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+
+
+# --- 1. CHUNK HELPERS ---
+def iter_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Turns a file-like object (anything with .read) into an iterator of byte chunks.
+    Iterables of bytes are passed through untouched.
+    """
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from source
+
+
+class HashingReader:
+    """
+    Wraps an iterator of byte chunks and computes size + SHA-256 as the chunks
+    pass through, so storage backends never need a second pass over the data.
+    """
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            self.size += len(chunk)
+            self._sha256.update(chunk)
+            yield chunk
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+class ChunkStream(io.RawIOBase):
+    """
+    Read-only file object over an iterator of byte chunks, for APIs that want
+    .read() (boto3's transfer manager). Holds at most one chunk.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+# --- 2. STREAMING MULTIPART PARSER ---
+class StreamedFile:
+    """A file part of a multipart body. Its data can only be read once, in order."""
+    def __init__(self, name, filename, content_type, chunks):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self._chunks = chunks
+
+    def iter_chunks(self):
+        return self._chunks
+
+    def drain(self):
+        for _ in self._chunks:
+            pass
+
+
+class MultipartStreamReader:
+    """
+    Parses a multipart/form-data body straight from the WSGI input stream.
+
+    Unlike request.files, nothing is spooled to a temp file: file parts are
+    handed to the caller as chunk iterators while the body is still arriving.
+    """
+    def __init__(self, stream, boundary, chunk_size=DEFAULT_CHUNK_SIZE, max_field_size=500 * 1024):
+        if isinstance(boundary, str):
+            boundary = boundary.encode('latin-1')
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_field_size = max_field_size
+        self._decoder = MultipartDecoder(boundary)
+
+    def _events(self):
+        while True:
+            event = self._decoder.next_event()
+            if event is NEED_DATA:
+                chunk = self.stream.read(self.chunk_size)
+                self._decoder.receive_data(chunk or None)
+                continue
+            if isinstance(event, Epilogue):
+                return
+            yield event
+
+    def _body(self, events):
+        for event in events:
+            if isinstance(event, Data):
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    return
+
+    def parts(self):
+        """
+        Yields ('field', name, value) and ('file', name, StreamedFile) tuples in body order.
+        A file that the caller does not fully read is drained before moving on.
+        """
+        events = self._events()
+        for event in events:
+            if isinstance(event, File):
+                part = StreamedFile(event.name, event.filename,
+                                    event.headers.get('Content-Type'), self._body(events))
+                yield 'file', event.name, part
+                part.drain()
+            elif isinstance(event, Field):
+                value = bytearray()
+                for chunk in self._body(events):
+                    value.extend(chunk)
+                    if len(value) > self.max_field_size:
+                        raise ValueError(f"Form field '{event.name}' is too large")
+                yield 'field', event.name, value.decode('utf-8', 'replace')
@@ -0,0 +1,118 @@
+import os
+import shutil
+import subprocess
+from io import BytesIO
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency: pip install Pillow
+    Image = None
+
+# format key -> (Pillow format, file extension)
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+
+def variant_name(filename, width, fmt):
+    """'clip.png', 320, 'webp' -> 'clip_320w.webp' (stored next to the original)"""
+    return f"{os.path.splitext(filename)[0]}_{width}w.{FORMATS[fmt][1]}"
+
+
+def variants(video, fmt):
+    """[(width, filename), ...] of the video's stored variants in 'fmt', smallest first"""
+    stored = (video.get('thumbnails') or {}).get(fmt) or {}
+    return sorted((int(width), name) for width, name in stored.items())
+
+
+def make_variants(data, widths=(160, 320, 640), formats=('webp', 'jpeg'), quality=80):
+    """
+    Yields (width, fmt, bytes) for each width x format. Never upscales: widths
+    beyond the source image collapse into one variant at the source width.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    for width in sorted({min(w, image.width) for w in widths}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+        for fmt in formats:
+            out = BytesIO()
+            resized.save(out, FORMATS[fmt][0], quality=quality, optimize=True, progressive=True)
+            yield width, fmt, out.getvalue()
+
+
+def extract_frame(source, at=1.0, timeout=120):
+    """
+    Grabs one frame of the video at 'source' (path or URL) as JPEG bytes using ffmpeg.
+    Returns None if ffmpeg is not available or could not read a frame.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        print("[WARN] ffmpeg not found, cannot derive a thumbnail from the video")
+        return None
+    for offset in (at, 0):  # very short clips have no frame at 'at'
+        result = subprocess.run(
+            [ffmpeg, '-v', 'error', '-ss', str(offset), '-i', source,
+             '-frames:v', '1', '-f', 'image2pipe', '-vcodec', 'mjpeg', '-q:v', '2', '-'],
+            capture_output=True, timeout=timeout
+        )
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+    print(f"[WARN] ffmpeg could not extract a frame: {result.stderr.decode(errors='replace')[-500:]}")
+    return None
+
+
+class ThumbnailGenerator:
+    """
+    Builds the downscaled, recompressed thumbnail variants the feed serves
+    (e.g. 160/320/640px, WebP + JPEG) and stores them next to the original
+    through the StorageService.
+
+    The source is the uploaded thumbnail, or, when the uploader sent none, a
+    frame of the video (which then also becomes the video's thumbnail).
+    The variant names end up in the video record as
+    {'thumbnails': {'webp': {'160': name, ...}, 'jpeg': {...}}}.
+    """
+    def __init__(self, storage, db, widths=(160, 320, 640), formats=('webp', 'jpeg'), quality=80):
+        self.storage = storage
+        self.db = db
+        self.widths = widths
+        self.formats = formats
+        self.quality = quality
+
+    def generate(self, video_id, thumbnail=None, video_file=None):
+        """Returns the updated video record, or None if there was nothing to work from"""
+        fields = {}
+        if thumbnail:
+            data = self.storage.read_file(thumbnail)
+            if data is None:
+                raise LookupError(f"thumbnail {thumbnail} not found in storage")
+        else:
+            data = extract_frame(self.storage.media_source(video_file)) if video_file else None
+            if data is None:
+                return None
+            thumbnail = f"{os.path.splitext(video_file)[0]}_frame.jpg"
+            if not self.storage.upload_stream([data], thumbnail)[0]:
+                raise IOError(f"could not store {thumbnail}")
+            fields['thumbnail'] = thumbnail
+
+        if Image is None:
+            print("[WARN] Pillow not installed, skipping thumbnail variants")
+        else:
+            stored = {}
+            total = 0
+            for width, fmt, variant in make_variants(data, self.widths, self.formats, self.quality):
+                name = variant_name(thumbnail, width, fmt)
+                if not self.storage.upload_stream([variant], name)[0]:
+                    raise IOError(f"could not store {name}")
+                stored.setdefault(fmt, {})[str(width)] = name
+                total += len(variant)
+            fields['thumbnails'] = stored
+            print(f"[INFO] Thumbnail variants for {video_id}: {len(data)} bytes -> "
+                  f"{sum(len(v) for v in stored.values())} files, {total} bytes")
+
+        if not fields:
+            return None
+        video = self.db.update_video(video_id, fields)
+        if video is None:
+            raise LookupError(f"video {video_id} not found")
+        return video
@@ -0,0 +1,216 @@
+import atexit
+import math
+import threading
+import time
+from collections import defaultdict
+from app.services.sqlite_impl import SQLiteDatabase
+
+# A score that decayed below MIN_SCORE views counts as gone (and is pruned)
+MIN_SCORE = 0.001
+
+
+def log_add(score, boost):
+    """log2(2^score + 2^boost); None stands for 'nothing'"""
+    if score is None:
+        return boost
+    if boost is None:
+        return score
+    high, low = max(score, boost), min(score, boost)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def log_sub(score, boost):
+    """log2(2^score - 2^boost), or None once nothing is left"""
+    if score is None or boost >= score:
+        return None
+    rest = 1 - 2 ** (boost - score)
+    return score + math.log2(rest) if rest > 1e-9 else None
+
+
+# --- 1. WRITE-BEHIND RANKING (storage-independent part) ---
+class TrendingIndex:
+    """
+    Time-decayed popularity: every view / like adds its weight, and that weight
+    halves every half_life seconds.
+
+    Forward decay: an event at time t adds weight * 2^(t / half_life) to the video's
+    score. All scores grow at the same rate, so their order already is the decayed
+    order and nothing is ever re-sorted; the stored value is log2 of that sum, which
+    grows linearly with time (no overflow, no rescaling). Ranking reads the first
+    K entries of an ordered index, and writing a video's new score is O(log N).
+
+    Events are buffered like ViewCounter's views: views are summed per video, likes
+    kept in order, and everything is written in one batch every flush_interval
+    seconds (and at exit). An unlike takes back what the original like added
+    (its weight at the time of the like), so toggling never pumps or erases a score.
+    """
+    def __init__(self, half_life=6 * 3600, view_weight=1.0, like_weight=5.0, flush_interval=5):
+        self.half_life = half_life
+        self.view_weight = view_weight
+        self.like_weight = like_weight
+        self.flush_interval = flush_interval
+        self._views = defaultdict(int)
+        self._likes = []            # (video_id, user_id, liked, time)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        # Started lazily so forked Gunicorn workers each get their own flusher
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name='trending')
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _boost(self, weight, at):
+        """log2 of the forward-decayed weight of an event at time 'at'"""
+        return math.log2(weight) + at / self.half_life
+
+    def _floor(self, now):
+        return self._boost(MIN_SCORE, now)
+
+    # --- Events (in memory) ---
+    def add_view(self, video_id, amount=1):
+        with self._lock:
+            self._views[video_id] += amount
+        self._ensure_thread()
+
+    def add_like(self, video_id, user_id, liked, now=None):
+        with self._lock:
+            self._likes.append((video_id, user_id, liked, time.time() if now is None else now))
+        self._ensure_thread()
+
+    def flush(self, now=None):
+        """
+        Writes the buffered events in one batch. Returns the number of videos updated.
+        The events of videos whose write did not go through are kept for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                views, self._views = self._views, defaultdict(int)
+                likes, self._likes = self._likes, []
+            changes = self._changes(views, likes)
+            if not changes:
+                return 0
+            try:
+                left = self._write(changes, time.time() if now is None else now)
+            except Exception as e:
+                print(f"[ERROR] Writing trending scores failed: {e}")
+                left = changes
+            if left:
+                print(f"[WARN] Trending scores of {len(left)} video(s) kept for the next flush")
+                self._requeue(left)
+            return len(changes) - len(left)
+
+    def _changes(self, views, likes):
+        """Groups the events per video: {video_id: [('view', amount) | ('like' | 'unlike', (user_id, time))]}"""
+        changes = defaultdict(list)
+        for video_id, amount in views.items():
+            if amount > 0:
+                changes[video_id].append(('view', amount))
+        for video_id, user_id, liked, at in likes:
+            changes[video_id].append(('like' if liked else 'unlike', (user_id, at)))
+        return changes
+
+    def _requeue(self, changes):
+        likes = []
+        with self._lock:
+            for video_id, events in changes.items():
+                for kind, value in events:
+                    if kind == 'view':
+                        self._views[video_id] += value
+                    else:
+                        likes.append((video_id, value[0], kind == 'like', value[1]))
+            self._likes[:0] = likes
+
+    # --- Queries ---
+    def top(self, limit=20, now=None):
+        """[(video_id, score), ...] best first; a score is in 'views as of now'"""
+        now = time.time() if now is None else now
+        return [(video_id, 2 ** (score - now / self.half_life))
+                for video_id, score in self._ranked(max(1, limit)) if score >= self._floor(now)]
+
+    def score(self, video_id, now=None):
+        score = self._log_score(video_id)
+        now = time.time() if now is None else now
+        return 2 ** (score - now / self.half_life) if score is not None else 0.0
+
+    # --- Storage (see SQLiteTrending / aws_impl.DynamoTrending) ---
+    def _write(self, changes, now):
+        """Applies _changes(); returns the part that was not written ({} when all was)"""
+        raise NotImplementedError
+
+    def _ranked(self, limit):
+        raise NotImplementedError
+
+    def _log_score(self, video_id):
+        raise NotImplementedError
+
+
+# --- 2. SQLITE STORE (one box) ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    video_id TEXT PRIMARY KEY,
+    score    REAL NOT NULL  -- log2 of the sum of weight * 2^(event time / half_life)
+);
+CREATE INDEX IF NOT EXISTS scores_rank ON scores (score DESC);
+
+CREATE TABLE IF NOT EXISTS likes (
+    video_id TEXT NOT NULL,
+    user_id  TEXT NOT NULL,
+    liked_at REAL NOT NULL,
+    PRIMARY KEY (video_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS likes_age ON likes (liked_at);
+"""
+
+
+class SQLiteTrending(TrendingIndex):
+    """Scores in a SQLite (WAL) file shared by the workers of one box (local / single-box deployments)"""
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.db = SQLiteDatabase(path, schema=SCHEMA)
+
+    def _write(self, changes, now):
+        # One transaction: all of it is written, or nothing
+        floor = self._floor(now)
+        with self.db.transaction() as conn:
+            for video_id, events in changes.items():
+                row = conn.execute("SELECT score FROM scores WHERE video_id = ?", (video_id,)).fetchone()
+                score = row['score'] if row else None
+                for kind, value in events:
+                    if kind == 'view':
+                        score = log_add(score, self._boost(self.view_weight * value, now))
+                    elif kind == 'like':
+                        user_id, at = value
+                        if conn.execute("INSERT OR IGNORE INTO likes (video_id, user_id, liked_at) VALUES (?, ?, ?)",
+                                        (video_id, user_id, at)).rowcount:
+                            score = log_add(score, self._boost(self.like_weight, at))
+                    else:
+                        liked = conn.execute("DELETE FROM likes WHERE video_id = ? AND user_id = ? RETURNING liked_at",
+                                             (video_id, value[0])).fetchone()
+                        if liked:
+                            score = log_sub(score, self._boost(self.like_weight, liked['liked_at']))
+                if score is None or score < floor:
+                    conn.execute("DELETE FROM scores WHERE video_id = ?", (video_id,))
+                else:
+                    conn.execute("INSERT INTO scores (video_id, score) VALUES (?, ?) "
+                                 "ON CONFLICT (video_id) DO UPDATE SET score = excluded.score", (video_id, score))
+            # Entries that decayed to nothing; likes so old that taking them back changes nothing
+            conn.execute("DELETE FROM scores WHERE score < ?", (floor,))
+            conn.execute("DELETE FROM likes WHERE liked_at < ?",
+                         (now - self.half_life * math.log2(self.like_weight / MIN_SCORE),))
+        return {}
+
+    def _ranked(self, limit):
+        rows = self.db.conn.execute("SELECT video_id, score FROM scores ORDER BY score DESC LIMIT ?", (limit,))
+        return [(r['video_id'], r['score']) for r in rows]
+
+    def _log_score(self, video_id):
+        row = self.db.conn.execute("SELECT score FROM scores WHERE video_id = ?", (video_id,)).fetchone()
+        return row['score'] if row else None
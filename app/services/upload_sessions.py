@@ -0,0 +1,58 @@
+import json
+import os
+import time
+import uuid
+
+
+class UploadSessionStore:
+    """
+    Keeps resumable-upload sessions as small JSON files on disk, so a session
+    survives a worker restart and any Gunicorn worker can serve the next part.
+
+    The parts themselves live in the storage backend (S3 multipart / part files);
+    only the session metadata is kept here.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, session_id):
+        # session ids are uuid4 hex strings; reject anything else before touching the disk
+        if not session_id or not session_id.isalnum():
+            return None
+        return os.path.join(self.folder, f"{session_id}.json")
+
+    def create(self, user_id, filename, upload_id, part_size, total_size=None):
+        session = {
+            'session_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'filename': filename,
+            'upload_id': upload_id,
+            'part_size': part_size,
+            'total_size': total_size,
+            'status': 'uploading',
+            'created_at': int(time.time())
+        }
+        self.save(session)
+        return session
+
+    def get(self, session_id):
+        path = self._path(session_id)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, session):
+        path = self._path(session['session_id'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(session, f)
+        os.replace(path + '.tmp', path)
+
+    def delete(self, session_id):
+        path = self._path(session_id)
+        if path and os.path.exists(path):
+            os.remove(path)
@@ -23,27 +23,156 @@ class Config:
     # Mock Paths
     MOCK_MEDIA_FOLDER = os.path.join(BASE_DIR, 'mock_aws', 'local_s3')
     MOCK_DB_FOLDER = os.path.join(BASE_DIR, 'mock_aws', 'local_db')
+
+    # Local metadata backend: 'json' (MockDatabase/MockUsers), 'sqlite' (one WAL-mode file,
+    # safe for several Gunicorn workers; move existing data over with 'flask db import-json')
+    # or 'log' (append-only video catalog + snapshots in MOCK_DB_FOLDER; users stay in JSON).
+    DB_BACKEND = os.environ.get('DB_BACKEND', 'json')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH') or os.path.join(MOCK_DB_FOLDER, 'snapstream.db')
+    # 'log' backend: compact (snapshot) once the log since the last snapshot passes this size
+    LOG_COMPACT_BYTES = 4 * 1024 * 1024
+
+    # Content-addressed uploads: files are stored once under cas/<sha256[:2]>/<sha256>.<ext>,
+    # duplicates are not kept twice. Reference counts live in CAS_REFS_PATH locally and in
+    # DYNAMO_TABLE_OBJECTS on AWS; 'flask storage gc' removes objects no video references.
+    STORAGE_CONTENT_ADDRESSED = os.environ.get('STORAGE_CONTENT_ADDRESSED', 'true').lower() == 'true'
+    CAS_REFS_PATH = os.environ.get('CAS_REFS_PATH') or os.path.join(MOCK_DB_FOLDER, 'objects.db')
+    CAS_GC_MIN_AGE = 24 * 3600
+    # Cache lifetime of content-addressed files (they never change)
+    IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+    # Local/on-prem media serving (/file/<name> outside production)
+    MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 3600))
+    # e.g. '/protected-media' -> Nginx serves the bytes from an 'internal' location
+    MEDIA_X_ACCEL_PREFIX = os.environ.get('MEDIA_X_ACCEL_PREFIX')
     
     # AWS Configuration
     AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
     AWS_BUCKET_NAME = os.environ.get('AWS_BUCKET_NAME')
+    # boto3 clients are created on first use and shared by every service / thread of a
+    # worker; this is the connection pool of each (S3 uses S3_MAX_POOL_CONNECTIONS)
+    AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 25))
+
+    # Private buckets: /file/<name> redirects to a presigned URL instead of the public one.
+    # Signed URLs are cached per object and dropped SIGNED_URL_EXPIRY_MARGIN seconds
+    # before the signature itself expires.
+    S3_SIGNED_URLS = os.environ.get('S3_SIGNED_URLS', 'False') == 'True'
+    SIGNED_URL_EXPIRATION = int(os.environ.get('SIGNED_URL_EXPIRATION', 6 * 3600)) # 6 hours
+    SIGNED_URL_EXPIRY_MARGIN = 300
+    SIGNED_URL_CACHE_SIZE = 10000
+    # Redirects to public (unsigned) URLs never change, so they can be cached for long
+    PUBLIC_URL_MAX_AGE = 7 * 24 * 3600
     
     # DynamoDB Tables
     DYNAMO_TABLE_VIDEO = os.environ.get('DYNAMO_TABLE_VIDEO')
     DYNAMO_TABLE_USER = os.environ.get('DYNAMO_TABLE_USER')
+    DYNAMO_TABLE_OBJECTS = os.environ.get('DYNAMO_TABLE_OBJECTS')
+    # Trending scores on AWS (HASH video_id; TTL on expires_at recommended)
+    DYNAMO_TABLE_TRENDING = os.environ.get('DYNAMO_TABLE_TRENDING')
+    # Global secondary indexes (create with: flask db create-indexes)
+    DYNAMO_USER_EMAIL_INDEX = 'email-index'
+    DYNAMO_VIDEO_USER_INDEX = 'user_id-upload_date-index'
+    DYNAMO_VIDEO_FEED_INDEX = 'feed-created_at-index'
+    DYNAMO_TRENDING_INDEX = 'board-score-index'
+
+    # Explore feed / /api/videos page size
+    FEED_PAGE_SIZE = 24
+    # Materialized Explore feed: the newest EXPLORE_FEED_SIZE videos are kept in memory (and their
+    # rendered pages cached); rebuilt after EXPLORE_FEED_MAX_AGE seconds to pick up other workers' uploads
+    EXPLORE_FEED_SIZE = 240
+    EXPLORE_FEED_MAX_AGE = 30
+    # Trending: views / likes with weights that halve every TRENDING_HALF_LIFE seconds, buffered
+    # per worker and written every TRENDING_FLUSH_INTERVAL seconds. Production keeps the scores in
+    # DYNAMO_TABLE_TRENDING; TRENDING_PATH (a SQLite file shared by the workers of one box) is for
+    # local runs, and in production only when set explicitly (single-box deployments).
+    TRENDING_PATH = os.environ.get('TRENDING_PATH') or os.path.join(MOCK_DB_FOLDER, 'trending.db')
+    TRENDING_HALF_LIFE = 6 * 3600
+    TRENDING_FLUSH_INTERVAL = 5
+    TRENDING_VIEW_WEIGHT = 1.0
+    TRENDING_LIKE_WEIGHT = 5.0
+    TRENDING_SIZE = 48
+    # Video metadata cache: per-worker LRU (VIDEO_CACHE_LOCAL_TTL) in front of an optional
+    # memcached shared by all workers (VIDEO_CACHE_SERVER='127.0.0.1:11211', needs pymemcache)
+    VIDEO_CACHE_SERVER = os.environ.get('VIDEO_CACHE_SERVER')
+    VIDEO_CACHE_TTL = 60
+    VIDEO_CACHE_LOCAL_TTL = 10
+    VIDEO_CACHE_SIZE = 10000
+    # User objects for Flask-Login's user_loader (unknown ids are cached for the shorter TTL)
+    USER_CACHE_TTL = 30
+    USER_CACHE_NEGATIVE_TTL = 10
+    USER_CACHE_SIZE = 10000
+    # View counts are buffered per worker and flushed every VIEW_FLUSH_INTERVAL seconds
+    # (or once VIEW_FLUSH_THRESHOLD views are waiting)
+    VIEW_FLUSH_INTERVAL = 5
+    VIEW_FLUSH_THRESHOLD = 1000
+    # Full rebuild of each worker's search index after this many seconds (picks up other workers' uploads)
+    SEARCH_INDEX_MAX_AGE = 300
 
     # Notification Config (SNS)
     SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
+    # Notifications are durable 'notify' jobs. Those enqueued within the same NOTIFY_FLUSH_INTERVAL-second
+    # window fall due at its end and are sent together (up to NOTIFY_MAX_BATCH per batch; retries /
+    # dead letters: JOB_MAX_ATTEMPTS). NOTIFY_MODE: 'batch' (SNS publish_batch), 'digest' (one summary
+    # message per batch) or 'direct' (one publish per message, sent right away).
+    NOTIFY_MODE = os.environ.get('NOTIFY_MODE', 'batch')
+    NOTIFY_FLUSH_INTERVAL = 30
+    NOTIFY_MAX_BATCH = 50
 
     # ========================================================
     # 3. AI CONFIGURATION
     # ========================================================
     REKOGNITION_MIN_CONFIDENCE = 75 
+    # Parallel Rekognition calls per batch ('flask db retag', analysis jobs)
+    REKOGNITION_CONCURRENCY = 8
+    # Labels are cached per image content (S3 ETag) + settings, so duplicates are analyzed once
+    REKOGNITION_CACHE_TTL = 30 * 24 * 3600
+    REKOGNITION_CACHE_SIZE = 10000
 
     # ========================================================
     # 4. UPLOAD LIMITS
     # ========================================================
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024 * 1024 # 2GB
+
+    # Streaming uploads read the request body directly and write it to storage
+    # chunk by chunk (no temp file, no second copy). Chunks double as S3 multipart parts,
+    # so keep this >= 5MB.
+    STREAMING_UPLOADS = os.environ.get('STREAMING_UPLOADS', 'True') == 'True'
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)) # 8MB
+    # S3 transfers: parts of one upload are sent S3_TRANSFER_CONCURRENCY at a time (memory per
+    # upload ~ concurrency x UPLOAD_CHUNK_SIZE). The client's connection pool is shared by all
+    # request threads and transfers of a worker, so size it for several concurrent uploads.
+    S3_TRANSFER_CONCURRENCY = int(os.environ.get('S3_TRANSFER_CONCURRENCY', 10))
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 50))
+    # e.g. 'http://localhost:9000' for MinIO / a local S3 stand-in
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+
+    # Thumbnail variants built after each upload (needs Pillow; ffmpeg to derive a missing thumbnail)
+    THUMBNAIL_WIDTHS = (160, 320, 640)
+    THUMBNAIL_FORMATS = ('webp', 'jpeg')
+    THUMBNAIL_QUALITY = 80
+
+    # Resumable uploads (/api/uploads): session files survive worker restarts
+    UPLOAD_SESSION_FOLDER = os.environ.get('UPLOAD_SESSION_FOLDER') or os.path.join(MOCK_DB_FOLDER, 'upload_sessions')
+
+    # ========================================================
+    # 5. BACKGROUND JOBS (post-upload analysis / notification)
+    # ========================================================
+    # Durable queue file (SQLite) shared by all workers on the box
+    JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH') or os.path.join(MOCK_DB_FOLDER, 'jobs.db')
+    # Worker threads per web process (0 = only a separate 'flask jobs work' process runs jobs)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    # A failing job is retried after JOB_RETRY_DELAY, 2x, 4x... seconds, then dead-lettered
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_DELAY = 10
+    # A running job's lease is renewed every JOB_LEASE / 3 seconds; a job whose worker died runs
+    # again once its lease expires
+    JOB_LEASE = 300
+
+    # Adaptive streaming: after upload, transcode to an HLS ladder of (height, video kbps) renditions
+    # (needs ffmpeg/ffprobe on the job worker; renditions taller than the source are skipped)
+    HLS_ENABLED = os.environ.get('HLS_ENABLED', 'True') == 'True'
+    HLS_RENDITIONS = ((360, 800), (720, 2800), (1080, 5000))
+    HLS_SEGMENT_SECONDS = 6
     
     DEBUG = os.environ.get('FLASK_DEBUG', 'True') == 'True'
     ENV = 'development'
\ No newline at end of file
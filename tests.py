@@ -5,7 +5,7 @@ import os
 import json
 
 # Import your REAL AWS implementations
-from app.services.aws_impl import S3Storage, DynamoDBService, SNSNotifier, RekognitionAnalyzer
+from app.services.aws_impl import S3Storage, DynamoDBService, DynamoUsers, SNSNotifier, RekognitionAnalyzer
 
 # --- SETUP: FAKE AWS CREDENTIALS ---
 @pytest.fixture(scope='function')
@@ -37,6 +37,18 @@ def test_s3_upload(aws_credentials):
     assert filename == "hello.txt"
     obj = s3.get_object(Bucket='test-bucket', Key='hello.txt')
     assert obj['Body'].read().decode('utf-8') == "Hello World"
+
+    # Streams without seekable() (SpooledTemporaryFile before Python 3.11) are rewound too
+    class Spooled:
+        def __init__(self, data): self.buffer = BytesIO(data)
+        def read(self, size=-1): return self.buffer.read(size)
+        def seek(self, offset, whence=0): return self.buffer.seek(offset, whence)
+        def tell(self): return self.buffer.tell()
+        def close(self): pass
+    spooled = Spooled(b"Rewound")
+    spooled.read(3)
+    assert storage.upload_file(spooled, "spooled.txt") == "spooled.txt"
+    assert s3.get_object(Bucket='test-bucket', Key='spooled.txt')['Body'].read() == b"Rewound"
     print("\n✅ S3 Upload Logic is PERFECT.")
 
 # --- TEST 2: DYNAMO DB SAVE ---
@@ -99,5 +111,912 @@ def test_rekognition_analysis(aws_credentials):
     assert isinstance(tags, list)
     print(f"\n✅ Rekognition Logic is PERFECT. (Tags received: {tags})")
 
+# --- TEST 5: STREAMING UPLOAD (S3 MULTIPART) ---
+@mock_aws
+def test_s3_upload_stream(aws_credentials):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='test-bucket')
+
+    storage = S3Storage()
+    payload = os.urandom(17 * 1024 * 1024)  # > 2 x 8MB part size: 3-part multipart upload, parts sent in parallel
+    chunks = (payload[i:i + 1024 * 1024] for i in range(0, len(payload), 1024 * 1024))
+
+    filename, size, checksum = storage.upload_stream(chunks, "big.mp4")
+
+    import hashlib
+    assert filename == "big.mp4"
+    assert size == len(payload)
+    assert checksum == hashlib.sha256(payload).hexdigest()
+    assert s3.get_object(Bucket='test-bucket', Key='big.mp4')['Body'].read() == payload
+    print("\n✅ S3 Streaming Upload Logic is PERFECT.")
+
+# --- TEST 6: STREAMING MULTIPART PARSER + LOCAL STORAGE ---
+def test_multipart_stream_to_mock_storage(tmp_path):
+    from io import BytesIO
+    from app.services.mock_impl import MockStorage
+    from app.services.streaming import MultipartStreamReader
+
+    body = (
+        b'--XyZ\r\nContent-Disposition: form-data; name="video_file"; filename="clip.mp4"\r\n'
+        b'Content-Type: video/mp4\r\n\r\n' + b'v' * 100000 + b'\r\n'
+        b'--XyZ\r\nContent-Disposition: form-data; name="title"\r\n\r\nHello\r\n'
+        b'--XyZ--\r\n'
+    )
+    storage = MockStorage(str(tmp_path))
+    reader = MultipartStreamReader(BytesIO(body), 'XyZ', chunk_size=4096)
+
+    form, saved = {}, None
+    for kind, name, value in reader.parts():
+        if kind == 'file':
+            saved = storage.upload_stream(value.iter_chunks(), value.filename)
+        else:
+            form[name] = value
+
+    assert saved[0] == 'clip.mp4' and saved[1] == 100000
+    assert (tmp_path / 'clip.mp4').read_bytes() == b'v' * 100000
+    assert form == {'title': 'Hello'}
+
+# --- TEST 7: RESUMABLE UPLOAD API (MOCK STORAGE) ---
+def test_resumable_upload_api(tmp_path):
+    from config import Config
+    from app import create_app
+    from app.models import User
+    from app.services.mock_impl import MockStorage
+
+    class TestConfig(Config):
+        TESTING = True
+        UPLOAD_CHUNK_SIZE = 4
+        UPLOAD_SESSION_FOLDER = str(tmp_path / 'sessions')
+
+    app = create_app(TestConfig)
+    app.services['storage'] = MockStorage(str(tmp_path / 's3'))
+    app.login_manager._user_callback = lambda uid: User(uid, 'tester', 't@x.com', 'hash')
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = 'user-1'
+
+    # The size is required and bounds the number of parts
+    for size in (None, "abc", -5, 0, True):
+        assert client.post('/api/uploads', json={'filename': 'movie.mp4', 'size': size}).status_code == 400
+    session = client.post('/api/uploads', json={'filename': 'movie.mp4', 'size': 10}).get_json()
+    sid = session['session_id']
+    assert client.put(f'/api/uploads/{sid}/parts/4', data=b'!!').status_code == 400
+
+    # Parts can arrive in any order and be re-sent after a failure
+    assert client.put(f'/api/uploads/{sid}/parts/3', data=b'89').status_code == 200
+    assert client.put(f'/api/uploads/{sid}/parts/1', data=b'XXXX').status_code == 200
+    assert client.post(f'/api/uploads/{sid}/complete').status_code == 409
+    client.put(f'/api/uploads/{sid}/parts/1', data=b'0123')
+    client.put(f'/api/uploads/{sid}/parts/2', data=b'4567')
+
+    parts = client.get(f'/api/uploads/{sid}').get_json()['parts']
+    assert [p['part_number'] for p in parts] == [1, 2, 3]
+
+    result = client.post(f'/api/uploads/{sid}/complete').get_json()
+    # Staged under a per-session folder: two 'movie.mp4' uploads never overwrite each other
+    assert result['size'] == 10
+    assert result['filename'].startswith('uploads/') and result['filename'].endswith('/movie.mp4')
+    assert (tmp_path / 's3' / result['filename']).read_bytes() == b'0123456789'
+
+# --- TEST 8: RANGE / CONDITIONAL MEDIA SERVING ---
+def test_stream_file_ranges(tmp_path):
+    from config import Config
+    from app import create_app
+
+    class TestConfig(Config):
+        TESTING = True
+        MOCK_MEDIA_FOLDER = str(tmp_path)
+
+    (tmp_path / 'clip.mp4').write_bytes(bytes(range(256)) * 4)
+    client = create_app(TestConfig).test_client()
+
+    full = client.get('/file/clip.mp4')
+    assert full.status_code == 200 and len(full.data) == 1024
+
+    part = client.get('/file/clip.mp4', headers={'Range': 'bytes=10-19'})
+    assert part.status_code == 206
+    assert part.headers['Content-Range'] == 'bytes 10-19/1024'
+    assert part.data == bytes(range(10, 20))
+
+    multi = client.get('/file/clip.mp4', headers={'Range': 'bytes=0-1,-2'})
+    assert multi.status_code == 206
+    assert multi.mimetype == 'multipart/byteranges'
+    assert b'Content-Range: bytes 1022-1023/1024' in multi.data
+    assert int(multi.headers['Content-Length']) == len(multi.data)
+
+    assert client.get('/file/clip.mp4', headers={'Range': 'bytes=5000-'}).status_code == 416
+    assert client.get('/file/clip.mp4', headers={'If-None-Match': full.headers['ETag']}).status_code == 304
+
+# --- TEST 9: PRESIGNED URL CACHE ---
+@mock_aws
+def test_presigned_url_cache(aws_credentials):
+    storage = S3Storage()
+
+    url, max_age = storage.signed_url('thumb.jpg', expiration=3600)
+    again, _ = storage.signed_url('thumb.jpg', expiration=3600)
+
+    assert 'Signature' in url or 'X-Amz-Signature' in url
+    assert again == url  # served from the cache, not re-signed
+    assert 0 < max_age <= 3600 - 300  # expires from the cache before the signature does
+
+# --- TEST 10: GSI-BACKED LOOKUPS ---
+@mock_aws
+def test_dynamo_index_queries(aws_credentials, monkeypatch):
+    monkeypatch.setenv('DYNAMO_TABLE_USER', 'Test-Users')
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    for name, key in (('Test-Videos', 'video_id'), ('Test-Users', 'user_id')):
+        dynamodb.create_table(
+            TableName=name,
+            KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+        )
+
+    users, db = DynamoUsers(), DynamoDBService()
+    assert users.ensure_indexes() == ['email-index']
+    assert db.ensure_indexes() == ['user_id-upload_date-index', 'feed-created_at-index']
+    assert users.ensure_indexes() == []  # idempotent
+
+    user, _ = users.create_user('a@b.com', 'alice', 'pw')
+    assert users.create_user('a@b.com', 'again', 'pw') == (None, "Email already registered.")
+    assert users.get_user_by_email('a@b.com')['user_id'] == user.id
+
+    db.put_video("Mine", "", [], "a.mp4", user.id)
+    db.put_video("Other", "", [], "b.mp4", "someone-else")
+    assert [v['title'] for v in db.get_user_videos(user.id)] == ["Mine"]
+
+# --- TEST 11: CURSOR PAGINATION ---
+@mock_aws
+def test_list_videos_pagination(aws_credentials, tmp_path):
+    from app.services.mock_impl import MockDatabase
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='Test-Videos',
+        KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'video_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    dynamo = DynamoDBService()
+    dynamo.ensure_indexes()
+
+    for db in (dynamo, MockDatabase(str(tmp_path))):
+        for i in range(5):
+            db.put_video(f"Video {i}", "", [], f"{i}.mp4", "user-1")
+
+        titles, cursor = [], None
+        while True:
+            page, cursor = db.list_videos(cursor=cursor, limit=2)
+            titles += [v['title'] for v in page]
+            if not cursor:
+                break
+        assert titles == [f"Video {i}" for i in reversed(range(5))]
+
+    # A cursor with the wrong keys is rejected (the route answers 400), not run against DynamoDB
+    from app.services.pagination import encode_cursor
+    for key in ({'video_id': 'x'}, {'feed': 'ALL', 'created_at': 'x', 'video_id': 'x', 'extra': 'x'}):
+        with pytest.raises(ValueError):
+            dynamo.list_videos(cursor=encode_cursor(key), limit=2)
+
+    # Without the feed index (DynamoDB answers ValidationException): a table scan, same order and cursors
+    from botocore.exceptions import ClientError
+    def query(**kwargs):
+        raise ClientError({'Error': {'Code': 'ValidationException',
+                                     'Message': 'The table does not have the specified index'}}, 'Query')
+    dynamo.table.query = query
+    titles, cursor = [], None
+    while True:
+        page, cursor = dynamo.list_videos(cursor=cursor, limit=2)
+        titles += [v['title'] for v in page]
+        if not cursor:
+            break
+    assert titles == [f"Video {i}" for i in reversed(range(5))]
+
+# --- TEST 12: FULL-TEXT SEARCH INDEX ---
+def test_search_index(tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.search import SearchIndex
+
+    db = MockDatabase(str(tmp_path))
+    db.put_video("Cooking pasta at home", "Easy dinner", ["food"], "a.mp4", "u1")
+    index = SearchIndex(db)
+    assert [v['title'] for v in index.search("pasta")] == ["Cooking pasta at home"]
+
+    # Indexed incrementally on put_video, ranked by BM25 (title beats description)
+    db.put_video("Gaming marathon", "No pasta here, just games", ["gaming"], "b.mp4", "u1")
+    db.put_video("Pasta pasta pasta", "", [], "c.mp4", "u1")
+    assert [v['title'] for v in index.search("pasta")][0] == "Pasta pasta pasta"
+    assert len(index.search("pasta")) == 3
+
+    # Prefix matching
+    assert [v['title'] for v in index.search("gam")] == ["Gaming marathon"]
+    assert index.search("nothing-matches-this") == []
+
+    # Concurrent first requests share one build; videos written while it scans are not lost
+    import threading
+    scans, scanning, release = [], threading.Event(), threading.Event()
+    class SlowScan(MockDatabase):
+        def get_all_videos(self):
+            scans.append(1)
+            videos = super().get_all_videos()
+            scanning.set()
+            release.wait(5)
+            return videos
+    db = SlowScan(str(tmp_path / 'slow'))
+    index = SearchIndex(db)
+    readers = [threading.Thread(target=index.search, args=("pasta",)) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    assert scanning.wait(5)
+    db.put_video("Late pasta", "", [], "d.mp4", "u1")
+    release.set()
+    for reader in readers:
+        reader.join(5)
+    assert scans == [1]
+    assert [v['title'] for v in index.search("late")] == ["Late pasta"]
+
+# --- TEST 13: READ-THROUGH VIDEO CACHE ---
+def test_cached_video_db(tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.cached_impl import CachedVideoDB
+
+    inner = MockDatabase(str(tmp_path))
+    calls = []
+    original_get = inner.get_video
+    inner.get_video = lambda vid: calls.append(vid) or original_get(vid)
+
+    db = CachedVideoDB(inner, local_ttl=60)
+    video_id = db.put_video("First", "", [], "a.mp4", "u1")
+
+    assert db.get_video(video_id)['title'] == "First"
+    assert db.get_video(video_id)['title'] == "First"
+    assert calls == [video_id]  # second read was a cache hit
+
+    page, _ = db.list_videos(limit=10)
+    db.put_video("Second", "", [], "b.mp4", "u1")  # a new video invalidates the feed pages
+    page, _ = db.list_videos(limit=10)
+    assert [v['title'] for v in page] == ["Second", "First"]
+
+    stats = db.stats()
+    assert stats['videos']['hits'] >= 1 and stats['lists']['misses'] >= 2
+
+# --- TEST 14: USER-SESSION CACHE ---
+def test_cached_users(tmp_path):
+    from app.services.mock_impl import MockUsers
+    from app.services.cached_impl import CachedUsers
+
+    inner = MockUsers(str(tmp_path))
+    reads = []
+    original_get = inner.get_user_by_id
+    inner.get_user_by_id = lambda uid: reads.append(uid) or original_get(uid)
+    users = CachedUsers(inner)
+
+    user, _ = users.create_user('c@d.com', 'carol', 'pw')
+    for _ in range(3):
+        assert users.get_user_by_id(user.id).username == 'carol'
+    assert reads == [user.id]
+
+    users.update_profile(user.id, 'caroline')  # invalidates
+    assert users.get_user_by_id(user.id).username == 'caroline'
+    assert len(reads) == 2
+
+    # Password hashes stay out of the caches (memcached is readable by anything on the box)
+    class FakeShared(dict):
+        def set(self, key, value, ttl): self[key] = value
+        def delete(self, key): self.pop(key, None)
+        def __bool__(self): return True
+    shared = FakeShared()
+    users = CachedUsers(inner, shared=shared)
+    assert users.get_user_by_id(user.id).password_hash is None
+    assert 'password_hash' not in shared[f"user:{user.id}"]
+    assert users.validate_login('c@d.com', 'pw')[0] is not None
+
+    # Unknown ids are negatively cached
+    assert users.get_user_by_id('ghost') is None
+    assert users.get_user_by_id('ghost') is None
+    assert reads.count('ghost') == 1
+
+    # memcached values are JSON, never pickles; the generation counter stays incr-able digits
+    import pickle
+    from decimal import Decimal
+    from app.services.cache import JSONSerde
+    serde = JSONSerde()
+    raw, flags = serde.serialize('video:a', {'views': Decimal('3'), 'rating': Decimal('4.5'), 'liked_by': {'u2', 'u1'}})
+    assert serde.deserialize('video:a', raw, flags) == {'views': 3, 'rating': 4.5, 'liked_by': ['u1', 'u2']}
+    assert serde.serialize('lists:generation', 1) == (b'1', 0)
+    assert serde.deserialize('lists:generation', b'7', 0) == 7
+    with pytest.raises(ValueError):
+        serde.deserialize('video:a', pickle.dumps({'a': 1}), 1)
+
+# --- TEST 15: ATOMIC COUNTERS + WRITE-BEHIND VIEWS ---
+@mock_aws
+def test_counters(aws_credentials, tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.counters import ViewCounter
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='Test-Videos',
+        KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'video_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+    for db in (DynamoDBService(), MockDatabase(str(tmp_path))):
+        video_id = db.put_video("Counted", "", [], "a.mp4", "u1")
+
+        assert db.toggle_like(video_id, "alice") == (True, 1)
+        assert db.toggle_like(video_id, "bob") == (True, 2)
+        assert db.toggle_like(video_id, "alice") == (False, 1)
+        assert db.toggle_like("missing", "alice") == (None, None)
+
+        writes = []
+        db.subscribe(lambda event, v: writes.append(v) if event == 'counters' and 'views' in v else None)
+        counter = ViewCounter(db, flush_interval=3600)
+        for _ in range(50):
+            counter.add_view(video_id)
+        assert counter.pending(video_id) == 50
+        assert counter.flush() == 1
+        assert len(writes) == 1  # 50 views, one write
+        assert int(db.get_video(video_id)['views']) == 50
+        assert db.increment_views("missing") is None
+
+    # A throttled write raises instead of looking like a missing video: the views wait for the next flush
+    from botocore.exceptions import ClientError
+    db = DynamoDBService()
+    video_id = db.put_video("Throttled", "", [], "b.mp4", "u1")
+    counter = ViewCounter(db, flush_interval=3600)
+    original = db.table.update_item
+    def throttled(**kwargs):
+        raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem')
+    db.table.update_item = throttled
+    counter.add_view(video_id, 3)
+    assert counter.flush() == 1 and counter.pending(video_id) == 3
+    db.table.update_item = original
+    counter.flush()
+    assert int(db.get_video(video_id)['views']) == 3
+
+    # Who liked a video (a DynamoDB string set) stays out of every API response
+    from app import create_app
+    from config import Config
+    class TestConfig(Config):
+        TESTING = True
+    assert db.toggle_like(video_id, "alice") == (True, 1)
+    app = create_app(TestConfig)
+    app.services['db'] = db
+    response = app.test_client().get(f'/api/videos/{video_id}')
+    assert response.status_code == 200 and 'liked_by' not in response.get_json()
+
+# --- TEST 16: SQLITE (WAL) BACKEND ---
+def test_sqlite_backend(tmp_path):
+    from app.services.mock_impl import MockDatabase, MockUsers
+    from app.services.sqlite_impl import SQLiteDatabase, SQLiteVideoDB, SQLiteUsers
+
+    database = SQLiteDatabase(str(tmp_path / 'snap.db'))
+    assert database.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    db, users = SQLiteVideoDB(database), SQLiteUsers(database)
+
+    ids = [db.put_video(f"Clip {i}", "", ["tag"], f"{i}.mp4", "u1" if i % 2 else "u2") for i in range(5)]
+    page, cursor = db.list_videos(limit=3)
+    rest, end = db.list_videos(cursor=cursor, limit=3)
+    assert [v['video_id'] for v in page + rest] == ids[::-1]
+    assert end is None
+    assert len(db.get_user_videos("u1")) == 2
+    assert db.get_video(ids[0])['tags'] == ["tag"]
+    assert db.toggle_like(ids[0], "alice") == (True, 1)
+    assert db.toggle_like(ids[0], "alice") == (False, 0)
+    assert db.increment_views(ids[0], 7) == 7
+    db.update_video(ids[0], {'thumbnails': {'webp': {'160': 'a_160w.webp'}}})
+    assert db.get_video(ids[0])['thumbnails'] == {'webp': {'160': 'a_160w.webp'}}
+    assert db.get_video(ids[0])['views'] == 7
+
+    user, error = users.create_user("a@b.c", "Ann", "pw")
+    assert error is None
+    assert users.create_user("a@b.c", "Ann", "pw") == (None, "Email already registered.")
+    assert users.change_password(user.id, "pw", "new")[0]
+    assert users.validate_login("a@b.c", "new")[0].id == user.id
+
+    # One-shot import of the JSON backend's files
+    MockUsers(str(tmp_path)).create_user("old@b.c", "Old", "pw")
+    old_id = MockDatabase(str(tmp_path)).put_video("Old clip", "", [], "old.mp4", "u9")
+    assert users.import_users(json.load(open(tmp_path / 'users.json'))) == 1
+    assert db.import_videos(json.load(open(tmp_path / 'videos.json'))) == 1
+    assert users.validate_login("old@b.c", "pw")[0] is not None
+    assert db.get_video(old_id)['title'] == "Old clip"
+
+# --- TEST 17: APPEND-ONLY LOG CATALOG ---
+def test_log_catalog(tmp_path):
+    from app.services.log_impl import LogVideoDB
+
+    db = LogVideoDB(str(tmp_path), compact_bytes=10 ** 9)
+    ids = [db.put_video(f"Clip {i}", "", [], f"{i}.mp4", "u1") for i in range(3)]
+    db.increment_views(ids[0], 5)
+    assert db.toggle_like(ids[1], "alice") == (True, 1)
+    log_size = os.path.getsize(tmp_path / 'catalog.0.log')
+    db.increment_views(ids[0])
+    assert os.path.getsize(tmp_path / 'catalog.0.log') > log_size  # appended, not rewritten
+
+    # A second worker sees the first one's appends
+    other = LogVideoDB(str(tmp_path), compact_bytes=10 ** 9)
+    assert other.get_video(ids[0])['views'] == 6
+    db.put_video("Late", "", [], "late.mp4", "u2")
+    assert len(other.get_all_videos()) == 4
+
+    # Compaction: one record per video in the snapshot, empty new log, same data
+    db.compact()
+    assert not os.path.exists(tmp_path / 'catalog.0.log')
+    assert os.path.getsize(tmp_path / 'catalog.1.log') == 0
+    assert len(open(tmp_path / 'catalog.snapshot').readlines()) == 1 + 4
+    db.increment_views(ids[0])
+    restarted = LogVideoDB(str(tmp_path))
+    assert restarted.get_video(ids[0])['views'] == 7
+    assert other.get_video(ids[1])['likes'] == 1
+    page, cursor = restarted.list_videos(limit=2)
+    assert [v['title'] for v in page] == ["Late", "Clip 2"]
+    assert [v['title'] for v in restarted.list_videos(cursor=cursor, limit=2)[0]] == ["Clip 1", "Clip 0"]
+
+# --- TEST 18: POST-UPLOAD JOB QUEUE ---
+def test_job_queue(tmp_path):
+    import time
+    from app.services.mock_impl import MockDatabase, MockNotifier
+    from app.services.jobs import JobQueue, JobWorkerPool, post_upload_handlers
+
+    class FlakyAnalyzer:
+        calls = 0
+        def detect_labels(self, bucket, filename, max_labels=5):
+            self.calls += 1
+            return None if self.calls == 1 else ['Cat', 'mine']
+
+    db = MockDatabase(str(tmp_path))
+    video_id = db.put_video("Clip", "", ['mine'], "a.mp4", "u1", "a.jpg")
+    queue = JobQueue(str(tmp_path / 'jobs.db'), max_attempts=2, retry_delay=0)
+    handlers = post_upload_handlers(db, FlakyAnalyzer(), MockNotifier(), bucket='b')
+    pool = JobWorkerPool(queue, handlers, threads=0)
+
+    job_id = queue.enqueue('analyze', {'video_id': video_id, 'thumbnail': 'a.jpg'})
+    queue.enqueue('notify', {'subject': 's', 'message': 'm'})
+    queue.enqueue('analyze', {'video_id': 'missing', 'thumbnail': 'b.jpg'})
+    pool.drain()
+
+    assert queue.get(job_id)['status'] == 'done'
+    assert queue.get(job_id)['attempts'] == 2  # failed once, retried
+    assert db.get_video(video_id)['tags'] == ['mine', 'Cat']
+    dead = queue.dead_letters()
+    assert [j['payload']['video_id'] for j in dead] == ['missing']
+    assert queue.counts() == {'done': 2, 'dead': 1}
+    assert queue.retry_dead() == 1
+    assert queue.counts()['queued'] == 1
+
+    # A long job keeps renewing its short lease, so no other worker picks it up meanwhile
+    queue = JobQueue(str(tmp_path / 'lease.db'), lease=0.3)
+    seen = []
+    pool = JobWorkerPool(queue, {'slow': lambda payload: time.sleep(1) or seen.append(queue.claim())}, threads=0)
+    queue.enqueue('slow', {})
+    pool.drain()
+    assert seen == [None] and queue.counts() == {'done': 1}
+    # ...and a claim that lost its lease (the job was claimed again) cannot renew it
+    job_id = queue.enqueue('slow', {})
+    first = queue.claim()
+    time.sleep(0.4)
+    assert queue.claim()['job_id'] == job_id and queue.renew([first]) == 0
+
+# --- TEST 19: BATCHED + DEDUPLICATED REKOGNITION ---
+@mock_aws
+def test_rekognition_batch(aws_credentials):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='test-bucket')
+    s3.put_object(Bucket='test-bucket', Key='a.jpg', Body=b'same_bytes')
+    s3.put_object(Bucket='test-bucket', Key='copy_of_a.jpg', Body=b'same_bytes')
+    s3.put_object(Bucket='test-bucket', Key='b.jpg', Body=b'other_bytes')
+
+    analyzer = RekognitionAnalyzer()
+    calls = []
+    real_call = analyzer._call
+    analyzer._call = lambda *args: calls.append(args[1]) or real_call(*args)
+
+    items = [('test-bucket', k) for k in ('a.jpg', 'copy_of_a.jpg', 'b.jpg')]
+    results = analyzer.detect_labels_batch(items)
+    assert len(calls) == 2  # identical thumbnails are analyzed once
+    assert results[items[0]] == results[items[1]]
+    assert all(isinstance(tags, list) for tags in results.values())
+
+    # Re-uploaded content: cache hit, no API call
+    s3.put_object(Bucket='test-bucket', Key='reupload.jpg', Body=b'other_bytes')
+    assert analyzer.detect_labels('test-bucket', 'reupload.jpg') == results[items[2]]
+    assert len(calls) == 2
+    # A different confidence threshold is a different result
+    analyzer.detect_labels_batch(items[:1], min_confidence=90)
+    assert len(calls) == 3
+
+# --- TEST 20: BATCHED NOTIFICATION JOBS ---
+@mock_aws
+def test_batched_notifications(aws_credentials, tmp_path):
+    from app.services.notify_buffer import BatchNotifier
+    from app.services.mock_impl import MockNotifier
+    from app.services.jobs import JobQueue, JobWorkerPool, post_upload_handlers
+
+    sns = boto3.client('sns', region_name='us-east-1')
+    os.environ['SNS_TOPIC_ARN'] = sns.create_topic(Name='SnapStream-Alerts')['TopicArn']
+    assert SNSNotifier().send_batch([(f"Upload {i}", "m") for i in range(12)]) == []  # 2 PublishBatch calls
+
+    class Flaky(MockNotifier):
+        batches, fail_next = [], True
+        def send_batch(self, messages):
+            self.batches.append(messages)
+            failed, self.fail_next = ([0] if self.fail_next else []), False
+            return failed
+
+    # The due notify jobs go out as one batch; a job is only done once its message was accepted
+    inner = Flaky()
+    queue = JobQueue(str(tmp_path / 'jobs.db'), retry_delay=0)
+    pool = JobWorkerPool(queue, post_upload_handlers(None, None, BatchNotifier(inner), 'b', notify_batch=10), threads=0)
+    ids = [queue.enqueue('notify', {'subject': f"Upload {i}", 'message': "m"}) for i in range(3)]
+    assert pool.run_once()
+    assert queue.get(ids[0])['status'] == 'queued' and queue.get(ids[1])['status'] == 'done'
+    assert pool.drain() == 1  # retried on its own
+    assert [len(b) for b in inner.batches] == [3, 1]
+    assert queue.counts() == {'done': 3}
+
+    sent = []
+    inner = MockNotifier()
+    inner.send_notification = lambda subject, message: sent.append(subject)
+    assert BatchNotifier(inner, mode='digest').send_batch([(f"Upload {i}", "m") for i in range(5)]) == []
+    assert sent == ["SnapStream: 5 new notifications"]
+
+    # Uploads anywhere in one flush window fall due together, at its end
+    from app.services.jobs import next_window
+    assert [t + next_window(30, now=t) for t in (1000, 1009.5, 1019)] == [1020, 1020, 1020]
+    assert next_window(0, now=1009.5) == 0
+
+    # 'direct' mode (notify_batch=1): one send_notification per job, no publish_batch
+    sent = []
+    inner = MockNotifier()
+    inner.send_notification = lambda subject, message: sent.append(subject)
+    inner.send_batch = lambda messages: pytest.fail("direct mode must not batch")
+    queue = JobQueue(str(tmp_path / 'direct.db'), retry_delay=0)
+    pool = JobWorkerPool(queue, post_upload_handlers(None, None, inner, 'b', notify_batch=1), threads=0)
+    for i in range(2):
+        queue.enqueue('notify', {'subject': f"Upload {i}", 'message': "m"})
+    assert pool.drain() == 2 and sent == ["Upload 0", "Upload 1"] and queue.counts() == {'done': 2}
+
+# --- TEST 21: THUMBNAIL VARIANTS ---
+def test_thumbnail_variants(tmp_path):
+    pytest.importorskip('PIL')
+    from io import BytesIO
+    from PIL import Image
+    from app.services.mock_impl import MockDatabase, MockStorage
+    from app.services.thumbnails import ThumbnailGenerator, variants
+
+    storage = MockStorage(str(tmp_path / 's3'))
+    db = MockDatabase(str(tmp_path))
+    original = BytesIO()
+    Image.effect_noise((1920, 1080), 64).convert('RGB').save(original, 'PNG')
+    storage.upload_stream([original.getvalue()], 'cover.png')
+    video_id = db.put_video("Clip", "", [], "clip.mp4", "u1", "cover.png")
+
+    video = ThumbnailGenerator(storage, db).generate(video_id, thumbnail='cover.png')
+    assert [w for w, _ in variants(video, 'webp')] == [160, 320, 640]
+    assert video['thumbnails']['jpeg']['320'] == 'cover_320w.jpg'
+    small = storage.read_file(video['thumbnails']['webp']['320'])
+    assert Image.open(BytesIO(small)).size == (320, 180)
+    assert len(small) * 20 < len(original.getvalue())
+    assert db.get_video(video_id)['thumbnails'] == video['thumbnails']
+
+    # No thumbnail and no way to derive one: nothing to do
+    other_id = db.put_video("No thumb", "", [], "missing.mp4", "u1")
+    assert ThumbnailGenerator(storage, db).generate(other_id, video_file=None) is None
+
+# --- TEST 22: HLS PACKAGING ---
+def test_hls_playlists():
+    from app.services.hls import pick_renditions, master_playlist, rewrite_playlist
+
+    assert pick_renditions(720) == [(360, 800), (720, 2800)]  # no upscaling to 1080p
+    assert pick_renditions(240) == [(360, 800)]
+
+    master = master_playlist([('360p.m3u8', 640, 360, 800, True), ('720p.m3u8', 1280, 720, 2800, True)])
+    assert '#EXT-X-STREAM-INF:BANDWIDTH=928000,RESOLUTION=640x360' in master
+    assert master.splitlines()[-1] == '720p.m3u8'
+
+    media = "#EXTM3U\n#EXTINF:6.0,\n360p_00000.ts\n#EXT-X-ENDLIST\n"
+    rewritten = rewrite_playlist(media, 'hls/v1', lambda key: f"/file/{key}")
+    assert rewritten.splitlines() == ['#EXTM3U', '#EXTINF:6.0,', '/file/hls/v1/360p_00000.ts', '#EXT-X-ENDLIST']
+
+# --- TEST 23: CONTENT-ADDRESSED STORAGE ---
+def test_content_addressed_storage(tmp_path):
+    from app.services.mock_impl import MockDatabase, MockStorage
+    from app.services.cas import ContentAddressedStorage, ObjectRefs
+
+    inner = MockStorage(str(tmp_path / 's3'))
+    storage = ContentAddressedStorage(inner, ObjectRefs(str(tmp_path / 'objects.db')), register_wait=0)
+    db = MockDatabase(str(tmp_path))
+    storage.attach(db)
+
+    key, size, digest = storage.upload_stream([b'same ', b'bytes'], 'video.mp4')
+    assert key == f"cas/{digest[:2]}/{digest}.mp4" and size == 10
+    # Same content under another name (another user): same key, the temporary copy is dropped
+    assert storage.upload_stream([b'same bytes'], 'VIDEO.MP4') == (key, 10, digest)
+    assert not any(files for _, _, files in os.walk(tmp_path / 's3' / 'tmp'))
+
+    db.put_video("A", "", [], key, "u1")
+    db.put_video("B", "", [], key, "u2")
+    assert storage.refs.get(key) == 2
+    # Re-importing the same videos does not count them twice
+    db.put_videos(db.get_all_videos())
+    assert storage.refs.get(key) == 2
+
+    # Orphans (stored, never referenced) are garbage-collected; referenced objects stay
+    orphan = storage.upload_stream([b'x'], 'a.jpg')[0]
+    assert storage.gc(older_than=-1) == 1
+    assert not inner.exists(orphan) and inner.exists(key)
+
+    # While gc holds its claim, the same content cannot be taken for "already stored"
+    orphan = storage.upload_stream([b'y'], 'b.jpg')[0]
+    assert storage.refs.claim(orphan, older_than=-1)
+    assert storage.refs.register(orphan, 1) is None
+    assert storage.gc(older_than=-1) == 0  # claimed by someone else
+    storage.refs.release(orphan)
+    assert storage.refs.register(orphan, 1) is True and storage.gc(older_than=60) == 0  # grace period restarted
+
+# --- TEST 24: S3 SERVER-SIDE COPY / MOVE ---
+@mock_aws
+def test_s3_copy_and_move(aws_credentials):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='test-bucket')
+    storage = S3Storage()
+
+    storage.upload_stream([b'clip'], 'uploads/abc/clip.mp4')
+    assert storage.move_file('uploads/abc/clip.mp4', 'clip.mp4') == 'clip.mp4'
+    assert not storage.exists('uploads/abc/clip.mp4')
+    obj = s3.get_object(Bucket='test-bucket', Key='clip.mp4')
+    assert obj['Body'].read() == b'clip' and obj['ContentType'] == 'video/mp4'
+
+# --- TEST 25: LAZY, SHARED AWS CLIENTS ---
+@mock_aws
+def test_shared_aws_clients(aws_credentials, monkeypatch):
+    from app.services import aws_clients
+    monkeypatch.setenv('DYNAMO_TABLE_USER', 'Test-Users')
+    aws_clients.reset()
+
+    storage, analyzer = S3Storage(), RekognitionAnalyzer()
+    DynamoDBService(), DynamoUsers(), SNSNotifier()
+    assert aws_clients._state['cache'] == {}  # nothing built at construction time
+
+    assert storage.s3 is analyzer.s3  # one S3 client (and pool) per worker
+    assert DynamoDBService().table.meta.client is DynamoUsers().table.meta.client
+
+# --- TEST 26: BATCH READS / WRITES ---
+@mock_aws
+def test_batch_video_apis(aws_credentials, tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.cached_impl import CachedVideoDB
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='Test-Videos',
+        KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'video_id', 'AttributeType': 'S'}],
+        ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+    )
+    records = [{'video_id': f"v{i:03d}", 'title': f"Clip {i}", 'user_id': 'u1', 'filename': f"{i}.mp4",
+                'duration': 1.5} for i in range(130)]
+    ids = ['v129', 'missing', 'v000', 'v129', 'v064']
+
+    # DynamoDB: 130 items = 6 BatchWriteItem calls, 130 keys = 2 BatchGetItem calls
+    db = DynamoDBService()
+    assert db.put_videos(records) == 130
+    assert [v['video_id'] for v in db.get_videos(ids)] == ['v129', 'v000', 'v064']
+    assert len(db.get_videos([r['video_id'] for r in records])) == 130
+    assert db.get_video('v001')['feed'] == 'ALL' and db.get_video('v001')['views'] == 0
+
+    mock = MockDatabase(str(tmp_path))
+    assert mock.put_videos(records[:10]) == 10
+    assert mock.put_videos([dict(records[0], title="Renamed")]) == 1  # replaced, not duplicated
+    assert len(mock.get_all_videos()) == 10
+    assert [v['title'] for v in mock.get_videos(['v000', 'nope', 'v001'])] == ["Renamed", "Clip 1"]
+
+    # Replacements publish 'put' again: subscribers upsert, nothing is counted twice
+    from app.services.search import SearchIndex
+    from app.services.feed import ExploreFeed
+    index, feed = SearchIndex(mock), ExploreFeed(mock, size=50)   # (CAS refs: see TEST 23)
+    index.search("clip"), feed.page()
+    mock.put_videos(records[:10])
+    mock.put_videos(records[:10])
+    assert len(index.search("clip", limit=50)) == 10 and feed.stats()['size'] == 10
+
+    # Cached wrapper: hits come from the cache, misses from one backend batch
+    cached = CachedVideoDB(mock)
+    cached.get_video('v000')
+    calls = []
+    original = mock.get_videos
+    mock.get_videos = lambda video_ids: calls.append(video_ids) or original(video_ids)
+    assert [v['video_id'] for v in cached.get_videos(['v000', 'v002', 'v003'])] == ['v000', 'v002', 'v003']
+    assert calls == [['v002', 'v003']]
+
+# --- TEST 27: CATALOG EXPORT / IMPORT ---
+@mock_aws
+def test_catalog_export_import(aws_credentials, tmp_path):
+    from app.services import catalog
+    from app.services.mock_impl import MockDatabase, MockUsers
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='Test-Videos',
+        KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'video_id', 'AttributeType': 'S'}],
+        ProvisionedThroughput={'ReadCapacityUnits': 1, 'WriteCapacityUnits': 1}
+    )
+    db = DynamoDBService()
+    db.put_videos([{'video_id': f"v{i:03d}", 'title': f"Clip {i}", 'user_id': 'u1', 'tags': ['a'],
+                    'thumbnails': {'webp': {'160': f"{i}_160w.webp"}}} for i in range(120)])
+
+    # 4 parallel segments cover the table exactly once; Decimals come out as plain numbers
+    path = str(tmp_path / catalog.filename('videos', 'jsonl'))
+    assert catalog.export_records(db.scan_videos(segments=4), path, 'videos') == 120
+    exported = list(catalog.read_records(path))
+    assert sorted(v['video_id'] for v in exported) == [f"v{i:03d}" for i in range(120)]
+    assert exported[0]['views'] == 0
+
+    target = MockDatabase(str(tmp_path))
+    assert catalog.import_records(catalog.read_records(path), target.put_videos, batch_size=50, workers=3) == 120
+    assert target.get_video('v007')['thumbnails'] == {'webp': {'160': '7_160w.webp'}}
+
+    # Likes survive a round trip back into DynamoDB (exported as a list, stored as a set again)
+    db.toggle_like('v001', 'alice')
+    target.toggle_like('v002', 'carol'), target.toggle_like('v002', 'carol')   # empty list on the mock
+    assert catalog.export_records(db.scan_videos(), path, 'videos') == 120
+    assert catalog.import_records(catalog.read_records(path), db.put_videos) == 120
+    assert db.put_videos([target.get_video('v002')]) == 1
+    assert db.toggle_like('v001', 'bob') == (True, 2) and db.toggle_like('v001', 'alice') == (False, 1)
+    assert db.toggle_like('v002', 'carol') == (True, 1)
+
+    users = MockUsers(str(tmp_path))
+    users.create_user("a@b.c", "Ann", "pw")
+    if catalog.pa is not None:
+        path = str(tmp_path / 'users.parquet')
+        assert catalog.export_records(users.scan_users(), path, 'users', 'parquet') == 1
+        assert [u['email'] for u in catalog.read_records(path)] == ["a@b.c"]
+
+# --- TEST 28: MATERIALIZED EXPLORE FEED ---
+def test_explore_feed(tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.feed import ExploreFeed
+    db = MockDatabase(str(tmp_path))
+    db.put_videos([{'video_id': f"v{i:02d}", 'title': f"Clip {i}", 'user_id': 'u1',
+                    'created_at': f"2026-01-01T00:00:{i:02d}"} for i in range(30)])
+    feed = ExploreFeed(db, size=10)
+
+    # First page from the window; its cursor continues in the database where the window ends
+    page, cursor = feed.page(limit=6)
+    assert [v['video_id'] for v in page] == [f"v{i:02d}" for i in range(29, 23, -1)]
+    assert feed.page(cursor, limit=6) is None
+    assert db.list_videos(cursor, limit=6)[0][0]['video_id'] == 'v23'
+
+    # Nothing below reads the base table: new videos and counters are applied from the change events
+    db.list_videos = db.get_all_videos = None
+    db.put_videos([{'video_id': 'new', 'title': "Newest", 'user_id': 'u1', 'created_at': "2026-02-01T00:00:00"}])
+    renders = []
+    render = lambda videos, next_cursor: renders.append(1) or [(v['video_id'], v['views']) for v in videos]
+    assert feed.rendered('json', None, 2, render, counters=True) == [('new', 0), ('v29', 0)]
+    assert feed.rendered('json', None, 2, render, counters=True) == [('new', 0), ('v29', 0)]
+    db.increment_views('v29', 5)
+    assert feed.rendered('json', None, 2, render, counters=True) == [('new', 0), ('v29', 5)]
+    assert len(renders) == 2 and feed.stats()['size'] == 10
+
+# --- TEST 29: TRENDING (TIME-DECAYED SCORES) ---
+@mock_aws
+def test_trending_decay(aws_credentials, tmp_path):
+    from app.services.trending import SQLiteTrending
+    from app.services.aws_impl import DynamoTrending
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='Test-Trending',
+        KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'video_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    dynamo = DynamoTrending('Test-Trending', half_life=3600, like_weight=5)
+    assert dynamo.ensure_indexes() == ['board-score-index']
+
+    t0 = 1_800_000_000
+    for trending in (SQLiteTrending(str(tmp_path / 'trending.db'), half_life=3600, like_weight=5), dynamo):
+        # Events are buffered: nothing is stored until the flush
+        trending.add_view('old', amount=8)
+        assert trending.score('old', now=t0) == 0
+        assert trending.flush(now=t0) == 1
+
+        # 8 views two hours ago are worth 2 now: 3 fresh views rank higher
+        trending.add_view('new', amount=3)
+        trending.flush(now=t0 + 7200)
+        assert [vid for vid, _ in trending.top(now=t0 + 7200)] == ['new', 'old']
+        assert round(trending.score('old', now=t0 + 7200), 6) == 2.0
+
+        # An unlike takes back what the like added back then: 10 views + like, unlike 3 half-lives later
+        trending.add_view('liked', amount=10)
+        trending.add_like('liked', 'u1', True, now=t0)
+        trending.add_like('liked', 'u1', True, now=t0)      # double like counts once
+        trending.flush(now=t0)
+        trending.add_like('liked', 'u1', False, now=t0 + 3 * 3600)
+        trending.add_like('liked', 'u2', False, now=t0 + 3 * 3600)  # never liked: no effect
+        trending.flush(now=t0 + 3 * 3600)
+        assert round(trending.score('liked', now=t0 + 3 * 3600), 6) == 1.25
+
+        # A negative / zero limit still means "at least one", never "no limit"
+        assert len(trending.top(limit=-1, now=t0 + 7200)) == 1
+
+    # A write that fails for one video keeps only that video's events; likes count exactly once
+    from botocore.exceptions import ClientError
+    client = dynamo.table.meta.client
+    transact, failures = client.transact_write_items, []
+    def flaky(**kwargs):
+        if "'video_id': 'b'" in str(kwargs) and not failures:
+            failures.append(1)
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'TransactWriteItems')
+        return transact(**kwargs)
+    client.transact_write_items = flaky
+    dynamo.add_view('a', amount=4)
+    dynamo.add_view('b', amount=4)
+    dynamo.add_like('b', 'u1', True, now=t0)
+    assert dynamo.flush(now=t0) == 1 and dynamo.flush(now=t0) == 1
+    client.transact_write_items = transact
+    assert failures == [1]
+    assert round(dynamo.score('a', now=t0), 6) == 4.0 and round(dynamo.score('b', now=t0), 6) == 9.0
+    dynamo.add_like('b', 'u1', False, now=t0)
+    dynamo.flush(now=t0)
+    assert round(dynamo.score('b', now=t0), 6) == 4.0
+
+    # A failed write keeps the events for the next flush
+    trending = SQLiteTrending(str(tmp_path / 'retry.db'), half_life=3600)
+    trending.add_view('v1', amount=2)
+    write, trending._write = trending._write, lambda *args: 1 / 0
+    assert trending.flush(now=t0) == 0
+    trending._write = write
+    assert trending.flush(now=t0) == 1 and round(trending.score('v1', now=t0), 6) == 2.0
+
+# --- TEST 30: TAG INDEX + FACETS ---
+def test_tag_index_facets(tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.search import SearchIndex
+    db = MockDatabase(str(tmp_path))
+    db.put_videos([
+        {'video_id': 'a', 'title': "Dog at the beach", 'tags': ['Dog', 'Outdoor', 'Beach'], 'created_at': '2026-01-01'},
+        {'video_id': 'b', 'title': "Dog indoors", 'tags': ['dog', 'Indoor'], 'created_at': '2026-01-02'},
+        {'video_id': 'c', 'title': "Cat outside", 'tags': ['cat', 'outdoor'], 'created_at': '2026-01-03'},
+    ])
+    index = SearchIndex(db)
+    ids = lambda videos: [v['video_id'] for v in videos]
+
+    videos, facets = index.browse(tags=['dog', 'OUTDOOR'])
+    assert ids(videos) == ['a'] and facets == [('beach', 1)]
+    videos, facets = index.browse(tags=['dog', 'cat'], mode='or')
+    assert ids(videos) == ['c', 'b', 'a']  # newest first without a query
+    assert facets[0] == ('outdoor', 2)
+    videos, _ = index.browse("dog", tags=['indoor'])
+    assert ids(videos) == ['b']
+    assert index.tag_counts(2) == [('dog', 2), ('outdoor', 2)]
+
+    # Kept current by the change events: Rekognition labels arrive through add_tags
+    db.add_tags('c', ['Beach'])
+    assert ids(index.browse(tags=['beach'])[0]) == ['c', 'a']
+    assert index.browse(tags=['unknown'])[0] == []
+
 if __name__ == "__main__":
-    pytest.main(["-v", "tests.py"])
\ No newline at end of file
+    pytest.main(["-v", "tests.py"])
+
+# --- TEST 31: RETAG REPLACES LABELS, KEEPS USER TAGS ---
+@mock_aws
+def test_set_labels(aws_credentials, tmp_path):
+    from app.services.mock_impl import MockDatabase
+    from app.services.sqlite_impl import SQLiteDatabase, SQLiteVideoDB
+    from app.services.log_impl import LogVideoDB
+    boto3.resource('dynamodb', region_name='us-east-1').create_table(
+        TableName='Test-Videos',
+        KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'video_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    for db in (MockDatabase(str(tmp_path)), SQLiteVideoDB(SQLiteDatabase(str(tmp_path / 'v.db'))),
+               LogVideoDB(str(tmp_path / 'log')), DynamoDBService()):
+        video_id = db.put_video("Clip", "", ['mine', 'cat'], "a.mp4", "u1", "a.jpg")
+        db.set_labels(video_id, ['cat', 'Dog', 'Outdoor'])   # 'cat' was the user's already
+        assert db.get_video(video_id)['tags'] == ['mine', 'cat', 'Dog', 'Outdoor']
+        db.set_labels(video_id, ['Beach'])
+        assert db.get_video(video_id)['tags'] == ['mine', 'cat', 'Beach']
+        assert db.set_labels('missing', ['Beach']) is None